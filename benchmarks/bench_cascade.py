@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Recall and latency of cascade (signature prefilter) retrieval vs exact search.
+
+Builds or reuses a synthetic database, computes binary and/or PCA
+signatures and reports recall@k and per-query latency for a range of
+candidate multiples, to pick the smallest multiple that meets a recall
+target.
+
+Example:
+    python benchmarks/bench_cascade.py --size 100000 --kinds binary pca --multiples 2 5 10 20
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common import environment, write_report
+from synthetic import SYNTHETIC_MODEL, build_synthetic_db, make_queries
+from geospatial_rag.cascade import SignatureIndex, recall_report
+from geospatial_rag.database import SQLiteVectorDB
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark cascade retrieval recall")
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--kinds", nargs="+", default=["binary", "pca"], choices=["binary", "pca"])
+    parser.add_argument("--pca-dim", type=int, default=64)
+    parser.add_argument("--multiples", type=int, nargs="+", default=[1, 2, 5, 10, 20, 50])
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--text-only", action="store_true", help="Query without an image vector")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=str, default="./benchmarks/data")
+    parser.add_argument("--output", type=str, default=None, help="Write JSON results here")
+    args = parser.parse_args()
+    
+    os.makedirs(args.workdir, exist_ok=True)
+    db_path = os.path.join(args.workdir, f"synthetic_{args.size}_{args.dim}_{args.seed}.db")
+    if not os.path.exists(db_path):
+        print(f"Building synthetic database with {args.size:,} documents...")
+        build_synthetic_db(db_path, args.size, dim=args.dim, seed=args.seed)
+    
+    text_queries, image_queries = make_queries(args.queries, args.dim, args.seed + 1)
+    report = {'benchmark': 'cascade', 'environment': environment(), 'size': args.size, 'results': []}
+    
+    with SQLiteVectorDB(db_path) as db:
+        for kind in args.kinds:
+            index = SignatureIndex(db, SYNTHETIC_MODEL, kind=kind, dim=args.pca_dim)
+            start = time.perf_counter()
+            index.build()
+            build_seconds = time.perf_counter() - start
+            
+            result = recall_report(
+                db, index, text_queries, None if args.text_only else image_queries,
+                top_k=args.top_k, multiples=args.multiples
+            )
+            result['build_seconds'] = build_seconds
+            report['results'].append(result)
+            
+            print(f"{kind}: exact {result['exact_ms']:.1f} ms/query")
+            for row in result['multiples']:
+                print(
+                    f"  x{row['candidate_multiple']:<4} recall@{args.top_k} {row['recall']:.3f}  "
+                    f"{row['cascade_ms']:.1f} ms/query"
+                )
+    
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Offline CLIPEmbedder throughput benchmark.
+
+Builds a small randomly initialized CLIP model (no hub download, no GPU),
+saves it as a local snapshot and measures text and image encoding throughput
+across batch sizes, torch thread counts and inference backends. Absolute
+numbers are smaller than for ViT-B/32, but relative changes from batching,
+threading or quantization work show up the same way.
+
+Example:
+    python benchmarks/bench_embedder.py --batch-sizes 1 8 32 --threads 1 4
+    python benchmarks/bench_embedder.py --hidden-size 768 --layers 12 --output embedder.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+sys.path.insert(0, str(Path(__file__).parent))
+
+import torch
+from PIL import Image
+
+from common import environment, peak_rss_mb, summarize, write_report
+from geospatial_rag.embeddings import CLIPEmbedder
+from tests.tiny_clip import build_tiny_clip
+
+BACKENDS = {
+    'fp32': {},
+    'int8-dynamic': {'quantize': True},
+}
+
+CAPTIONS = [
+    "many buildings and green trees are around a storage tank",
+    "a playground is next to a school",
+    "several boats are docked in the port",
+    "a river runs through the farmland with a bridge over it",
+    "this is a dense residential area with many houses and roads",
+]
+
+
+def measure(encode_fn, batch, repeats: int, warmup: int) -> Dict[str, float]:
+    """Time ``encode_fn(batch)`` and derive items/sec and per-item latency."""
+    for _ in range(warmup):
+        encode_fn(batch)
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        encode_fn(batch)
+        latencies.append(time.perf_counter() - start)
+    stats = summarize(latencies)
+    stats['items_per_second'] = len(batch) * stats.pop('qps')
+    stats['per_item_ms'] = stats['mean_ms'] / len(batch)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CLIPEmbedder offline")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--hidden-size", type=int, default=64)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--repeats", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--snapshot-dir", type=str, default=None,
+                        help="Reuse or create the random model snapshot here")
+    parser.add_argument("--output", type=str, default=None, help="Write JSON results here")
+    args = parser.parse_args()
+    
+    snapshot_dir = args.snapshot_dir or tempfile.mkdtemp(prefix="tiny-clip-")
+    if not os.path.exists(os.path.join(snapshot_dir, "config.json")):
+        build_tiny_clip(snapshot_dir, hidden_size=args.hidden_size, layers=args.layers)
+    
+    rng = np.random.default_rng(0)
+    images = [
+        Image.fromarray(rng.integers(0, 255, (256, 256, 3), dtype=np.uint8))
+        for _ in range(max(args.batch_sizes))
+    ]
+    captions = [CAPTIONS[i % len(CAPTIONS)] for i in range(max(args.batch_sizes))]
+    
+    report: Dict[str, Any] = {
+        'benchmark': 'embedder',
+        'environment': environment(),
+        'model': {'hidden_size': args.hidden_size, 'layers': args.layers, 'snapshot': snapshot_dir},
+        'results': [],
+    }
+    
+    for backend in args.backends:
+        start = time.perf_counter()
+        embedder = CLIPEmbedder(
+            model_name=snapshot_dir, device="cpu", local_files_only=True, **BACKENDS[backend]
+        )
+        load_seconds = time.perf_counter() - start
+        
+        for threads in args.threads:
+            torch.set_num_threads(threads)
+            for batch_size in args.batch_sizes:
+                for modality, encode_fn, batch in (
+                    ('text', embedder.encode_text, captions[:batch_size]),
+                    ('image', embedder.encode_image, images[:batch_size]),
+                ):
+                    stats = measure(encode_fn, batch, args.repeats, args.warmup)
+                    report['results'].append({
+                        'backend': backend,
+                        'threads': threads,
+                        'batch_size': batch_size,
+                        'modality': modality,
+                        'load_seconds': load_seconds,
+                        **stats,
+                    })
+                    print(
+                        f"{backend:<13} threads={threads:<3} batch={batch_size:<4} {modality:<5} "
+                        f"{stats['items_per_second']:9.1f} items/s  {stats['per_item_ms']:7.2f} ms/item"
+                    )
+    
+    report['peak_rss_mb'] = peak_rss_mb()
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Scaling of multi-process ingestion with the number of worker processes.
+
+Writes a set of synthetic images and captions, then ingests them into a
+fresh database with ``ParallelIngestor`` for each worker count, using the
+small random CLIP snapshot from ``bench_embedder``. Reports throughput,
+speedup over one worker and parallel efficiency.
+
+Example:
+    python benchmarks/bench_ingest.py --images 512 --workers 1 2 4 8 16
+    python benchmarks/bench_ingest.py --share-model --hidden-size 768 --layers 12
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from PIL import Image
+
+from bench_embedder import CAPTIONS, build_tiny_clip
+from common import environment, peak_rss_mb, write_report
+from geospatial_rag.database import SQLiteVectorDB
+from geospatial_rag.embeddings import CLIPEmbedder
+from geospatial_rag.ingest import ParallelIngestor
+
+
+def write_images(image_dir: str, count: int, size: int, seed: int = 0):
+    """Save ``count`` random RGB JPEGs, reusing any that already exist."""
+    os.makedirs(image_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    names = []
+    for i in range(count):
+        name = f"scene_{i:06d}.jpg"
+        path = os.path.join(image_dir, name)
+        if not os.path.exists(path):
+            Image.fromarray(rng.integers(0, 255, (size, size, 3), dtype=np.uint8)).save(path, quality=90)
+        names.append(name)
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark multi-process ingestion scaling")
+    parser.add_argument("--images", type=int, default=256)
+    parser.add_argument("--captions-per-image", type=int, default=5)
+    parser.add_argument("--image-size", type=int, default=256)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument("--threads-per-worker", type=int, default=None,
+                        help="Defaults to cpu_count // workers")
+    parser.add_argument("--shard-size", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--hidden-size", type=int, default=64)
+    parser.add_argument("--layers", type=int, default=2)
+    parser.add_argument("--share-model", action="store_true",
+                        help="Load the model once here and share it with forked workers")
+    parser.add_argument("--workdir", type=str, default="./benchmarks/data")
+    parser.add_argument("--output", type=str, default=None, help="Write JSON results here")
+    args = parser.parse_args()
+    
+    snapshot_dir = os.path.join(args.workdir, f"tiny_clip_{args.hidden_size}_{args.layers}")
+    if not os.path.exists(os.path.join(snapshot_dir, "config.json")):
+        build_tiny_clip(snapshot_dir, hidden_size=args.hidden_size, layers=args.layers)
+    image_dir = os.path.join(args.workdir, f"ingest_images_{args.image_size}")
+    names = write_images(image_dir, args.images, args.image_size)
+    records = [
+        {'text': f"{CAPTIONS[c % len(CAPTIONS)]} ({name}, {c})", 'image_path': name, 'doc_class': "train"}
+        for name in names for c in range(args.captions_per_image)
+    ]
+    
+    embedder_kwargs = {'model_name': snapshot_dir, 'device': "cpu", 'local_files_only': True}
+    embedder = CLIPEmbedder(**embedder_kwargs) if args.share_model else None
+    
+    report = {
+        'benchmark': 'ingest',
+        'environment': environment(),
+        'documents': len(records),
+        'images': len(names),
+        'model': {'hidden_size': args.hidden_size, 'layers': args.layers, 'shared': args.share_model},
+        'results': [],
+    }
+    
+    baseline = None
+    for workers in args.workers:
+        with tempfile.TemporaryDirectory() as tmp:
+            with SQLiteVectorDB(os.path.join(tmp, "ingest.db")) as db:
+                result = ParallelIngestor(
+                    db,
+                    embedder=embedder,
+                    embedder_kwargs=embedder_kwargs,
+                    num_workers=workers,
+                    threads_per_worker=args.threads_per_worker,
+                    shard_size=args.shard_size,
+                    batch_size=args.batch_size,
+                    image_root=image_dir
+                ).run(records)
+        
+        baseline = baseline or result['documents_per_second']
+        result['speedup'] = result['documents_per_second'] / baseline
+        result['efficiency'] = result['speedup'] / (workers / args.workers[0])
+        report['results'].append(result)
+        print(
+            f"workers={workers:<3} threads={result['threads_per_worker']:<3} "
+            f"{result['documents_per_second']:8.1f} docs/s  speedup {result['speedup']:.2f}x  "
+            f"efficiency {result['efficiency']:.0%}  utilization {result['worker_utilization']:.0%}"
+        )
+    
+    report['peak_rss_mb'] = peak_rss_mb()
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
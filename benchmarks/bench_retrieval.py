@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Retrieval benchmark over synthetic corpora.
+
+Builds (or reuses) synthetic databases of the requested sizes and measures
+SQLiteRetriever and GeoSpatialRAG.query latency percentiles, QPS, peak RSS
+and cold vs warm start. Every size runs in a fresh subprocess so peak RSS
+and cold-start numbers are not polluted by earlier runs. Query vectors are
+precomputed, so no model is downloaded or loaded.
+
+Example:
+    python benchmarks/bench_retrieval.py --sizes 10000 100000 --output results.json
+    python benchmarks/bench_retrieval.py --sizes 10000 --compare previous.json
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from common import environment, peak_rss_mb, summarize, write_report
+from synthetic import SYNTHETIC_MODEL, build_synthetic_db, make_queries
+
+
+class PrecomputedEmbedder:
+    """Stand-in for CLIPEmbedder that returns injected query vectors."""
+    
+    def __init__(self, text_vectors: Dict[str, np.ndarray], image_vector=None,
+                 model_name: str = SYNTHETIC_MODEL):
+        self.model_name = model_name
+        self.text_vectors = text_vectors
+        self.image_vector = image_vector
+    
+    def encode_text(self, text, normalize: bool = True):
+        if isinstance(text, str):
+            return self.text_vectors[text]
+        return np.stack([self.text_vectors[t] for t in text])
+    
+    def encode_image(self, image, normalize: bool = True):
+        return self.image_vector
+
+
+def run_size(args) -> Dict[str, Any]:
+    """Measure one database in the current (fresh) process."""
+    from geospatial_rag.database import SQLiteVectorDB
+    from geospatial_rag.retriever import SQLiteRetriever
+    
+    text_queries, image_queries = make_queries(args.queries + args.warmup, args.dim, args.seed + 1)
+    result = {'size': args.run_one, 'dim': args.dim, 'top_k': args.top_k}
+    
+    # Cold start: first connection and first query in a fresh process.
+    start = time.perf_counter()
+    db = SQLiteVectorDB(args.db_path)
+    open_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    SQLiteRetriever(
+        args.db_path, text_queries[0], image_queries[0], pool=db.pool, model_name=SYNTHETIC_MODEL
+    ).get_relevant_documents(top_k=args.top_k)
+    result['cold'] = {
+        'open_ms': open_seconds * 1000.0,
+        'first_query_ms': (time.perf_counter() - start) * 1000.0,
+    }
+    
+    def measure(query_fn) -> Dict[str, float]:
+        for i in range(args.warmup):
+            query_fn(i)
+        latencies = []
+        for i in range(args.warmup, args.warmup + args.queries):
+            start = time.perf_counter()
+            query_fn(i)
+            latencies.append(time.perf_counter() - start)
+        return summarize(latencies)
+    
+    def retriever_query(i, with_image):
+        SQLiteRetriever(
+            args.db_path,
+            text_queries[i],
+            image_queries[i] if with_image else None,
+            pool=db.pool,
+            model_name=SYNTHETIC_MODEL
+        ).get_relevant_documents(top_k=args.top_k)
+    
+    result['warm'] = {
+        'retriever_text': measure(lambda i: retriever_query(i, False)),
+        'retriever_text_image': measure(lambda i: retriever_query(i, True)),
+    }
+    
+    if not args.skip_pipeline:
+        try:
+            from geospatial_rag.pipeline import GeoSpatialRAG
+        except ImportError as e:
+            result['warm']['pipeline'] = {'skipped': f"pipeline unavailable: {e}"}
+        else:
+            names = [f"query {i}" for i in range(len(text_queries))]
+            embedder = PrecomputedEmbedder(dict(zip(names, text_queries)))
+            rag = GeoSpatialRAG(db_path=args.db_path, embedder=embedder, vlm_model_name=None)
+            result['warm']['pipeline'] = measure(lambda i: rag.query(names[i], top_k=args.top_k))
+            rag.close()
+    
+    db.close()
+    result['peak_rss_mb'] = peak_rss_mb()
+    return result
+
+
+def compare(current: Dict[str, Any], baseline_path: str):
+    """Print relative changes against a previous results file."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {r['size']: r for r in baseline.get('results', [])}
+    
+    print(f"\nComparison against {baseline_path}:")
+    for result in current['results']:
+        old = previous.get(result['size'])
+        if not old:
+            continue
+        for name, stats in result['warm'].items():
+            old_stats = old.get('warm', {}).get(name)
+            if 'p50_ms' not in stats or not old_stats or 'p50_ms' not in old_stats:
+                continue
+            changes = ", ".join(
+                f"{key} {100.0 * (stats[key] - old_stats[key]) / old_stats[key]:+.1f}%"
+                for key in ('p50_ms', 'p95_ms', 'qps')
+            )
+            print(f"  size={result['size']:>9} {name:<22} {changes}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval over synthetic databases")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=50, help="Timed queries per measurement")
+    parser.add_argument("--warmup", type=int, default=3)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workdir", type=str, default="./benchmarks/data",
+                        help="Where synthetic databases are cached")
+    parser.add_argument("--rebuild", action="store_true", help="Regenerate cached databases")
+    parser.add_argument("--skip-pipeline", action="store_true")
+    parser.add_argument("--output", type=str, default=None, help="Write JSON results here")
+    parser.add_argument("--compare", type=str, default=None, help="Previous results JSON")
+    parser.add_argument("--run-one", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--db-path", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.run_one is not None:
+        print(json.dumps(run_size(args)))
+        return
+    
+    os.makedirs(args.workdir, exist_ok=True)
+    report = {'benchmark': 'retrieval', 'environment': environment(), 'results': []}
+    
+    for size in args.sizes:
+        db_path = os.path.join(args.workdir, f"synthetic_{size}_{args.dim}_{args.seed}.db")
+        build = None
+        if args.rebuild or not os.path.exists(db_path):
+            print(f"Building synthetic database with {size:,} documents...")
+            build = build_synthetic_db(db_path, size, dim=args.dim, seed=args.seed)
+        
+        print(f"Measuring {size:,} documents...")
+        command = [
+            sys.executable, __file__,
+            "--run-one", str(size), "--db-path", db_path,
+            "--dim", str(args.dim), "--queries", str(args.queries),
+            "--warmup", str(args.warmup), "--top-k", str(args.top_k), "--seed", str(args.seed),
+        ]
+        if args.skip_pipeline:
+            command.append("--skip-pipeline")
+        output = subprocess.run(command, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result['build'] = build
+        result['db_bytes'] = os.path.getsize(db_path)
+        report['results'].append(result)
+        
+        warm = result['warm']['retriever_text_image']
+        print(
+            f"  cold first query {result['cold']['first_query_ms']:.1f} ms | "
+            f"warm p50 {warm['p50_ms']:.1f} ms p95 {warm['p95_ms']:.1f} ms | "
+            f"{warm['qps']:.1f} QPS | peak RSS {result['peak_rss_mb']:.0f} MiB"
+        )
+    
+    write_report(report, args.output)
+    
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
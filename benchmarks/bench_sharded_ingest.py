@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Local simulation of multi-node ingestion.
+
+Writes a manifest of synthetic images, starts one process per "node" with
+``python -m geospatial_rag.sharding ingest`` on its shard, merges the
+partial databases and checks the merged database against a single-node
+ingestion of the same manifest. Uses the small random CLIP snapshot from
+``bench_embedder``, so it runs offline.
+
+Example:
+    python benchmarks/bench_sharded_ingest.py --nodes 4 --images 200
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+SRC = Path(__file__).parent.parent / "src"
+sys.path.insert(0, str(SRC))
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_embedder import CAPTIONS, build_tiny_clip
+from bench_ingest import write_images
+from common import environment, write_report
+from geospatial_rag.database import SQLiteVectorDB
+from geospatial_rag.sharding import ingest_shard, merge_databases
+
+
+def run_nodes(manifest: str, nodes: int, workdir: str, snapshot_dir: str, image_root: str):
+    """Ingest every shard in its own process, all at once, and return the partial paths."""
+    env = dict(os.environ, PYTHONPATH=str(SRC) + os.pathsep + os.environ.get("PYTHONPATH", ""))
+    processes, partials = [], []
+    for shard in range(nodes):
+        output = os.path.join(workdir, f"part-{shard}.db")
+        partials.append(output)
+        processes.append(subprocess.Popen(
+            [
+                sys.executable, "-m", "geospatial_rag.sharding", "ingest", manifest,
+                "--shard", str(shard), "--num-shards", str(nodes), "--output", output,
+                "--model", snapshot_dir, "--local-files-only", "--workers", "1",
+                "--image-root", image_root,
+            ],
+            env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True
+        ))
+    reports = []
+    for process in processes:
+        stdout, _ = process.communicate()
+        if process.returncode != 0:
+            raise RuntimeError(f"Shard process exited with {process.returncode}")
+        reports.append(json.loads(stdout))
+    return partials, reports
+
+
+def database_digest(path: str):
+    """Document ids and a checksum of their text vectors."""
+    with SQLiteVectorDB(path) as db, db.pool.read() as cursor:
+        cursor.execute("SELECT id, embedding FROM text_embeddings ORDER BY id")
+        rows = cursor.fetchall()
+    checksum = float(sum(np.frombuffer(row[1], dtype=np.float32).sum() for row in rows))
+    return [row[0] for row in rows], checksum
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate sharded multi-node ingestion locally")
+    parser.add_argument("--nodes", type=int, default=4)
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--captions-per-image", type=int, default=5)
+    parser.add_argument("--workdir", type=str, default="./benchmarks/data/sharded")
+    parser.add_argument("--skip-verify", action="store_true", help="Skip the single-node reference run")
+    parser.add_argument("--output", type=str, default=None, help="Write JSON results here")
+    args = parser.parse_args()
+    
+    os.makedirs(args.workdir, exist_ok=True)
+    for name in os.listdir(args.workdir):
+        if name.endswith((".db", ".db-wal", ".db-shm")):
+            os.remove(os.path.join(args.workdir, name))
+    
+    snapshot_dir = os.path.abspath(os.path.join(args.workdir, "tiny_clip"))
+    if not os.path.exists(os.path.join(snapshot_dir, "config.json")):
+        build_tiny_clip(snapshot_dir)
+    image_root = os.path.abspath(os.path.join(args.workdir, "images"))
+    names = write_images(image_root, args.images, 256)
+    
+    manifest = os.path.join(args.workdir, "manifest.jsonl")
+    with open(manifest, "w", encoding="utf-8") as f:
+        for name in names:
+            for c in range(args.captions_per_image):
+                record = {'text': f"{CAPTIONS[c % len(CAPTIONS)]} ({name})", 'image_path': name,
+                          'doc_class': "train"}
+                f.write(json.dumps(record) + "\n")
+    
+    start = time.perf_counter()
+    partials, node_reports = run_nodes(manifest, args.nodes, args.workdir, snapshot_dir, image_root)
+    ingest_seconds = time.perf_counter() - start
+    
+    merged_path = os.path.join(args.workdir, "merged.db")
+    start = time.perf_counter()
+    merge_report = merge_databases(merged_path, partials)
+    merge_seconds = time.perf_counter() - start
+    
+    report = {
+        'benchmark': 'sharded_ingest',
+        'environment': environment(),
+        'nodes': args.nodes,
+        'ingest_seconds': ingest_seconds,
+        'merge_seconds': merge_seconds,
+        'documents_per_node': [r['stored'] for r in node_reports],
+        'merge': merge_report,
+    }
+    print(f"{args.nodes} nodes ingested {sum(report['documents_per_node'])} documents in {ingest_seconds:.1f}s "
+          f"(per node: {report['documents_per_node']}), merged in {merge_seconds:.2f}s")
+    
+    if not args.skip_verify:
+        reference_path = os.path.join(args.workdir, "single.db")
+        ingest_shard(
+            manifest, 0, 1, reference_path,
+            embedder_kwargs={'model_name': snapshot_dir, 'device': "cpu", 'local_files_only': True},
+            num_workers=1, image_root=image_root
+        )
+        merged_ids, merged_sum = database_digest(merged_path)
+        reference_ids, reference_sum = database_digest(reference_path)
+        report['matches_single_node'] = bool(merged_ids == reference_ids and np.isclose(merged_sum, reference_sum))
+        print(f"Merged database matches single-node ingestion: {report['matches_single_node']}")
+    
+    write_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -15,6 +15,13 @@ try:
     from .embeddings import CLIPEmbedder
     from .database import SQLiteVectorDB
     from .retriever import SQLiteRetriever
+    from .reembed import ReembeddingJob
+    from .ingest import ParallelIngestor
+    from .cascade import SignatureIndex
+    from .classify import ZeroShotClassifier
+    from .models import VLMManager, ResidencyManager
+    from .tracing import Tracer, LoggingSink, JSONLinesSink, OpenTelemetrySink
+    from .metrics import MetricsRegistry, REGISTRY, render_metrics
     from .utils import load_config, setup_logging
     
     __all__ = [
@@ -22,6 +29,19 @@ try:
         "CLIPEmbedder", 
         "SQLiteVectorDB",
         "SQLiteRetriever",
+        "ReembeddingJob",
+        "ParallelIngestor",
+        "SignatureIndex",
+        "ZeroShotClassifier",
+        "VLMManager",
+        "ResidencyManager",
+        "Tracer",
+        "LoggingSink",
+        "JSONLinesSink",
+        "OpenTelemetrySink",
+        "MetricsRegistry",
+        "REGISTRY",
+        "render_metrics",
         "load_config",
         "setup_logging",
     ]
@@ -0,0 +1,123 @@
+"""
+Result cache for repeated queries.
+"""
+
+import os
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Dict, Hashable, Optional, Tuple, Union
+
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    """Collapse whitespace and case, which the CLIP tokenizer ignores anyway."""
+    return " ".join(text.lower().split())
+
+
+def image_fingerprint(image: Optional[Union[str, BinaryIO, Image.Image]]) -> Optional[Tuple]:
+    """
+    Cheap identity of a query image.
+    
+    Paths are identified by their absolute path, size and modification time,
+    so no pixels are read; so are images opened from a file. File objects
+    and images still reading from an in-memory buffer are hashed from their
+    encoded bytes.
+    Images with no encoded source (built or transformed in memory) raise
+    ``ValueError``: hashing their pixels would cost about as much as
+    encoding them, so such queries are not cached.
+    """
+    if image is None:
+        return None
+    if not isinstance(image, str) and getattr(image, "filename", None):
+        image = image.filename
+    if isinstance(image, str):
+        stat = os.stat(image)
+        return ("path", os.path.abspath(image), stat.st_size, stat.st_mtime_ns)
+    
+    source = image if hasattr(image, "read") else getattr(image, "fp", None)
+    if source is not None and hasattr(source, "seek"):
+        try:
+            position = source.tell()
+            source.seek(0)
+            digest = hashlib.sha1(source.read()).hexdigest()
+            source.seek(position)
+            return ("encoded", digest)
+        except (OSError, ValueError):
+            pass
+    raise ValueError("Image has no file or encoded source to fingerprint")
+
+
+class QueryCache:
+    """
+    Thread-safe LRU cache of query results tagged with a database version.
+    
+    Entries are only valid for the ``version`` they were stored under; the
+    first lookup with a newer version drops everything, so writes to the
+    database invalidate the cache without any explicit call.
+    """
+    
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+    
+    def _check_version(self, version: Hashable):
+        if version != self._version:
+            if self._entries:
+                self.invalidations += 1
+                logger.debug(f"Query cache invalidated ({len(self._entries)} entries)")
+            self._entries.clear()
+            self._version = version
+    
+    def get(self, key: Hashable, version: Hashable) -> Optional[Any]:
+        with self._lock:
+            self._check_version(version)
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+    
+    def put(self, key: Hashable, value: Any, version: Hashable):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if version != self._version:
+                # Computed against a snapshot that has since been superseded.
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'evictions': self.evictions,
+            'invalidations': self.invalidations,
+        }
@@ -0,0 +1,262 @@
+"""
+Compact document signatures for coarse-to-fine (cascade) retrieval.
+"""
+
+import time
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .database import SQLiteVectorDB
+
+logger = logging.getLogger(__name__)
+
+SIGNATURE_KINDS = ("binary", "pca")
+
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def _popcount(codes: np.ndarray) -> np.ndarray:
+    """Number of set bits per row of a packed ``uint8`` matrix."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(codes).sum(axis=-1, dtype=np.int32)
+    return _POPCOUNT_TABLE[codes].sum(axis=-1, dtype=np.int32)
+
+
+class SignatureIndex:
+    """
+    Per-document signatures of the stored CLIP vectors of one model.
+    
+    ``binary`` keeps the sign bit of every dimension (64 bytes for a 512-d
+    vector) and approximates cosine similarity from the Hamming distance.
+    ``pca`` keeps a float16 projection onto the top ``dim`` principal
+    components, fitted on a sample of the stored vectors. Signatures are
+    dropped by triggers whenever their source vector changes, and ``build``
+    fills in whatever is missing; until then the retriever scores unsigned
+    rows exactly, so results stay complete but the cascade saves less.
+    """
+    
+    def __init__(self, db: SQLiteVectorDB, model_name: str, kind: str = "binary", dim: int = 64):
+        if kind not in SIGNATURE_KINDS:
+            raise ValueError(f"Unknown signature kind '{kind}', expected one of {SIGNATURE_KINDS}")
+        self.db = db
+        self.model_name = model_name
+        self.kind = kind
+        self.dim = dim
+        self.components = None
+        self.mean = None
+        self.input_dim = None
+        if kind == "pca":
+            self._load_projection()
+    
+    def _load_projection(self):
+        with self.db.pool.read() as cursor:
+            cursor.execute(
+                "SELECT dim, input_dim, components, mean FROM signature_models WHERE model_name = ? AND kind = ?",
+                (self.model_name, self.kind)
+            )
+            row = cursor.fetchone()
+        if row is not None:
+            self.dim, self.input_dim = row[0], row[1]
+            self.components = np.frombuffer(row[2], dtype=np.float32).reshape(self.dim, self.input_dim)
+            self.mean = np.frombuffer(row[3], dtype=np.float32)
+    
+    @property
+    def ready(self) -> bool:
+        """Whether signatures can be computed, picking up a projection fitted elsewhere."""
+        if self.kind == "pca" and self.components is None:
+            self._load_projection()
+        return self.kind == "binary" or self.components is not None
+    
+    def fit(self, sample_size: int = 50_000, seed: int = 0):
+        """Fit the PCA projection on a random sample of stored text and image vectors."""
+        if self.kind != "pca":
+            return self
+        with self.db.pool.read() as cursor:
+            vectors = []
+            for table in ("text_embeddings", "image_embeddings", "image_vectors"):
+                cursor.execute(
+                    f"SELECT embedding FROM {table} WHERE model_name = ? ORDER BY random() LIMIT ?",
+                    (self.model_name, sample_size)
+                )
+                vectors.extend(np.frombuffer(row[0], dtype=np.float32) for row in cursor.fetchall())
+        if not vectors:
+            raise ValueError(f"No stored vectors for model {self.model_name}")
+        
+        sample = np.stack(vectors)
+        self.input_dim = sample.shape[1]
+        self.dim = min(self.dim, self.input_dim)
+        self.mean = sample.mean(axis=0).astype(np.float32)
+        _, _, vt = np.linalg.svd(sample - self.mean, full_matrices=False)
+        self.components = np.ascontiguousarray(vt[:self.dim], dtype=np.float32)
+        
+        with self.db.pool.write() as cursor:
+            cursor.execute(
+                """INSERT INTO signature_models (model_name, kind, dim, input_dim, components, mean)
+                   VALUES (?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(model_name, kind) DO UPDATE SET
+                       dim = excluded.dim, input_dim = excluded.input_dim,
+                       components = excluded.components, mean = excluded.mean""",
+                (self.model_name, self.kind, self.dim, self.input_dim,
+                 self.components.tobytes(), self.mean.tobytes())
+            )
+            # Signatures from an earlier projection are no longer comparable.
+            cursor.execute(
+                "DELETE FROM signatures WHERE model_name = ? AND kind = ?", (self.model_name, self.kind)
+            )
+            self.db.bump_derived_version(cursor)
+        logger.info(f"Fitted {self.dim}-d PCA signatures on {len(sample)} vectors")
+        return self
+    
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        """Signatures for the rows of ``matrix``."""
+        matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+        if self.kind == "binary":
+            return np.packbits(matrix > 0, axis=1)
+        return ((matrix - self.mean) @ self.components.T).astype(np.float16)
+    
+    def decode(self, blobs: List[bytes]) -> np.ndarray:
+        """Stack signature blobs into a matrix."""
+        dtype = np.uint8 if self.kind == "binary" else np.float16
+        return np.frombuffer(b"".join(blobs), dtype=dtype).reshape(len(blobs), -1)
+    
+    def query_signature(self, query: np.ndarray) -> np.ndarray:
+        query = np.asarray(query, dtype=np.float32)
+        if self.kind == "binary":
+            return np.packbits(query > 0)
+        return query @ self.components.T
+    
+    def similarities(self, query: np.ndarray, query_signature: np.ndarray,
+                     signatures: np.ndarray) -> np.ndarray:
+        """Approximate cosine similarity of ``query`` to each signature row."""
+        if self.kind == "binary":
+            hamming = _popcount(np.bitwise_xor(signatures, query_signature))
+            return np.cos(np.pi * hamming / (signatures.shape[1] * 8)).astype(np.float32)
+        # Stored vectors are unit length, so q.x = q.mean + (Pq).(P(x - mean)).
+        return (signatures.astype(np.float32) @ query_signature + float(query @ self.mean)) / max(
+            float(np.linalg.norm(query)), 1e-12
+        )
+    
+    def build(self, batch_size: int = 5000) -> int:
+        """Compute signatures for every document of the model that lacks one."""
+        if not self.ready:
+            self.fit()
+        
+        written = 0
+        last_id = ""
+        while True:
+            with self.db.pool.read() as cursor:
+                cursor.execute(
+                    """SELECT te.id, te.embedding, COALESCE(ie.embedding, iv.embedding)
+                       FROM text_embeddings te
+                       JOIN descriptions d ON d.id = te.id
+                       LEFT JOIN image_embeddings ie ON ie.id = te.id AND ie.model_name = te.model_name
+                       LEFT JOIN image_vectors iv ON iv.path = d.path AND iv.model_name = te.model_name
+                       WHERE te.model_name = :model AND te.id > :last_id AND NOT EXISTS (
+                           SELECT 1 FROM signatures s
+                           WHERE s.id = te.id AND s.model_name = te.model_name AND s.kind = :kind
+                       )
+                       ORDER BY te.id LIMIT :limit""",
+                    {"model": self.model_name, "kind": self.kind, "last_id": last_id, "limit": batch_size}
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                break
+            
+            text_signatures = self.encode(np.stack([np.frombuffer(r[1], dtype=np.float32) for r in rows]))
+            with_image = [i for i, r in enumerate(rows) if r[2] is not None]
+            image_signatures = {}
+            if with_image:
+                encoded = self.encode(np.stack([np.frombuffer(rows[i][2], dtype=np.float32) for i in with_image]))
+                image_signatures = dict(zip(with_image, encoded))
+            
+            with self.db.pool.write() as cursor:
+                cursor.executemany(
+                    """INSERT OR REPLACE INTO signatures
+                       (id, model_name, kind, text_signature, image_signature) VALUES (?, ?, ?, ?, ?)""",
+                    [
+                        (
+                            row[0], self.model_name, self.kind, text_signatures[i].tobytes(),
+                            image_signatures[i].tobytes() if i in image_signatures else None
+                        )
+                        for i, row in enumerate(rows)
+                    ]
+                )
+                self.db.bump_derived_version(cursor)
+            written += len(rows)
+            last_id = rows[-1][0]
+        
+        logger.info(f"Built {written} {self.kind} signatures for {self.model_name}")
+        return written
+    
+    def coverage(self) -> Tuple[int, int]:
+        """``(documents with a signature, documents with a text vector)`` for the model."""
+        with self.db.pool.read() as cursor:
+            cursor.execute(
+                "SELECT COUNT(*) FROM signatures WHERE model_name = ? AND kind = ?",
+                (self.model_name, self.kind)
+            )
+            signed = cursor.fetchone()[0]
+        total = self.db.get_stats()['embeddings_by_model'].get(self.model_name, {}).get('text', 0)
+        return signed, total
+
+
+def recall_report(
+    db: SQLiteVectorDB,
+    index: SignatureIndex,
+    text_queries: np.ndarray,
+    image_queries: Optional[np.ndarray] = None,
+    top_k: int = 10,
+    multiples: Sequence[int] = (1, 2, 5, 10, 20, 50),
+    combine_weights: Tuple[float, float] = (0.7, 0.3),
+    filter_class: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Measure cascade recall@k against exact search for several candidate multiples.
+    
+    Recall is the mean fraction of the exact top-``k`` ids that the cascade
+    also returns; latencies are the mean per query, in milliseconds.
+    """
+    from .retriever import SQLiteRetriever
+    
+    def run(query_index: int, cascade: Optional[SignatureIndex], multiple: int = 1):
+        retriever = SQLiteRetriever(
+            db.db_path,
+            text_queries[query_index],
+            image_queries[query_index] if image_queries is not None else None,
+            combine_weights=combine_weights,
+            pool=db.pool,
+            model_name=index.model_name,
+            cascade=cascade,
+            candidate_multiple=multiple
+        )
+        start = time.perf_counter()
+        ids = [d.metadata['id'] for d in retriever.get_relevant_documents(top_k, filter_class)]
+        return ids, time.perf_counter() - start
+    
+    exact, exact_seconds = [], 0.0
+    for i in range(len(text_queries)):
+        ids, seconds = run(i, None)
+        exact.append(set(ids))
+        exact_seconds += seconds
+    
+    report = {
+        'kind': index.kind,
+        'top_k': top_k,
+        'queries': len(text_queries),
+        'exact_ms': 1000.0 * exact_seconds / len(text_queries),
+        'multiples': [],
+    }
+    for multiple in multiples:
+        recall, seconds = 0.0, 0.0
+        for i in range(len(text_queries)):
+            ids, elapsed = run(i, index, multiple)
+            recall += len(exact[i].intersection(ids)) / max(len(exact[i]), 1)
+            seconds += elapsed
+        report['multiples'].append({
+            'candidate_multiple': multiple,
+            'recall': recall / len(text_queries),
+            'cascade_ms': 1000.0 * seconds / len(text_queries),
+        })
+    return report
@@ -0,0 +1,130 @@
+"""
+Zero-shot scene classification with cached class prompt embeddings.
+"""
+
+import time
+import hashlib
+import logging
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from .database import SQLiteVectorDB
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CLASSIFY_SECONDS = REGISTRY.histogram("classify_batch_seconds", "Duration of zero-shot classification batches")
+
+# Prompt ensemble for remote sensing scenes; ``{}`` is replaced by the class name.
+DEFAULT_TEMPLATES = [
+    "a satellite photo of {}.",
+    "an aerial photo of {}.",
+    "a remote sensing image of {}.",
+    "a satellite image showing {}.",
+    "an aerial view of {}.",
+    "a high resolution satellite image of {}.",
+]
+
+
+def prompt_set_key(templates: List[str]) -> str:
+    """Stable key of a template list, used to store its class vectors."""
+    return hashlib.sha1("\n".join(templates).encode("utf-8")).hexdigest()[:16]
+
+
+class ZeroShotClassifier:
+    """
+    Label images with the closest of a fixed set of class names.
+    
+    Each class is represented by the average CLIP text vector of its prompts
+    (``templates`` filled with the class name). The class matrix is computed
+    once, kept in memory and, with a ``db``, stored in its ``class_prompts``
+    table (unless the database is read-only) so other processes load it
+    instead of re-encoding the prompts.
+    Classifying a batch is then one image encoding pass and one matrix
+    product against the class matrix.
+    """
+    
+    def __init__(
+        self,
+        embedder,
+        class_names: List[str],
+        templates: Optional[List[str]] = None,
+        db: Optional[SQLiteVectorDB] = None,
+        batch_size: int = 32
+    ):
+        if not class_names:
+            raise ValueError("ZeroShotClassifier needs at least one class name")
+        self.embedder = embedder
+        self.class_names = list(class_names)
+        self.templates = list(templates or DEFAULT_TEMPLATES)
+        self.prompt_set = prompt_set_key(self.templates)
+        self.db = db
+        self.batch_size = batch_size
+        self._class_matrix = None
+    
+    @property
+    def class_matrix(self) -> np.ndarray:
+        """Normalized class vectors, one row per class name, loading or computing them once."""
+        if self._class_matrix is None:
+            model_name = self.embedder.model_name
+            stored = self.db.get_class_embeddings(model_name, self.prompt_set, self.class_names) if self.db else {}
+            missing = [name for name in self.class_names if name not in stored]
+            if missing:
+                start = time.perf_counter()
+                computed = dict(zip(missing, self.embedder.encode_class_prompts(missing, self.templates)))
+                logger.info(
+                    f"Encoded prompts of {len(missing)} classes x {len(self.templates)} templates "
+                    f"in {time.perf_counter() - start:.2f}s"
+                )
+                if self.db is not None and not self.db.read_only:
+                    self.db.add_class_embeddings(model_name, self.prompt_set, computed, len(self.templates))
+                stored.update(computed)
+            self._class_matrix = np.stack([stored[name] for name in self.class_names]).astype(np.float32)
+        return self._class_matrix
+    
+    def classify_embeddings(self, image_embeddings: np.ndarray, top_k: int = 1) -> List[Dict[str, Any]]:
+        """
+        Classify normalized image vectors, for example ones already stored.
+        
+        Each result has the best ``label``, its cosine ``score`` and the
+        ``top_k`` labels with softmax ``probabilities`` at CLIP's temperature.
+        """
+        image_embeddings = np.atleast_2d(np.asarray(image_embeddings, dtype=np.float32))
+        similarities = image_embeddings @ self.class_matrix.T
+        logits = similarities * getattr(self.embedder, 'logit_scale', 100.0)
+        logits -= logits.max(axis=1, keepdims=True)
+        probabilities = np.exp(logits)
+        probabilities /= probabilities.sum(axis=1, keepdims=True)
+        
+        top_k = min(top_k, len(self.class_names))
+        order = np.argsort(-similarities, axis=1, kind="stable")[:, :top_k]
+        return [
+            {
+                'label': self.class_names[row[0]],
+                'score': float(similarities[i, row[0]]),
+                'top_k': [
+                    {'label': self.class_names[j], 'score': float(similarities[i, j]),
+                     'probability': float(probabilities[i, j])}
+                    for j in row
+                ],
+            }
+            for i, row in enumerate(order)
+        ]
+    
+    def classify(
+        self,
+        images: List[Union[Image.Image, str]],
+        top_k: int = 1,
+        batch_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Classify images (PIL images or paths), ``batch_size`` per encoding pass."""
+        batch_size = batch_size or self.batch_size
+        results = []
+        for start in range(0, len(images), batch_size):
+            began = time.perf_counter()
+            embeddings = self.embedder.encode_image(list(images[start:start + batch_size]))
+            results.extend(self.classify_embeddings(embeddings, top_k=top_k))
+            CLASSIFY_SECONDS.observe(time.perf_counter() - began)
+        return results
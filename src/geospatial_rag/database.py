@@ -4,89 +4,655 @@ SQLite database operations for storing and retrieving embeddings.
 
 import os
 import sqlite3
+import hashlib
 import logging
-import time
-from typing import Dict, List, Optional, Any
+import threading
+from urllib.request import pathname2url
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple, Any
 import numpy as np
 import json
 
+from .metrics import REGISTRY
+
 logger = logging.getLogger(__name__)
 
+OPEN_CONNECTIONS = REGISTRY.gauge("db_open_connections", "Open SQLite connections", ["role"])
+WRITE_SECONDS = REGISTRY.histogram("db_write_seconds", "Duration of write transactions")
+
+# Page cache settings applied to read-only connections unless overridden.
+SERVING_MMAP_BYTES = 1 << 30
+SERVING_CACHE_KIB = 16 * 1024
+
+
+def make_document_id(text: str, image_path: str = "", doc_class: str = "document") -> str:
+    """
+    Build a deterministic, content-addressed document id.
+    
+    The id is a SHA-1 digest of the image path and caption text, so the same
+    document always maps to the same row no matter which process or machine
+    ingests it. The embedding model is recorded on the embedding rows rather
+    than in the id, so one description can carry vectors from several models.
+    """
+    digest = hashlib.sha1(f"{image_path}\x00{text}".encode("utf-8")).hexdigest()
+    return f"{doc_class}_{digest[:24]}"
+
+
+EMBEDDING_TABLE_DDL = """
+    CREATE TABLE {if_not_exists} {table} (
+        id TEXT,
+        embedding BLOB,
+        embedding_dim INTEGER,
+        model_name TEXT NOT NULL DEFAULT '',
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, model_name),
+        FOREIGN KEY (id) REFERENCES descriptions(id)
+    )
+"""
+
+
+STATS_TABLES_DDL = [
+    """CREATE TABLE IF NOT EXISTS db_stats (
+        name TEXT PRIMARY KEY,
+        value NUMERIC NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS class_stats (
+        class TEXT PRIMARY KEY,
+        documents INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS model_stats (
+        kind TEXT,
+        model_name TEXT,
+        embeddings INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (kind, model_name)
+    )""",
+]
+
+_TOUCH_STATS = """
+        UPDATE db_stats SET value = value + 1 WHERE name = 'write_version';
+        UPDATE db_stats SET value = (julianday('now') - 2440587.5) * 86400.0 WHERE name = 'last_write';
+"""
+
+# Vector tables counted in ``model_stats``, with the kind they are counted as.
+STATS_EMBEDDING_TABLES = (
+    ("text_embeddings", "text"),
+    ("image_embeddings", "image"),
+    ("image_vectors", "image_vector"),
+)
+
+STATS_TRIGGERS_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS stats_descriptions_insert AFTER INSERT ON descriptions BEGIN
+        UPDATE db_stats SET value = value + 1 WHERE name = 'documents';
+        INSERT INTO class_stats (class, documents) VALUES (COALESCE(NEW.class, ''), 1)
+            ON CONFLICT(class) DO UPDATE SET documents = documents + 1;{_TOUCH_STATS}    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS stats_descriptions_delete AFTER DELETE ON descriptions BEGIN
+        UPDATE db_stats SET value = value - 1 WHERE name = 'documents';
+        UPDATE class_stats SET documents = documents - 1 WHERE class = COALESCE(OLD.class, '');{_TOUCH_STATS}    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS stats_descriptions_update AFTER UPDATE ON descriptions BEGIN
+        UPDATE class_stats SET documents = documents - 1
+            WHERE class = COALESCE(OLD.class, '') AND OLD.class IS NOT NEW.class;
+        INSERT INTO class_stats (class, documents)
+            SELECT COALESCE(NEW.class, ''), 1 WHERE OLD.class IS NOT NEW.class
+            ON CONFLICT(class) DO UPDATE SET documents = documents + 1;{_TOUCH_STATS}    END""",
+] + [
+    statement
+    for table, kind in STATS_EMBEDDING_TABLES
+    for statement in (
+        f"""CREATE TRIGGER IF NOT EXISTS stats_{table}_insert AFTER INSERT ON {table} BEGIN
+        INSERT INTO model_stats (kind, model_name, embeddings) VALUES ('{kind}', NEW.model_name, 1)
+            ON CONFLICT(kind, model_name) DO UPDATE SET embeddings = embeddings + 1;{_TOUCH_STATS}    END""",
+        f"""CREATE TRIGGER IF NOT EXISTS stats_{table}_delete AFTER DELETE ON {table} BEGIN
+        UPDATE model_stats SET embeddings = embeddings - 1
+            WHERE kind = '{kind}' AND model_name = OLD.model_name;{_TOUCH_STATS}    END""",
+        f"""CREATE TRIGGER IF NOT EXISTS stats_{table}_update AFTER UPDATE ON {table} BEGIN
+        UPDATE model_stats SET embeddings = embeddings - 1
+            WHERE kind = '{kind}' AND model_name = OLD.model_name AND OLD.model_name IS NOT NEW.model_name;
+        INSERT INTO model_stats (kind, model_name, embeddings)
+            SELECT '{kind}', NEW.model_name, 1 WHERE OLD.model_name IS NOT NEW.model_name
+            ON CONFLICT(kind, model_name) DO UPDATE SET embeddings = embeddings + 1;{_TOUCH_STATS}    END""",
+    )
+]
+
+
+SIGNATURE_TABLES_DDL = [
+    """CREATE TABLE IF NOT EXISTS signatures (
+        id TEXT,
+        model_name TEXT,
+        kind TEXT,
+        text_signature BLOB,
+        image_signature BLOB,
+        PRIMARY KEY (id, model_name, kind)
+    )""",
+    """CREATE TABLE IF NOT EXISTS signature_models (
+        model_name TEXT,
+        kind TEXT,
+        dim INTEGER,
+        input_dim INTEGER,
+        components BLOB,
+        mean BLOB,
+        PRIMARY KEY (model_name, kind)
+    )""",
+    # A signature is stale as soon as the vector it summarizes changes.
+    """CREATE TRIGGER IF NOT EXISTS signatures_descriptions_delete AFTER DELETE ON descriptions BEGIN
+        DELETE FROM signatures WHERE id = OLD.id;
+    END""",
+] + [
+    f"""CREATE TRIGGER IF NOT EXISTS signatures_{table}_{event.lower()} AFTER {event} ON {table} BEGIN
+        DELETE FROM signatures WHERE id = OLD.id AND model_name = OLD.model_name;
+    END"""
+    for table in ("text_embeddings", "image_embeddings")
+    for event in ("UPDATE", "DELETE")
+] + [
+    """CREATE TRIGGER IF NOT EXISTS signatures_image_embeddings_insert AFTER INSERT ON image_embeddings BEGIN
+        DELETE FROM signatures WHERE id = NEW.id AND model_name = NEW.model_name;
+    END""",
+] + [
+    # A shared image vector is summarized in the signature of every caption of the image.
+    f"""CREATE TRIGGER IF NOT EXISTS signatures_image_vectors_{event.lower()} AFTER {event} ON image_vectors BEGIN
+        DELETE FROM signatures WHERE model_name = {row}.model_name
+            AND id IN (SELECT id FROM descriptions WHERE path = {row}.path);
+    END"""
+    for event, row in (("INSERT", "NEW"), ("UPDATE", "OLD"), ("DELETE", "OLD"))
+]
+
+
+KNN_TABLES_DDL = [
+    """CREATE TABLE IF NOT EXISTS knn_graph (
+        id TEXT,
+        model_name TEXT,
+        rank INTEGER,
+        neighbor_id TEXT,
+        similarity REAL,
+        PRIMARY KEY (id, model_name, rank)
+    )""",
+    """CREATE TABLE IF NOT EXISTS knn_graphs (
+        model_name TEXT PRIMARY KEY,
+        k INTEGER,
+        text_weight REAL,
+        image_weight REAL,
+        write_version INTEGER,
+        built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+]
+
+
+# Prompt-ensemble text vectors per class, keyed by a hash of the prompt templates.
+CLASS_PROMPTS_DDL = [
+    """CREATE TABLE IF NOT EXISTS class_prompts (
+        model_name TEXT,
+        prompt_set TEXT,
+        class_name TEXT,
+        embedding BLOB,
+        embedding_dim INTEGER,
+        prompts INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (model_name, prompt_set, class_name)
+    )""",
+]
+
+
+# Tables a read-only open relies on; they are only created by a read-write open.
+REQUIRED_TABLES = (
+    "descriptions", "text_embeddings", "image_embeddings", "image_vectors", "captions", "aliases",
+    "signatures", "signature_models", "knn_graph", "knn_graphs", "class_prompts",
+    "db_stats", "class_stats", "model_stats",
+)
+
+# Tables copied by ``SQLiteVectorDB.merge``, parents first. Signatures and the
+# k-NN graph are derived data and are not copied; they have to be built again
+# on the merged database.
+MERGE_TABLES = [
+    ("descriptions", ("id", "class", "description", "path", "metadata", "created_at")),
+    ("text_embeddings", ("id", "embedding", "embedding_dim", "model_name", "created_at")),
+    ("image_embeddings", ("id", "embedding", "embedding_dim", "model_name", "created_at")),
+    ("image_vectors", ("path", "model_name", "embedding", "embedding_dim", "created_at")),
+    ("captions", ("path", "model_name", "caption", "created_at")),
+    ("aliases", ("alias_id", "canonical_id", "alias_path", "canonical_path", "model_name",
+                 "similarity", "created_at")),
+    ("class_prompts", ("model_name", "prompt_set", "class_name", "embedding", "embedding_dim", "prompts",
+                       "created_at")),
+]
+
+
+class ConnectionPool:
+    """
+    Connection manager for a single SQLite database file.
+    
+    Each thread gets its own read connection and all writes go through one
+    writer connection guarded by a lock. The database runs in WAL mode, so
+    readers keep reading the last committed snapshot while a write is in
+    progress instead of blocking behind it.
+    
+    With ``read_only`` the file is opened through a ``mode=ro`` URI and no
+    writer is ever opened; ``immutable`` additionally tells SQLite the file
+    cannot change, so it skips locking and change detection altogether.
+    ``mmap_size`` (bytes) and ``cache_size`` (KiB) set the page access
+    PRAGMAs of every connection; read-only pools default to a 1 GiB memory
+    map, so pages are read straight from the OS page cache that every
+    serving process shares rather than copied into each connection's cache.
+    """
+    
+    def __init__(
+        self,
+        db_path: str,
+        timeout: float = 30.0,
+        read_only: bool = False,
+        immutable: bool = False,
+        mmap_size: Optional[int] = None,
+        cache_size: Optional[int] = None
+    ):
+        self.db_path = db_path
+        self.timeout = timeout
+        self.read_only = read_only or immutable
+        self.immutable = immutable
+        self.mmap_size = SERVING_MMAP_BYTES if mmap_size is None and self.read_only else mmap_size
+        self.cache_size = SERVING_CACHE_KIB if cache_size is None and self.read_only else cache_size
+        self._local = threading.local()
+        self._readers = {}
+        self._readers_lock = threading.Lock()
+        self._write_lock = threading.RLock()
+        self._writer = None
+        self._readers_opened = 0
+        self._closed = False
+    
+    def _open(self) -> sqlite3.Connection:
+        """Open a connection configured for concurrent WAL access, or read-only."""
+        if self.read_only:
+            uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+            if self.immutable:
+                uri += "&immutable=1"
+            connection = sqlite3.connect(uri, uri=True, timeout=self.timeout, check_same_thread=False)
+            connection.execute("PRAGMA query_only = 1")
+        else:
+            connection = sqlite3.connect(
+                self.db_path, timeout=self.timeout, check_same_thread=False
+            )
+        connection.row_factory = sqlite3.Row
+        connection.execute(f"PRAGMA busy_timeout = {int(self.timeout * 1000)}")
+        if self.mmap_size is not None:
+            connection.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        if self.cache_size is not None:
+            # Negative values are a size in KiB rather than a page count.
+            connection.execute(f"PRAGMA cache_size = {-int(self.cache_size)}")
+        return connection
+    
+    @property
+    def writer(self) -> sqlite3.Connection:
+        """The single shared write connection, opened on first use."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        if self.read_only:
+            raise sqlite3.OperationalError(f"Database is opened read-only: {self.db_path}")
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._open()
+                self._writer.execute("PRAGMA journal_mode = WAL")
+                self._writer.execute("PRAGMA synchronous = NORMAL")
+                OPEN_CONNECTIONS.inc(role="writer")
+                logger.debug(f"Opened writer connection: {self.db_path}")
+            return self._writer
+    
+    def reader(self) -> sqlite3.Connection:
+        """Return the calling thread's read connection, opening it if needed."""
+        if self._closed:
+            raise sqlite3.ProgrammingError("Connection pool is closed")
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Make sure the database is switched to WAL before the first read. Once
+            # the writer is open that has happened, so do not wait for its lock.
+            if not self.read_only and self._writer is None:
+                self.writer
+            connection = self._open()
+            self._local.connection = connection
+            with self._readers_lock:
+                self._prune_readers()
+                self._readers[threading.get_ident()] = (threading.current_thread(), connection)
+                self._readers_opened += 1
+            OPEN_CONNECTIONS.inc(role="reader")
+        return connection
+    
+    def _prune_readers(self):
+        """Close read connections left behind by threads that have exited."""
+        for ident, (thread, connection) in list(self._readers.items()):
+            if not thread.is_alive():
+                connection.close()
+                OPEN_CONNECTIONS.dec(role="reader")
+                del self._readers[ident]
+    
+    @contextmanager
+    def read(self) -> Iterator[sqlite3.Cursor]:
+        """Yield a cursor on the calling thread's read connection."""
+        cursor = self.reader().cursor()
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+    
+    @contextmanager
+    def write(self) -> Iterator[sqlite3.Cursor]:
+        """Yield a cursor inside a serialized write transaction on the writer."""
+        with self._write_lock, WRITE_SECONDS.time():
+            connection = self.writer
+            cursor = connection.cursor()
+            try:
+                yield cursor
+                connection.commit()
+            except Exception:
+                connection.rollback()
+                raise
+            finally:
+                cursor.close()
+    
+    def release_reader(self):
+        """Close the calling thread's read connection."""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            self._local.connection = None
+            with self._readers_lock:
+                self._readers.pop(threading.get_ident(), None)
+            connection.close()
+            OPEN_CONNECTIONS.dec(role="reader")
+    
+    def stats(self) -> Dict[str, int]:
+        """Report open and total connection counts."""
+        with self._readers_lock:
+            self._prune_readers()
+            return {
+                'open_readers': len(self._readers),
+                'readers_opened_total': self._readers_opened,
+                'writer_open': int(self._writer is not None),
+                'read_only': int(self.read_only),
+            }
+    
+    def close(self):
+        """Close every connection owned by the pool."""
+        with self._readers_lock:
+            for _, connection in self._readers.values():
+                connection.close()
+                OPEN_CONNECTIONS.dec(role="reader")
+            self._readers.clear()
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+                OPEN_CONNECTIONS.dec(role="writer")
+        self._closed = True
+        logger.debug(f"Connection pool closed: {self.db_path}")
+
 
 class SQLiteVectorDB:
     """SQLite-based vector database for storing and retrieving embeddings."""
     
-    def __init__(self, db_path: str, auto_create: bool = True):
+    def __init__(
+        self,
+        db_path: str,
+        auto_create: bool = True,
+        read_only: bool = False,
+        immutable: bool = False,
+        mmap_size: Optional[int] = None,
+        cache_size: Optional[int] = None
+    ):
+        """
+        Open (and by default create) the database at ``db_path``.
+        
+        ``read_only`` serves an existing database without ever writing to it:
+        no schema or trigger creation, ``mode=ro`` connections and memory-mapped
+        page reads (see ``ConnectionPool``). Use ``immutable`` only for
+        snapshots that no process writes while they are served.
+        """
         self.db_path = db_path
-        self.connection = None
+        self.read_only = read_only or immutable
+        self.immutable = immutable
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        self.pool = None
         
-        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        if self.read_only:
+            if not os.path.exists(db_path):
+                raise FileNotFoundError(f"Database not found: {db_path}")
+        else:
+            db_dir = os.path.dirname(db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
         self._connect()
         
-        if auto_create:
+        if auto_create and not self.read_only:
             self._create_tables()
+        elif self.read_only:
+            self._check_schema()
         
-        logger.info(f"SQLite vector database initialized: {db_path}")
+        logger.info(f"SQLite vector database initialized: {db_path}{' (read-only)' if self.read_only else ''}")
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
+    @property
+    def connection(self) -> Optional[sqlite3.Connection]:
+        """The writer connection, kept for code that used the old attribute."""
+        return self.pool.writer if self.pool else None
     
     def _connect(self):
         """Establish connection to the SQLite database."""
         try:
-            self.connection = sqlite3.connect(self.db_path, check_same_thread=False)
-            self.connection.row_factory = sqlite3.Row
+            self.pool = ConnectionPool(
+                self.db_path, read_only=self.read_only, immutable=self.immutable,
+                mmap_size=self.mmap_size, cache_size=self.cache_size
+            )
+            if self.read_only:
+                self.pool.reader()
+            else:
+                self.pool.writer
             logger.debug(f"Connected to database: {self.db_path}")
         except Exception as e:
             logger.error(f"Error connecting to database: {str(e)}")
             raise
     
+    def _check_schema(self):
+        """Fail early on a read-only open of a database that predates the current schema."""
+        with self.pool.read() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+            missing = sorted(set(REQUIRED_TABLES) - {row[0] for row in cursor.fetchall()})
+        if missing:
+            self.close()
+            raise sqlite3.OperationalError(
+                f"Database {self.db_path} lacks tables {', '.join(missing)}; "
+                "run a read-write open once to migrate it before serving it read-only"
+            )
+    
     def _create_tables(self):
         """Create database tables if they don't exist."""
-        cursor = self.connection.cursor()
-        
         try:
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS descriptions (
-                    id TEXT PRIMARY KEY,
-                    class TEXT,
-                    description TEXT,
-                    path TEXT,
-                    metadata TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS text_embeddings (
-                    id TEXT PRIMARY KEY,
-                    embedding BLOB,
-                    embedding_dim INTEGER,
-                    model_name TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (id) REFERENCES descriptions(id)
-                )
-            """)
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS image_embeddings (
-                    id TEXT PRIMARY KEY,
-                    embedding BLOB,
-                    embedding_dim INTEGER,
-                    model_name TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    FOREIGN KEY (id) REFERENCES descriptions(id)
-                )
-            """)
+            with self.pool.write() as cursor:
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS descriptions (
+                        id TEXT PRIMARY KEY,
+                        class TEXT,
+                        description TEXT,
+                        path TEXT,
+                        metadata TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                for table in ("text_embeddings", "image_embeddings"):
+                    cursor.execute(EMBEDDING_TABLE_DDL.format(table=table, if_not_exists="IF NOT EXISTS"))
+                    self._migrate_embedding_table(cursor, table)
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS captions (
+                        path TEXT,
+                        model_name TEXT,
+                        caption TEXT,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (path, model_name)
+                    )
+                """)
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS image_vectors (
+                        path TEXT,
+                        model_name TEXT,
+                        embedding BLOB,
+                        embedding_dim INTEGER,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                        PRIMARY KEY (path, model_name)
+                    )
+                """)
+                
+                cursor.execute("""
+                    CREATE TABLE IF NOT EXISTS aliases (
+                        alias_id TEXT PRIMARY KEY,
+                        canonical_id TEXT,
+                        alias_path TEXT,
+                        canonical_path TEXT,
+                        model_name TEXT,
+                        similarity REAL,
+                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                for statement in SIGNATURE_TABLES_DDL + KNN_TABLES_DDL + CLASS_PROMPTS_DDL:
+                    cursor.execute(statement)
+                
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_descriptions_class ON descriptions(class)')
+                cursor.execute('CREATE INDEX IF NOT EXISTS idx_descriptions_path ON descriptions(path)')
+                self._create_stats(cursor)
             
-            cursor.execute('CREATE INDEX IF NOT EXISTS idx_descriptions_class ON descriptions(class)')
-            
-            self.connection.commit()
             logger.debug("Database tables created successfully")
             
         except Exception as e:
             logger.error(f"Error creating tables: {str(e)}")
-            self.connection.rollback()
             raise
-        finally:
-            cursor.close()
+    
+    @staticmethod
+    def _keyed_by_id(cursor: sqlite3.Cursor, table: str) -> bool:
+        """Whether ``table`` still has the single-model primary key on ``id``."""
+        cursor.execute(f"PRAGMA table_info({table})")
+        return [row[1] for row in sorted(cursor.fetchall(), key=lambda r: r[5]) if row[5]] == ["id"]
+    
+    def _migrate_embedding_table(self, cursor: sqlite3.Cursor, table: str):
+        """
+        Rebuild an embedding table keyed by ``id`` alone into the multi-model layout.
+        
+        Older databases allowed one vector per document; the current schema keys
+        vectors by ``(id, model_name)`` so several CLIP models can coexist. The
+        rename, copy and drop run in one ``BEGIN IMMEDIATE`` transaction, so an
+        interrupted migration leaves the original table untouched.
+        """
+        if not self._keyed_by_id(cursor, table):
+            return
+        
+        connection = cursor.connection
+        if connection.in_transaction:
+            connection.commit()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated the table before we got the lock.
+            if self._keyed_by_id(cursor, table):
+                logger.info(f"Migrating {table} to per-model primary key")
+                cursor.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+                cursor.execute(EMBEDDING_TABLE_DDL.format(table=table, if_not_exists=""))
+                cursor.execute(f"""
+                    INSERT INTO {table} (id, embedding, embedding_dim, model_name, created_at)
+                    SELECT id, embedding, embedding_dim, COALESCE(model_name, ''), created_at
+                    FROM {table}_old
+                """)
+                cursor.execute(f"DROP TABLE {table}_old")
+            connection.commit()
+        except Exception:
+            connection.rollback()
+            raise
+    
+    def _create_stats(self, cursor: sqlite3.Cursor):
+        """
+        Create the trigger-maintained statistics tables.
+        
+        Counters are kept up to date by triggers on every insert, update and
+        delete, so ``get_stats`` never has to scan the corpus. Databases that
+        predate the tables are counted once here.
+        """
+        for statement in STATS_TABLES_DDL:
+            cursor.execute(statement)
+        
+        cursor.execute("SELECT 1 FROM db_stats WHERE name = 'documents'")
+        missing = cursor.fetchone() is None
+        # Databases from before image vectors were counted need one recount.
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'stats_image_vectors_insert'")
+        if missing or cursor.fetchone() is None:
+            self._rebuild_stats(cursor)
+        
+        for statement in STATS_TRIGGERS_DDL:
+            cursor.execute(statement)
+    
+    def _rebuild_stats(self, cursor: sqlite3.Cursor):
+        """Recompute every maintained counter from the underlying tables."""
+        cursor.execute("SELECT name, value FROM db_stats WHERE name IN ('write_version', 'derived_version')")
+        versions = dict(cursor.fetchall())
+        
+        cursor.execute("DELETE FROM db_stats")
+        cursor.execute("DELETE FROM class_stats")
+        cursor.execute("DELETE FROM model_stats")
+        cursor.execute(
+            """INSERT INTO db_stats (name, value)
+               SELECT 'documents', COUNT(*) FROM descriptions
+               UNION ALL SELECT 'write_version', ?
+               UNION ALL SELECT 'derived_version', ?
+               UNION ALL SELECT 'last_write', 0""",
+            (versions.get('write_version', 0), versions.get('derived_version', 0))
+        )
+        cursor.execute(
+            """INSERT INTO class_stats (class, documents)
+               SELECT COALESCE(class, ''), COUNT(*) FROM descriptions GROUP BY COALESCE(class, '')"""
+        )
+        for table, kind in STATS_EMBEDDING_TABLES:
+            cursor.execute(
+                f"""INSERT INTO model_stats (kind, model_name, embeddings)
+                    SELECT ?, model_name, COUNT(*) FROM {table} GROUP BY model_name""",
+                (kind,)
+            )
+    
+    def rebuild_stats(self):
+        """Resynchronize the maintained counters, e.g. after writes with triggers disabled."""
+        try:
+            with self.pool.write() as cursor:
+                self._rebuild_stats(cursor)
+        except Exception as e:
+            logger.error(f"Error rebuilding stats: {str(e)}")
+            raise
+    
+    def write_version(self) -> int:
+        """Counter bumped by every row written, usable to invalidate caches."""
+        with self.pool.read() as cursor:
+            cursor.execute("SELECT value FROM db_stats WHERE name = 'write_version'")
+            row = cursor.fetchone()
+            return int(row[0]) if row else 0
+    
+    @staticmethod
+    def bump_derived_version(cursor: sqlite3.Cursor):
+        """
+        Mark a write to derived data (signatures, captions, class prompts, the
+        k-NN graph) inside the caller's transaction.
+        
+        These tables have no stats triggers and do not move ``write_version``,
+        which would make a freshly built k-NN graph look stale.
+        """
+        cursor.execute(
+            """INSERT INTO db_stats (name, value) VALUES ('derived_version', 1)
+               ON CONFLICT(name) DO UPDATE SET value = value + 1"""
+        )
+    
+    def cache_version(self) -> Tuple[int, int]:
+        """``(write_version, derived_version)``: changes with any write that can change a query result."""
+        with self.pool.read() as cursor:
+            cursor.execute(
+                "SELECT name, value FROM db_stats WHERE name IN ('write_version', 'derived_version')"
+            )
+            versions = dict(cursor.fetchall())
+        return int(versions.get('write_version', 0)), int(versions.get('derived_version', 0))
     
     def add_document(
         self,
@@ -96,77 +662,659 @@ class SQLiteVectorDB:
         metadata: Optional[Dict] = None,
         doc_class: str = "document",
         image_path: str = "",
-        model_name: str = "openai/clip-vit-base-patch32"
+        model_name: str = "openai/clip-vit-base-patch32",
+        doc_id: Optional[str] = None
     ) -> str:
-        """Add a document with embeddings to the database."""
-        doc_id = f"{doc_class}_{int(time.time())}_{hash(text) % 10000}"
+        """
+        Add or update a document with embeddings in the database.
         
-        cursor = self.connection.cursor()
+        The id defaults to ``make_document_id`` of the text and image path, so
+        re-adding the same document updates its row in place.
+        """
+        if doc_id is None:
+            doc_id = make_document_id(text, image_path, doc_class)
+        
+        try:
+            with self.pool.write() as cursor:
+                self._write_document(
+                    cursor, doc_id, text, text_embedding, image_embedding,
+                    metadata, doc_class, image_path, model_name
+                )
+            logger.debug(f"Added document with ID: {doc_id}")
+            return doc_id
+            
+        except Exception as e:
+            logger.error(f"Error adding document: {str(e)}")
+            raise
+    
+    def add_documents(self, documents: List[Dict[str, Any]]) -> List[str]:
+        """
+        Add several documents in a single write transaction.
+        
+        Each item takes the keyword arguments of ``add_document``.
+        """
+        doc_ids = []
+        try:
+            with self.pool.write() as cursor:
+                for document in documents:
+                    doc_id = document.get('doc_id') or make_document_id(
+                        document['text'],
+                        document.get('image_path', ""),
+                        document.get('doc_class', "document")
+                    )
+                    self._write_document(
+                        cursor,
+                        doc_id,
+                        document['text'],
+                        document.get('text_embedding'),
+                        document.get('image_embedding'),
+                        document.get('metadata'),
+                        document.get('doc_class', "document"),
+                        document.get('image_path', ""),
+                        document.get('model_name', "openai/clip-vit-base-patch32")
+                    )
+                    doc_ids.append(doc_id)
+            logger.debug(f"Added {len(doc_ids)} documents")
+            return doc_ids
+            
+        except Exception as e:
+            logger.error(f"Error adding documents: {str(e)}")
+            raise
+    
+    def add_embeddings(
+        self,
+        model_name: str,
+        text_embeddings: Optional[Dict[str, np.ndarray]] = None,
+        image_embeddings: Optional[Dict[str, np.ndarray]] = None
+    ) -> int:
+        """
+        Store vectors for existing documents under ``model_name``.
         
+        Image vectors are keyed by document id like text vectors, and stored
+        once per image path as in ``add_document``.
+        """
+        rows = 0
         try:
+            with self.pool.write() as cursor:
+                for doc_id, embedding in (text_embeddings or {}).items():
+                    self._write_embedding(cursor, "text_embeddings", doc_id, embedding, model_name)
+                    rows += 1
+                for doc_id, embedding in (image_embeddings or {}).items():
+                    cursor.execute("SELECT path FROM descriptions WHERE id = ?", (doc_id,))
+                    row = cursor.fetchone()
+                    self._write_image(cursor, doc_id, row[0] if row else None, embedding, model_name)
+                    rows += 1
+            return rows
+            
+        except Exception as e:
+            logger.error(f"Error adding embeddings: {str(e)}")
+            raise
+    
+    def existing_ids(
+        self,
+        doc_ids: List[str],
+        model_name: str = "openai/clip-vit-base-patch32",
+        require_image: bool = False,
+        include_aliases: bool = False
+    ) -> set:
+        """
+        Return the subset of ids that already have embeddings for a model.
+        
+        Ingestion uses this to skip re-encoding unchanged documents; with
+        ``require_image`` an id only counts when its image vector is stored too,
+        and with ``include_aliases`` ids merged into a near-duplicate count too.
+        """
+        found = set()
+        condition = """AND (
+            EXISTS (SELECT 1 FROM image_embeddings ie WHERE ie.id = te.id AND ie.model_name = te.model_name)
+            OR EXISTS (
+                SELECT 1 FROM descriptions d JOIN image_vectors iv ON iv.path = d.path
+                WHERE d.id = te.id AND iv.model_name = te.model_name
+            )
+        )""" if require_image else ""
+        with self.pool.read() as cursor:
+            for start in range(0, len(doc_ids), 500):
+                chunk = doc_ids[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                cursor.execute(
+                    f"""SELECT te.id FROM text_embeddings te
+                        WHERE te.model_name = ? AND te.id IN ({placeholders}) {condition}""",
+                    [model_name, *chunk]
+                )
+                found.update(row[0] for row in cursor.fetchall())
+                if include_aliases:
+                    cursor.execute(f"SELECT alias_id FROM aliases WHERE alias_id IN ({placeholders})", chunk)
+                    found.update(row[0] for row in cursor.fetchall())
+        return found
+    
+    def get_embeddings(
+        self,
+        doc_id: str,
+        model_name: str = "openai/clip-vit-base-patch32"
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Return a stored document with its vectors for ``model_name``.
+        
+        The result has ``id``, ``class``, ``path``, ``text_embedding`` and
+        ``image_embedding`` (the shared per-image vector when the per-caption
+        copy was dropped); missing vectors are ``None``. Returns ``None`` for
+        an unknown id.
+        """
+        with self.pool.read() as cursor:
             cursor.execute(
-                """INSERT OR REPLACE INTO descriptions 
-                   (id, class, description, path, metadata) 
-                   VALUES (?, ?, ?, ?, ?)""",
-                (doc_id, doc_class, text, image_path, json.dumps(metadata or {}))
+                """SELECT d.id, d.class, d.path, te.embedding, COALESCE(ie.embedding, iv.embedding)
+                   FROM descriptions d
+                   LEFT JOIN text_embeddings te ON te.id = d.id AND te.model_name = :model
+                   LEFT JOIN image_embeddings ie ON ie.id = d.id AND ie.model_name = :model
+                   LEFT JOIN image_vectors iv ON iv.path = d.path AND iv.model_name = :model
+                   WHERE d.id = :id""",
+                {"id": doc_id, "model": model_name}
             )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return {
+            'id': row[0],
+            'class': row[1],
+            'path': row[2],
+            'text_embedding': np.frombuffer(row[3], dtype=np.float32) if row[3] is not None else None,
+            'image_embedding': np.frombuffer(row[4], dtype=np.float32) if row[4] is not None else None,
+        }
+    
+    def _delete_documents(self, cursor: sqlite3.Cursor, doc_ids: List[str]) -> int:
+        deleted = 0
+        for start in range(0, len(doc_ids), 500):
+            chunk = doc_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for table in ("text_embeddings", "image_embeddings"):
+                cursor.execute(f"DELETE FROM {table} WHERE id IN ({placeholders})", chunk)
+            cursor.execute(f"DELETE FROM descriptions WHERE id IN ({placeholders})", chunk)
+            deleted += cursor.rowcount
+        return deleted
+    
+    def delete_documents(self, doc_ids: List[str]) -> int:
+        """Delete documents together with their vectors under every model."""
+        try:
+            with self.pool.write() as cursor:
+                deleted = self._delete_documents(cursor, doc_ids)
+            logger.debug(f"Deleted {deleted} documents")
+            return deleted
+            
+        except Exception as e:
+            logger.error(f"Error deleting documents: {str(e)}")
+            raise
+    
+    def _write_aliases(self, cursor: sqlite3.Cursor, aliases: List[Dict[str, Any]]):
+        cursor.executemany(
+            """INSERT OR REPLACE INTO aliases
+               (alias_id, canonical_id, alias_path, canonical_path, model_name, similarity)
+               VALUES (:alias_id, (SELECT MIN(id) FROM descriptions WHERE path = :canonical_path),
+                       :alias_path, :canonical_path, :model_name, :similarity)""",
+            aliases
+        )
+        # Aliases of a document that has just been folded itself follow it to its canonical.
+        cursor.execute(
+            """UPDATE aliases SET
+                   canonical_id = (SELECT a.canonical_id FROM aliases a WHERE a.alias_id = aliases.canonical_id),
+                   canonical_path = (SELECT a.canonical_path FROM aliases a WHERE a.alias_id = aliases.canonical_id)
+               WHERE canonical_id IN (SELECT alias_id FROM aliases)"""
+        )
+    
+    def add_aliases(self, aliases: List[Dict[str, Any]]) -> int:
+        """
+        Record documents merged into a near-duplicate image.
+        
+        Each item has ``alias_id``, ``alias_path``, ``canonical_path``,
+        ``model_name`` and ``similarity``; the canonical id is the first stored
+        document of ``canonical_path``. Existing aliases of the new alias ids
+        are re-pointed to the new canonical.
+        """
+        try:
+            with self.pool.write() as cursor:
+                self._write_aliases(cursor, aliases)
+            return len(aliases)
             
-            if text_embedding is not None:
-                embedding_bytes = text_embedding.astype(np.float32).tobytes()
+        except Exception as e:
+            logger.error(f"Error adding aliases: {str(e)}")
+            raise
+    
+    def fold_duplicates(self, aliases: List[Dict[str, Any]], paths: List[str]) -> int:
+        """
+        Fold the documents of duplicate images into their canonical image in one transaction.
+        
+        ``aliases`` are recorded as in ``add_aliases``, then their documents
+        are deleted together with the captions and shared image vectors of
+        ``paths``. Returns the number of documents deleted.
+        """
+        try:
+            with self.pool.write() as cursor:
+                self._write_aliases(cursor, aliases)
+                deleted = self._delete_documents(cursor, [alias['alias_id'] for alias in aliases])
+                for start in range(0, len(paths), 500):
+                    chunk = paths[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    cursor.execute(f"DELETE FROM image_vectors WHERE path IN ({placeholders})", chunk)
+                    cursor.execute(f"DELETE FROM captions WHERE path IN ({placeholders})", chunk)
+            return deleted
+            
+        except Exception as e:
+            logger.error(f"Error folding duplicates: {str(e)}")
+            raise
+    
+    def resolve_alias(self, doc_id: str) -> str:
+        """The canonical id a merged document was folded into, or ``doc_id`` itself."""
+        with self.pool.read() as cursor:
+            cursor.execute("SELECT canonical_id FROM aliases WHERE alias_id = ?", (doc_id,))
+            row = cursor.fetchone()
+            return row[0] if row and row[0] else doc_id
+    
+    def _write_document(
+        self,
+        cursor: sqlite3.Cursor,
+        doc_id: str,
+        text: str,
+        text_embedding: Optional[np.ndarray],
+        image_embedding: Optional[np.ndarray],
+        metadata: Optional[Dict],
+        doc_class: str,
+        image_path: str,
+        model_name: str
+    ):
+        """
+        Upsert a document and its embeddings on a write cursor.
+        
+        Rows whose content is unchanged are left untouched, so re-running an
+        ingestion over the same data does not rewrite anything.
+        """
+        cursor.execute(
+            """INSERT INTO descriptions 
+               (id, class, description, path, metadata) 
+               VALUES (?, ?, ?, ?, ?)
+               ON CONFLICT(id) DO UPDATE SET
+                   class = excluded.class,
+                   description = excluded.description,
+                   path = excluded.path,
+                   metadata = excluded.metadata
+               WHERE descriptions.class IS NOT excluded.class
+                  OR descriptions.description IS NOT excluded.description
+                  OR descriptions.path IS NOT excluded.path
+                  OR descriptions.metadata IS NOT excluded.metadata""",
+            (doc_id, doc_class, text, image_path, json.dumps(metadata or {}))
+        )
+        
+        if text_embedding is not None:
+            self._write_embedding(cursor, "text_embeddings", doc_id, text_embedding, model_name)
+        if image_embedding is not None:
+            self._write_image(cursor, doc_id, image_path, image_embedding, model_name)
+    
+    def _write_image(self, cursor: sqlite3.Cursor, doc_id: str, image_path: Optional[str],
+                     embedding: np.ndarray, model_name: str):
+        """
+        Store a document's image vector once per image: under its path in
+        ``image_vectors``, or per document when it has no path.
+        """
+        if not image_path:
+            self._write_embedding(cursor, "image_embeddings", doc_id, embedding, model_name)
+            return
+        self._write_image_vector(cursor, image_path, embedding, model_name)
+        # A per-caption copy from an older write would shadow the shared vector.
+        cursor.execute(
+            "DELETE FROM image_embeddings WHERE id = ? AND model_name = ?", (doc_id, model_name)
+        )
+    
+    def _write_image_vector(self, cursor: sqlite3.Cursor, image_path: str, embedding: np.ndarray, model_name: str):
+        """Upsert the single shared vector of an image, used by image-grouped retrieval."""
+        embedding_bytes = embedding.astype(np.float32).tobytes()
+        cursor.execute(
+            """INSERT INTO image_vectors (path, embedding, embedding_dim, model_name)
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(path, model_name) DO UPDATE SET
+                   embedding = excluded.embedding,
+                   embedding_dim = excluded.embedding_dim
+               WHERE image_vectors.embedding IS NOT excluded.embedding""",
+            (image_path, embedding_bytes, len(embedding), model_name)
+        )
+    
+    def group_image_embeddings(self, model_name: Optional[str] = None, drop_duplicates: bool = False) -> Dict[str, int]:
+        """
+        Store each image's vector once per path in ``image_vectors``.
+        
+        Datasets like RSICD repeat the same image vector on every caption row.
+        This backfills ``image_vectors`` from those rows; with
+        ``drop_duplicates`` the per-caption copies are deleted afterwards, and
+        retrieval reads the shared vector by path instead.
+        """
+        model_filter = "AND ie.model_name = ?" if model_name else ""
+        params = [model_name] if model_name else []
+        try:
+            with self.pool.write() as cursor:
                 cursor.execute(
-                    """INSERT OR REPLACE INTO text_embeddings 
-                       (id, embedding, embedding_dim, model_name) 
-                       VALUES (?, ?, ?, ?)""",
-                    (doc_id, embedding_bytes, len(text_embedding), model_name)
+                    f"""INSERT OR IGNORE INTO image_vectors (path, model_name, embedding, embedding_dim)
+                        SELECT d.path, ie.model_name, ie.embedding, ie.embedding_dim
+                        FROM image_embeddings ie JOIN descriptions d ON d.id = ie.id
+                        WHERE COALESCE(d.path, '') != '' {model_filter}
+                        GROUP BY d.path, ie.model_name""",
+                    params
                 )
+                grouped = cursor.rowcount
+                dropped = 0
+                if drop_duplicates:
+                    cursor.execute(
+                        f"""DELETE FROM image_embeddings WHERE rowid IN (
+                            SELECT ie.rowid FROM image_embeddings ie
+                            JOIN descriptions d ON d.id = ie.id
+                            JOIN image_vectors iv ON iv.path = d.path AND iv.model_name = ie.model_name
+                            WHERE iv.embedding = ie.embedding {model_filter}
+                        )""",
+                        params
+                    )
+                    dropped = cursor.rowcount
+            logger.info(f"Grouped {grouped} image vectors, dropped {dropped} per-caption copies")
+            return {'image_vectors': grouped, 'dropped': dropped}
             
-            if image_embedding is not None:
-                embedding_bytes = image_embedding.astype(np.float32).tobytes()
-                cursor.execute(
-                    """INSERT OR REPLACE INTO image_embeddings 
-                       (id, embedding, embedding_dim, model_name) 
-                       VALUES (?, ?, ?, ?)""",
-                    (doc_id, embedding_bytes, len(image_embedding), model_name)
+        except Exception as e:
+            logger.error(f"Error grouping image embeddings: {str(e)}")
+            raise
+    
+    def _write_embedding(
+        self,
+        cursor: sqlite3.Cursor,
+        table: str,
+        doc_id: str,
+        embedding: np.ndarray,
+        model_name: str
+    ):
+        """Upsert one vector into an embedding table."""
+        embedding_bytes = embedding.astype(np.float32).tobytes()
+        cursor.execute(
+            f"""INSERT INTO {table} 
+               (id, embedding, embedding_dim, model_name) 
+               VALUES (?, ?, ?, ?)
+               ON CONFLICT(id, model_name) DO UPDATE SET
+                   embedding = excluded.embedding,
+                   embedding_dim = excluded.embedding_dim
+               WHERE {table}.embedding IS NOT excluded.embedding""",
+            (doc_id, embedding_bytes, len(embedding), model_name)
+        )
+    
+    def add_captions(self, model_name: str, captions: Dict[str, str]) -> int:
+        """Store generated captions keyed by image path."""
+        try:
+            with self.pool.write() as cursor:
+                cursor.executemany(
+                    """INSERT INTO captions (path, model_name, caption) VALUES (?, ?, ?)
+                       ON CONFLICT(path, model_name) DO UPDATE SET caption = excluded.caption""",
+                    [(path, model_name, caption) for path, caption in captions.items()]
                 )
+                self.bump_derived_version(cursor)
+            return len(captions)
             
-            self.connection.commit()
-            logger.debug(f"Added document with ID: {doc_id}")
-            return doc_id
+        except Exception as e:
+            logger.error(f"Error adding captions: {str(e)}")
+            raise
+    
+    def get_caption(self, path: str, model_name: str) -> Optional[str]:
+        """Return the stored caption of an image, if one was precomputed."""
+        with self.pool.read() as cursor:
+            cursor.execute(
+                "SELECT caption FROM captions WHERE path = ? AND model_name = ?", (path, model_name)
+            )
+            row = cursor.fetchone()
+            return row[0] if row else None
+    
+    def add_class_embeddings(self, model_name: str, prompt_set: str, embeddings: Dict[str, np.ndarray],
+                             prompts: int) -> int:
+        """Store the prompt-ensemble vector of each class for a model and prompt set."""
+        try:
+            with self.pool.write() as cursor:
+                cursor.executemany(
+                    """INSERT OR REPLACE INTO class_prompts
+                       (model_name, prompt_set, class_name, embedding, embedding_dim, prompts)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    [
+                        (model_name, prompt_set, name, np.asarray(vector, dtype=np.float32).tobytes(),
+                         len(vector), prompts)
+                        for name, vector in embeddings.items()
+                    ]
+                )
+                self.bump_derived_version(cursor)
+            return len(embeddings)
             
         except Exception as e:
-            logger.error(f"Error adding document: {str(e)}")
-            self.connection.rollback()
+            logger.error(f"Error adding class embeddings: {str(e)}")
             raise
-        finally:
-            cursor.close()
+    
+    def get_class_embeddings(self, model_name: str, prompt_set: str,
+                             class_names: List[str]) -> Dict[str, np.ndarray]:
+        """Stored prompt-ensemble vectors of those ``class_names`` that have one."""
+        embeddings = {}
+        with self.pool.read() as cursor:
+            for start in range(0, len(class_names), 500):
+                chunk = class_names[start:start + 500]
+                cursor.execute(
+                    f"""SELECT class_name, embedding FROM class_prompts
+                        WHERE model_name = ? AND prompt_set = ? AND class_name IN ({",".join("?" * len(chunk))})""",
+                    (model_name, prompt_set, *chunk)
+                )
+                embeddings.update(
+                    (name, np.frombuffer(blob, dtype=np.float32)) for name, blob in cursor.fetchall()
+                )
+        return embeddings
+    
+    def uncaptioned_paths(self, model_name: str, after: str = "", limit: int = 100) -> List[str]:
+        """Distinct stored image paths without a caption from ``model_name``, in path order."""
+        with self.pool.read() as cursor:
+            cursor.execute(
+                """SELECT DISTINCT d.path FROM descriptions d
+                   WHERE d.path > ? AND NOT EXISTS (
+                       SELECT 1 FROM captions c WHERE c.path = d.path AND c.model_name = ?
+                   )
+                   ORDER BY d.path LIMIT ?""",
+                (after, model_name, limit)
+            )
+            return [row[0] for row in cursor.fetchall()]
+    
+    def count_uncaptioned_paths(self, model_name: str) -> int:
+        """Number of distinct stored image paths still missing a caption."""
+        with self.pool.read() as cursor:
+            cursor.execute(
+                """SELECT COUNT(DISTINCT d.path) FROM descriptions d
+                   WHERE d.path != '' AND NOT EXISTS (
+                       SELECT 1 FROM captions c WHERE c.path = d.path AND c.model_name = ?
+                   )""",
+                (model_name,)
+            )
+            return cursor.fetchone()[0]
+    
+    def file_bytes(self) -> int:
+        """Size of the database file plus its write-ahead log on disk."""
+        return sum(
+            os.path.getsize(path) for path in (self.db_path, f"{self.db_path}-wal") if os.path.exists(path)
+        )
+    
+    def optimize(self, vacuum: bool = True) -> Dict[str, int]:
+        """
+        Rebuild indexes and statistics, then reclaim free pages.
+        
+        Runs ``REINDEX`` and ``ANALYZE``, resynchronizes the maintained
+        counters, checkpoints the WAL and, with ``vacuum``, rewrites the file
+        with ``VACUUM``. Returns the on-disk size before and after.
+        """
+        bytes_before = self.file_bytes()
+        try:
+            with self.pool.write() as cursor:
+                cursor.execute("REINDEX")
+                cursor.execute("ANALYZE")
+                self._rebuild_stats(cursor)
+            
+            with self.pool.write() as cursor:
+                if vacuum:
+                    cursor.execute("VACUUM")
+                cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except Exception as e:
+            logger.error(f"Error optimizing database: {str(e)}")
+            raise
+        
+        bytes_after = self.file_bytes()
+        logger.info(f"Optimized database: {bytes_before} -> {bytes_after} bytes")
+        return {
+            'bytes_before': bytes_before,
+            'bytes_after': bytes_after,
+            'bytes_reclaimed': bytes_before - bytes_after,
+        }
+    
+    def merge(self, partial_paths: List[str], optimize: bool = True,
+              rebuild_derived: bool = True) -> Dict[str, Any]:
+        """
+        Copy the rows of partial databases into this one.
+        
+        Each partial file is attached and copied table by table with a bulk
+        ``INSERT OR IGNORE ... SELECT``; ids are content-addressed, so a
+        document ingested by several nodes is kept once (the first partial
+        wins). Every partial is merged in one ``BEGIN IMMEDIATE`` transaction
+        that suspends the statistics triggers, copies the rows and rebuilds
+        the counters, and the writer lock is held for the whole merge, so no
+        other write can land while the triggers are down. Signatures and
+        k-NN graphs are not copied; with ``rebuild_derived`` every signature
+        kind and graph found in this database or the partials is rebuilt
+        over the merged rows. With ``optimize``, indexes and planner
+        statistics are refreshed afterwards.
+        """
+        report = {'partials': len(partial_paths), 'rows': {table: 0 for table, _ in MERGE_TABLES}}
+        signature_kinds, graphs = set(), {}
+        try:
+            with self.pool.write() as cursor:
+                connection = cursor.connection
+                self._collect_derived(cursor, "main", signature_kinds, graphs)
+                for path in partial_paths:
+                    if not os.path.exists(path):
+                        raise FileNotFoundError(f"Partial database not found: {path}")
+                    # ATTACH and DETACH are not allowed inside a transaction.
+                    cursor.execute("ATTACH DATABASE ? AS part", (path,))
+                    try:
+                        cursor.execute("BEGIN IMMEDIATE")
+                        try:
+                            self._merge_partial(cursor, report)
+                            connection.commit()
+                        except Exception:
+                            connection.rollback()
+                            raise
+                        self._collect_derived(cursor, "part", signature_kinds, graphs)
+                    finally:
+                        cursor.execute("DETACH DATABASE part")
+                    logger.info(f"Merged partial database {path}")
+        except Exception as e:
+            logger.error(f"Error merging databases: {str(e)}")
+            raise
+        
+        if rebuild_derived:
+            report.update(self._rebuild_derived(signature_kinds, graphs))
+        if optimize:
+            report.update(self.optimize(vacuum=False))
+        return report
+    
+    def _merge_partial(self, cursor: sqlite3.Cursor, report: Dict[str, Any]):
+        """Copy the attached ``part`` database with the statistics triggers suspended."""
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'stats_%'")
+        for (name,) in cursor.fetchall():
+            cursor.execute(f"DROP TRIGGER {name}")
+        for table, columns in MERGE_TABLES:
+            cursor.execute("SELECT 1 FROM part.sqlite_master WHERE type = 'table' AND name = ?", (table,))
+            if cursor.fetchone() is None:
+                continue
+            column_list = ", ".join(columns)
+            cursor.execute(
+                f"INSERT OR IGNORE INTO main.{table} ({column_list}) SELECT {column_list} FROM part.{table}"
+            )
+            report['rows'][table] += cursor.rowcount
+        for statement in STATS_TRIGGERS_DDL:
+            cursor.execute(statement)
+        self._rebuild_stats(cursor)
+        cursor.execute("UPDATE db_stats SET value = value + 1 WHERE name = 'write_version'")
+    
+    @staticmethod
+    def _collect_derived(cursor: sqlite3.Cursor, schema: str, signature_kinds: set, graphs: Dict[str, tuple]):
+        """Add the signature kinds and k-NN graphs built in ``schema`` to the sets to rebuild."""
+        cursor.execute(f"SELECT name FROM {schema}.sqlite_master WHERE type = 'table'")
+        tables = {row[0] for row in cursor.fetchall()}
+        if "signatures" in tables:
+            cursor.execute(f"SELECT DISTINCT model_name, kind FROM {schema}.signatures")
+            signature_kinds.update(tuple(row) for row in cursor.fetchall())
+        if "signature_models" in tables:
+            cursor.execute(f"SELECT model_name, kind FROM {schema}.signature_models")
+            signature_kinds.update(tuple(row) for row in cursor.fetchall())
+        if "knn_graphs" in tables:
+            cursor.execute(f"SELECT model_name, k, text_weight, image_weight FROM {schema}.knn_graphs")
+            for model_name, k, text_weight, image_weight in cursor.fetchall():
+                graphs.setdefault(model_name, (k, (text_weight, image_weight)))
+    
+    def _rebuild_derived(self, signature_kinds: set, graphs: Dict[str, tuple]) -> Dict[str, Any]:
+        """Rebuild cascade signatures and k-NN graphs over the merged rows."""
+        from .cascade import SignatureIndex
+        from .knn import NeighborGraph
+        
+        rebuilt = {'signatures': 0, 'knn_graphs': 0}
+        for model_name, kind in sorted(signature_kinds):
+            rebuilt['signatures'] += SignatureIndex(self, model_name, kind=kind).build()
+        for model_name, (k, weights) in sorted(graphs.items()):
+            NeighborGraph(self, model_name, weights).build(k=k)
+            rebuilt['knn_graphs'] += 1
+        return rebuilt
     
     def get_stats(self) -> Dict[str, Any]:
-        """Get database statistics."""
-        cursor = self.connection.cursor()
+        """
+        Get database statistics.
         
+        Everything is read from the trigger-maintained stats tables and SQLite
+        pragmas, so the cost does not grow with the size of the corpus.
+        """
         try:
             stats = {}
             
-            cursor.execute("SELECT COUNT(*) FROM descriptions")
-            stats['total_documents'] = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM text_embeddings")
-            stats['total_text_embeddings'] = cursor.fetchone()[0]
+            with self.pool.read() as cursor:
+                cursor.execute("SELECT name, value FROM db_stats")
+                counters = {row[0]: row[1] for row in cursor.fetchall()}
+                
+                cursor.execute("SELECT class, documents FROM class_stats WHERE documents > 0 ORDER BY class")
+                documents_by_class = {row[0]: row[1] for row in cursor.fetchall()}
+                
+                cursor.execute(
+                    "SELECT kind, model_name, embeddings FROM model_stats WHERE embeddings > 0 ORDER BY model_name"
+                )
+                embeddings_by_model = {}
+                for kind, model_name, count in cursor.fetchall():
+                    embeddings_by_model.setdefault(model_name, {'text': 0, 'image': 0, 'image_vector': 0})[kind] = count
+                
+                cursor.execute("PRAGMA page_count")
+                page_count = cursor.fetchone()[0]
+                cursor.execute("PRAGMA page_size")
+                page_size = cursor.fetchone()[0]
             
-            cursor.execute("SELECT COUNT(*) FROM image_embeddings")
-            stats['total_image_embeddings'] = cursor.fetchone()[0]
+            last_write = counters.get('last_write') or None
+            wal_path = f"{self.db_path}-wal"
             
+            stats['total_documents'] = int(counters.get('documents', 0))
+            stats['total_text_embeddings'] = sum(m['text'] for m in embeddings_by_model.values())
+            stats['total_image_embeddings'] = sum(m['image'] for m in embeddings_by_model.values())
+            stats['total_image_vectors'] = sum(m['image_vector'] for m in embeddings_by_model.values())
+            stats['documents_by_class'] = documents_by_class
+            stats['embeddings_by_model'] = embeddings_by_model
+            stats['db_bytes'] = page_count * page_size
+            stats['wal_bytes'] = os.path.getsize(wal_path) if os.path.exists(wal_path) else 0
+            stats['last_write'] = (
+                datetime.fromtimestamp(last_write, tz=timezone.utc).isoformat() if last_write else None
+            )
+            stats['write_version'] = int(counters.get('write_version', 0))
+            stats['connections'] = self.pool.stats()
             return stats
             
         except Exception as e:
             logger.error(f"Error getting database stats: {str(e)}")
             raise
-        finally:
-            cursor.close()
     
     def close(self):
-        """Close the database connection."""
-        if self.connection:
-            self.connection.close()
-            self.connection = None
+        """Close the database connections."""
+        if self.pool:
+            self.pool.close()
+            self.pool = None
             logger.debug("Database connection closed")
@@ -0,0 +1,292 @@
+"""
+Near-duplicate image detection and database compaction.
+
+Overlapping tiles and re-exported scenes produce images whose CLIP vectors
+are almost identical. Images are compared by cosine similarity of their
+stored vectors, one per path; pairs above a threshold are clustered and
+each cluster keeps a single canonical image, with the documents of the
+others recorded as aliases of it.
+
+Example:
+    python -m geospatial_rag.dedup path/to/db.db --threshold 0.98
+"""
+
+import argparse
+import json
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .database import SQLiteVectorDB
+
+logger = logging.getLogger(__name__)
+
+
+class _UnionFind:
+    """Disjoint sets over ``0..n-1`` with path halving."""
+    
+    def __init__(self, n: int):
+        self.parent = list(range(n))
+    
+    def find(self, i: int) -> int:
+        while self.parent[i] != i:
+            self.parent[i] = self.parent[self.parent[i]]
+            i = self.parent[i]
+        return i
+    
+    def union(self, i: int, j: int):
+        root_i, root_j = self.find(i), self.find(j)
+        if root_i != root_j:
+            self.parent[max(root_i, root_j)] = min(root_i, root_j)
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.atleast_2d(np.asarray(matrix, dtype=np.float32))
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+
+def similar_pairs(
+    matrix: np.ndarray,
+    threshold: float = 0.98,
+    block_size: int = 2048
+) -> Iterator[Tuple[int, int, float]]:
+    """
+    Yield ``(i, j, similarity)`` for every row pair with ``i < j`` above ``threshold``.
+    
+    Rows are compared a block at a time against the rows after the block
+    start, so memory stays at ``block_size * n`` similarities while the
+    comparisons are exact.
+    """
+    matrix = _normalize(matrix)
+    for start in range(0, len(matrix), block_size):
+        block = matrix[start:start + block_size]
+        similarities = block @ matrix[start:].T
+        rows, cols = np.nonzero(similarities >= threshold)
+        for row, col in zip(rows.tolist(), cols.tolist()):
+            if col > row:
+                yield start + row, start + col, float(similarities[row, col])
+
+
+def cluster_vectors(matrix: np.ndarray, threshold: float = 0.98, block_size: int = 2048) -> List[List[int]]:
+    """
+    Group rows connected by a similarity above ``threshold``.
+    
+    Clusters are the connected components of the similarity graph, so a chain
+    of near-duplicates ends up in one cluster. Only clusters with more than
+    one row are returned, each sorted by row index.
+    """
+    sets = _UnionFind(len(matrix))
+    for i, j, _ in similar_pairs(matrix, threshold, block_size):
+        sets.union(i, j)
+    
+    clusters = {}
+    for i in range(len(matrix)):
+        clusters.setdefault(sets.find(i), []).append(i)
+    return [members for members in clusters.values() if len(members) > 1]
+
+
+def load_image_vectors(db: SQLiteVectorDB, model_name: str) -> Tuple[List[str], np.ndarray]:
+    """Stored image paths with one vector each for ``model_name``."""
+    vectors = {}
+    with db.pool.read() as cursor:
+        cursor.execute(
+            """SELECT d.path, ie.embedding FROM image_embeddings ie
+               JOIN descriptions d ON d.id = ie.id
+               WHERE ie.model_name = ? AND COALESCE(d.path, '') != ''
+               GROUP BY d.path""",
+            (model_name,)
+        )
+        vectors.update((row[0], row[1]) for row in cursor.fetchall())
+        cursor.execute("SELECT path, embedding FROM image_vectors WHERE model_name = ?", (model_name,))
+        vectors.update((row[0], row[1]) for row in cursor.fetchall())
+    
+    paths = sorted(vectors)
+    if not paths:
+        return [], np.zeros((0, 0), dtype=np.float32)
+    matrix = np.frombuffer(b"".join(vectors[path] for path in paths), dtype=np.float32)
+    return paths, matrix.reshape(len(paths), -1)
+
+
+def find_duplicates(
+    db: SQLiteVectorDB,
+    model_name: str,
+    threshold: float = 0.98,
+    block_size: int = 2048
+) -> List[Dict[str, Any]]:
+    """
+    Cluster the stored images of a model into near-duplicate groups.
+    
+    The canonical image of a cluster is the one with the most documents
+    (ties go to the smallest path). Each group is
+    ``{'canonical': path, 'duplicates': [(path, similarity), ...]}`` with
+    the similarity measured against the canonical image.
+    """
+    paths, matrix = load_image_vectors(db, model_name)
+    if not paths:
+        return []
+    
+    with db.pool.read() as cursor:
+        cursor.execute("SELECT path, COUNT(*) FROM descriptions WHERE COALESCE(path, '') != '' GROUP BY path")
+        documents = {row[0]: row[1] for row in cursor.fetchall()}
+    
+    normalized = _normalize(matrix)
+    groups = []
+    for members in cluster_vectors(normalized, threshold, block_size):
+        canonical = min(members, key=lambda i: (-documents.get(paths[i], 0), paths[i]))
+        similarities = normalized[members] @ normalized[canonical]
+        groups.append({
+            'canonical': paths[canonical],
+            'duplicates': [
+                (paths[i], float(similarity))
+                for i, similarity in zip(members, similarities) if i != canonical
+            ],
+        })
+    return groups
+
+
+def compact(
+    db: SQLiteVectorDB,
+    model_name: str,
+    threshold: float = 0.98,
+    block_size: int = 2048,
+    vacuum: bool = True,
+    dry_run: bool = False
+) -> Dict[str, Any]:
+    """
+    Fold near-duplicate images into their canonical image and reclaim space.
+    
+    Documents of every duplicate image are recorded in ``aliases`` against
+    the canonical image and deleted with their vectors, captions and shared
+    image vector. Indexes and statistics are then rebuilt and the file is
+    vacuumed. ``dry_run`` only reports what would be removed.
+    """
+    start = time.perf_counter()
+    bytes_before = db.file_bytes()
+    groups = find_duplicates(db, model_name, threshold, block_size)
+    duplicate_paths = {path: (group['canonical'], similarity)
+                       for group in groups for path, similarity in group['duplicates']}
+    
+    doc_ids = []
+    aliases = []
+    with db.pool.read() as cursor:
+        paths = list(duplicate_paths)
+        for offset in range(0, len(paths), 500):
+            chunk = paths[offset:offset + 500]
+            cursor.execute(
+                f"SELECT id, path FROM descriptions WHERE path IN ({','.join('?' * len(chunk))})", chunk
+            )
+            for doc_id, path in cursor.fetchall():
+                canonical, similarity = duplicate_paths[path]
+                doc_ids.append(doc_id)
+                aliases.append({
+                    'alias_id': doc_id,
+                    'alias_path': path,
+                    'canonical_path': canonical,
+                    'model_name': model_name,
+                    'similarity': similarity,
+                })
+    
+    report = {
+        'model_name': model_name,
+        'threshold': threshold,
+        'clusters': len(groups),
+        'duplicate_images': len(duplicate_paths),
+        'documents_removed': len(doc_ids),
+    }
+    if dry_run:
+        report['seconds'] = time.perf_counter() - start
+        return report
+    
+    try:
+        db.fold_duplicates(aliases, list(duplicate_paths))
+    except Exception as e:
+        logger.error(f"Error compacting near-duplicates: {str(e)}")
+        raise
+    
+    bytes_after = db.optimize(vacuum=vacuum)['bytes_after']
+    report['bytes_before'] = bytes_before
+    report['bytes_after'] = bytes_after
+    report['bytes_reclaimed'] = bytes_before - bytes_after
+    report['seconds'] = time.perf_counter() - start
+    logger.info(
+        f"Compacted {report['duplicate_images']} near-duplicate images "
+        f"({report['documents_removed']} documents), reclaimed {report['bytes_reclaimed']} bytes"
+    )
+    return report
+
+
+class DuplicateIndex:
+    """
+    In-memory index of image vectors used to drop near-duplicates at ingestion.
+    
+    Vectors of images stored during an ingestion run are appended as they
+    are encoded, so duplicates within a single batch are caught as well.
+    """
+    
+    def __init__(self, threshold: float = 0.98, model_name: Optional[str] = None):
+        self.threshold = threshold
+        self.model_name = model_name
+        self.paths = []
+        self._positions = {}
+        self._matrix = None
+    
+    @classmethod
+    def from_db(cls, db: SQLiteVectorDB, model_name: str, threshold: float = 0.98) -> "DuplicateIndex":
+        index = cls(threshold, model_name)
+        paths, matrix = load_image_vectors(db, model_name)
+        for path, vector in zip(paths, matrix):
+            index.add(path, vector)
+        return index
+    
+    def __len__(self) -> int:
+        return len(self.paths)
+    
+    def add(self, path: str, vector: np.ndarray):
+        """Index the vector of a stored image."""
+        if path in self._positions:
+            return
+        vector = _normalize(vector)[0]
+        if self._matrix is None:
+            self._matrix = np.empty((1024, len(vector)), dtype=np.float32)
+        elif len(self.paths) == len(self._matrix):
+            self._matrix = np.concatenate([self._matrix, np.empty_like(self._matrix)])
+        self._positions[path] = len(self.paths)
+        self._matrix[len(self.paths)] = vector
+        self.paths.append(path)
+    
+    def match(self, path: str, vector: np.ndarray) -> Optional[Tuple[str, float]]:
+        """The most similar other indexed image above the threshold, as ``(path, similarity)``."""
+        if not self.paths:
+            return None
+        similarities = self._matrix[:len(self.paths)] @ _normalize(vector)[0]
+        if path in self._positions:
+            similarities[self._positions[path]] = -1.0
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.threshold:
+            return None
+        return self.paths[best], float(similarities[best])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fold near-duplicate images and compact the database")
+    parser.add_argument("db_path")
+    parser.add_argument("--model", default="openai/clip-vit-base-patch32")
+    parser.add_argument("--threshold", type=float, default=0.98)
+    parser.add_argument("--block-size", type=int, default=2048)
+    parser.add_argument("--no-vacuum", action="store_true")
+    parser.add_argument("--dry-run", action="store_true", help="Only report the duplicates found")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    with SQLiteVectorDB(args.db_path) as db:
+        report = compact(
+            db, args.model, threshold=args.threshold, block_size=args.block_size,
+            vacuum=not args.no_vacuum, dry_run=args.dry_run
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
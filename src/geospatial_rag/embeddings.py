@@ -2,23 +2,71 @@
 Embedding generation module using CLIP model.
 """
 
+import time
 import logging
 from typing import Union, List, Optional
 import numpy as np
 import torch
 from PIL import Image
-from transformers import CLIPProcessor, CLIPModel, CLIPTokenizer
+from transformers import CLIPConfig, CLIPProcessor, CLIPModel
+
+from .metrics import REGISTRY, SIZE_BUCKETS, process_rss_bytes
+from .models.loading import load_pretrained, load_report
+from .models.residency import ResidentModel
+from .utils import load_image
 
 logger = logging.getLogger(__name__)
 
+BATCH_SIZE = REGISTRY.histogram(
+    "embedding_batch_size", "Inputs per encode call", ["modality"], buckets=SIZE_BUCKETS
+)
+ENCODE_SECONDS = REGISTRY.histogram("embedding_encode_seconds", "Duration of encode calls", ["modality"])
+TEXT_TOKENS = REGISTRY.counter(
+    "embedding_text_tokens_total", "Token positions run through the text encoder", ["kind"]
+)
+
+
+def _as_features(output) -> torch.Tensor:
+    """Return projected features from ``get_*_features`` across transformers versions."""
+    if isinstance(output, torch.Tensor):
+        return output
+    return output.pooler_output
+
 
-class CLIPEmbedder:
+class CLIPEmbedder(ResidentModel):
     """CLIP-based embedder for generating text and image embeddings."""
     
-    def __init__(self, model_name: str = "openai/clip-vit-base-patch32", device: str = "auto"):
+    def __init__(
+        self,
+        model_name: str = "openai/clip-vit-base-patch32",
+        device: str = "auto",
+        model: Optional[CLIPModel] = None,
+        processor: Optional[CLIPProcessor] = None,
+        config: Optional[CLIPConfig] = None,
+        local_files_only: bool = False,
+        quantize: bool = False
+    ):
+        """
+        Load or adopt a CLIP model.
+        
+        ``model_name`` may be a hub id or a local snapshot directory; a hub id
+        already in the local cache is loaded from there without contacting the
+        hub, and with ``local_files_only`` nothing is ever fetched. A ready ``model``
+        and ``processor`` can be injected instead, or a ``CLIPConfig`` given to
+        build a randomly initialized model, which keeps tests and benchmarks
+        offline. ``quantize`` applies dynamic int8 quantization on CPU.
+        A model loaded from a snapshot can be ``unload``-ed (see
+        ``models.residency``) and is loaded again on its next use.
+        """
         self.model_name = model_name
+        self.local_files_only = local_files_only
+        self.quantize = quantize
         self.device = self._setup_device(device)
-        self._load_model()
+        self._load_model(model=model, processor=processor, config=config)
+        self._init_residency(reloadable=model is None and config is None)
+    
+    def _reload(self):
+        self._load_model(processor=self.processor)
     
     def _setup_device(self, device: str) -> torch.device:
         """Setup and return the appropriate device."""
@@ -26,19 +74,54 @@ class CLIPEmbedder:
             device = "cuda" if torch.cuda.is_available() else "cpu"
         return torch.device(device)
     
-    def _load_model(self):
-        """Load CLIP model, processor, and tokenizer."""
+    def _load_model(
+        self,
+        model: Optional[CLIPModel] = None,
+        processor: Optional[CLIPProcessor] = None,
+        config: Optional[CLIPConfig] = None
+    ):
+        """Load CLIP model and processor; the tokenizer is the processor's own."""
         try:
             logger.info(f"Loading CLIP model: {self.model_name}")
-            self.model = CLIPModel.from_pretrained(self.model_name)
-            self.processor = CLIPProcessor.from_pretrained(self.model_name)
-            self.tokenizer = CLIPTokenizer.from_pretrained(self.model_name)
+            start = time.perf_counter()
+            rss_before = process_rss_bytes()
+            if model is None and config is not None:
+                model = CLIPModel(config)
+            
+            if model is None:
+                model, loaded_processor, self.load_report = load_pretrained(
+                    CLIPModel, CLIPProcessor, self.model_name, local_files_only=self.local_files_only
+                )
+                processor = processor or loaded_processor
+            else:
+                processor = processor or CLIPProcessor.from_pretrained(
+                    self.model_name, local_files_only=self.local_files_only
+                )
+                self.load_report = load_report(
+                    self.model_name, model, time.perf_counter() - start, rss_before, source="provided"
+                )
+            self.model = model
+            self.processor = processor
+            self.tokenizer = processor.tokenizer
             
             self.model = self.model.to(self.device)
             self.model.eval()
             
-            self.text_embedding_dim = self.model.config.text_config.hidden_size
-            self.image_embedding_dim = self.model.config.vision_config.hidden_size
+            if self.quantize and self.device.type == "cpu":
+                self.model = torch.ao.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            
+            # get_*_features return vectors in the shared projection space.
+            self.text_embedding_dim = self.model.config.projection_dim
+            self.image_embedding_dim = self.model.config.projection_dim
+            self.input_size = self.model.config.vision_config.image_size
+            # CLIP's learned softmax temperature, for turning similarities into probabilities.
+            self.logit_scale = float(self.model.logit_scale.detach().exp())
+            self.max_text_length = min(
+                self.model.config.text_config.max_position_embeddings,
+                getattr(self.tokenizer, 'model_max_length', None) or 77
+            )
             
             logger.info(f"CLIP model loaded successfully on {self.device}")
         except Exception as e:
@@ -47,6 +130,10 @@ class CLIPEmbedder:
     
     def encode_text(self, text: Union[str, List[str]], normalize: bool = True) -> np.ndarray:
         """Encode text into embeddings using CLIP."""
+        with self.in_use():
+            return self._encode_text(text, normalize)
+    
+    def _encode_text(self, text: Union[str, List[str]], normalize: bool) -> np.ndarray:
         try:
             if isinstance(text, str):
                 text = [text]
@@ -56,22 +143,12 @@ class CLIPEmbedder:
             
             text_tokens = self.tokenizer(
                 text,
-                padding="max_length",
-                max_length=77,
+                padding="longest",
+                max_length=self.max_text_length,
                 truncation=True,
                 return_tensors="pt"
-            ).to(self.device)
-            
-            with torch.no_grad():
-                text_features = self.model.get_text_features(
-                    input_ids=text_tokens.input_ids,
-                    attention_mask=text_tokens.attention_mask
-                )
-                
-                if normalize:
-                    text_features = text_features / text_features.norm(dim=1, keepdim=True)
-            
-            embeddings = text_features.cpu().numpy()
+            )
+            embeddings = self._text_features(text_tokens, normalize)
             
             if return_single:
                 embeddings = embeddings[0]
@@ -86,28 +163,122 @@ class CLIPEmbedder:
             else:
                 return np.zeros((len(text), dim), dtype=np.float32)
     
-    def encode_image(self, image: Union[Image.Image, str], normalize: bool = True) -> np.ndarray:
-        """Encode image into embeddings using CLIP."""
+    def _text_features(self, text_tokens, normalize: bool) -> np.ndarray:
+        """
+        Run the text encoder on one padded batch.
+        
+        Batches are padded only to their longest sequence: CLIP masks padding
+        and pools at the end-of-text token, so the features match padding to
+        ``max_text_length`` while the encoder runs on far fewer positions.
+        """
+        BATCH_SIZE.observe(len(text_tokens['input_ids']), modality="text")
+        start = time.perf_counter()
+        text_tokens = text_tokens.to(self.device)
+        real = int(text_tokens['attention_mask'].sum())
+        TEXT_TOKENS.inc(real, kind="text")
+        TEXT_TOKENS.inc(text_tokens['attention_mask'].numel() - real, kind="padding")
+        
+        with torch.no_grad():
+            text_features = _as_features(self.model.get_text_features(
+                input_ids=text_tokens['input_ids'],
+                attention_mask=text_tokens['attention_mask']
+            ))
+            
+            if normalize:
+                text_features = text_features / text_features.norm(dim=1, keepdim=True)
+        
+        embeddings = text_features.cpu().numpy()
+        ENCODE_SECONDS.observe(time.perf_counter() - start, modality="text")
+        return embeddings
+    
+    def encode_text_batched(self, texts: List[str], batch_size: int = 64, normalize: bool = True) -> np.ndarray:
+        """
+        Encode a long list of texts in length-bucketed batches.
+        
+        Texts are tokenized once, sorted by token count and encoded
+        ``batch_size`` at a time, so each batch holds texts of similar length
+        and carries little padding. Rows come back in the input order and
+        match ``encode_text``.
+        """
+        if not texts:
+            return np.zeros((0, self.text_embedding_dim), dtype=np.float32)
+        with self.in_use():
+            try:
+                input_ids = self.tokenizer(
+                    list(texts), truncation=True, max_length=self.max_text_length
+                )['input_ids']
+                order = np.argsort([len(ids) for ids in input_ids], kind="stable")
+                embeddings = np.empty((len(texts), self.text_embedding_dim), dtype=np.float32)
+                for start in range(0, len(order), batch_size):
+                    rows = order[start:start + batch_size]
+                    text_tokens = self.tokenizer.pad(
+                        {'input_ids': [input_ids[i] for i in rows]}, padding="longest", return_tensors="pt"
+                    )
+                    embeddings[rows] = self._text_features(text_tokens, normalize)
+                return embeddings
+            
+            except Exception as e:
+                logger.error(f"Error encoding text: {str(e)}")
+                return np.zeros((len(texts), self.text_embedding_dim), dtype=np.float32)
+    
+    def encode_class_prompts(self, class_names: List[str], templates: List[str],
+                             batch_size: int = 64) -> np.ndarray:
+        """
+        Prompt-ensemble vector of each class name.
+        
+        Every template (e.g. ``"a satellite photo of {}."``) is filled with
+        every class name; the normalized vectors of a class's prompts are
+        averaged and renormalized, giving one row per class.
+        """
+        prompts = [template.format(name) for name in class_names for template in templates]
+        embeddings = self.encode_text_batched(prompts, batch_size=batch_size)
+        embeddings = embeddings.reshape(len(class_names), len(templates), -1).mean(axis=1)
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    
+    def _to_rgb(self, image: Union[Image.Image, str]) -> Image.Image:
+        """Open an image path, decoding it near the model input size, or convert a PIL image to RGB."""
+        if isinstance(image, str):
+            return load_image(image, min_side=self.input_size)
+        return image.convert("RGB")
+    
+    def encode_image(
+        self,
+        image: Union[Image.Image, str, List[Union[Image.Image, str]]],
+        normalize: bool = True
+    ) -> np.ndarray:
+        """Encode one image, or a list of images in a single batch, using CLIP."""
+        with self.in_use():
+            return self._encode_image(image, normalize)
+    
+    def _encode_image(
+        self,
+        image: Union[Image.Image, str, List[Union[Image.Image, str]]],
+        normalize: bool
+    ) -> np.ndarray:
+        return_single = not isinstance(image, (list, tuple))
         try:
-            if isinstance(image, str):
-                image = Image.open(image).convert("RGB")
-            elif isinstance(image, Image.Image):
-                image = image.convert("RGB")
+            images = [image] if return_single else list(image)
+            images = [self._to_rgb(item) for item in images]
+            BATCH_SIZE.observe(len(images), modality="image")
+            start = time.perf_counter()
             
-            inputs = self.processor(images=image, return_tensors="pt").to(self.device)
+            inputs = self.processor(images=images, return_tensors="pt").to(self.device)
             
             with torch.no_grad():
-                image_features = self.model.get_image_features(**inputs)
+                image_features = _as_features(self.model.get_image_features(**inputs))
                 
                 if normalize:
                     image_features = image_features / image_features.norm(dim=1, keepdim=True)
             
-            embeddings = image_features.cpu().numpy()[0]
-            return embeddings
+            embeddings = image_features.cpu().numpy()
+            ENCODE_SECONDS.observe(time.perf_counter() - start, modality="image")
+            return embeddings[0] if return_single else embeddings
             
         except Exception as e:
             logger.error(f"Error encoding image: {str(e)}")
-            return np.zeros(self.image_embedding_dim, dtype=np.float32)
+            if return_single:
+                return np.zeros(self.image_embedding_dim, dtype=np.float32)
+            return np.zeros((len(image), self.image_embedding_dim), dtype=np.float32)
     
     def compute_similarity(self, embedding1: np.ndarray, embedding2: np.ndarray) -> float:
         """Compute cosine similarity between two embeddings."""
@@ -0,0 +1,306 @@
+"""
+Multi-process ingestion: CLIP encoding across worker processes, one SQLite writer.
+"""
+
+import os
+import time
+import queue
+import logging
+import multiprocessing
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from PIL import Image
+
+from .database import SQLiteVectorDB, make_document_id
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+SHARD_SECONDS = REGISTRY.histogram("ingest_shard_seconds", "Worker time spent encoding one shard")
+
+# Embedder handed to forked workers, which inherit it instead of loading their own.
+_SHARED_EMBEDDER = None
+
+
+def make_shards(records: List[Dict[str, Any]], shard_size: int) -> List[List[Dict[str, Any]]]:
+    """
+    Split records into shards of about ``shard_size``, keeping each image in one shard.
+    
+    Records are ordered by image path so all captions of an image travel
+    together and the image is encoded once.
+    """
+    ordered = sorted(records, key=lambda r: r.get('image_path', ""))
+    shards, current = [], []
+    for i, record in enumerate(ordered):
+        current.append(record)
+        next_path = ordered[i + 1].get('image_path', "") if i + 1 < len(ordered) else None
+        if len(current) >= shard_size and (not record.get('image_path') or next_path != record['image_path']):
+            shards.append(current)
+            current = []
+    if current:
+        shards.append(current)
+    return shards
+
+
+def _encode_images(embedder, paths: List[str], files: List[str], image_embeddings: Dict[str, np.ndarray],
+                   failed: Dict[str, str]):
+    """
+    Encode one batch of images into ``image_embeddings``.
+    
+    ``encode_image`` returns zero vectors for the whole batch when any image
+    fails to decode, so a batch with zero rows is retried one image at a
+    time and only the images that still fail are recorded in ``failed``.
+    """
+    embeddings = np.atleast_2d(embedder.encode_image(files))
+    broken = ~np.any(embeddings, axis=1)
+    if broken.any() and len(files) > 1:
+        for path, file in zip(paths, files):
+            _encode_images(embedder, [path], [file], image_embeddings, failed)
+        return
+    for path, embedding, is_broken in zip(paths, embeddings, broken):
+        if is_broken:
+            failed[path] = "image could not be encoded"
+        else:
+            image_embeddings[path] = embedding
+
+
+def _encode_shard(embedder, records: List[Dict[str, Any]], batch_size: int,
+                  image_root: Optional[str]) -> Dict[str, Any]:
+    """
+    Encode the captions (in length buckets) and distinct images of one shard.
+    
+    Every image file is opened before encoding; images that are missing or
+    cannot be decoded are returned in ``failed_images`` with the reason,
+    never as vectors.
+    """
+    text_embeddings = embedder.encode_text_batched([r['text'] for r in records], batch_size=batch_size)
+    
+    image_embeddings, failed = {}, {}
+    readable = []
+    for path in sorted({r['image_path'] for r in records if r.get('image_path')}):
+        file = os.path.join(image_root, path) if image_root and not os.path.isabs(path) else path
+        try:
+            with Image.open(file):
+                pass
+            readable.append((path, file))
+        except OSError as e:
+            failed[path] = f"{type(e).__name__}: {e}"
+    for start in range(0, len(readable), batch_size):
+        batch = readable[start:start + batch_size]
+        _encode_images(embedder, [p for p, _ in batch], [f for _, f in batch], image_embeddings, failed)
+    return {'text_embeddings': text_embeddings, 'image_embeddings': image_embeddings, 'failed_images': failed}
+
+
+def _worker_main(worker_id: int, tasks, results, threads: int, batch_size: int,
+                 image_root: Optional[str], embedder_kwargs: Dict[str, Any]):
+    """Worker loop: load (or inherit) the model once, then encode shards until told to stop."""
+    import torch
+    torch.set_num_threads(threads)
+    
+    embedder = _SHARED_EMBEDDER
+    if embedder is None:
+        from .embeddings import CLIPEmbedder
+        embedder = CLIPEmbedder(**embedder_kwargs)
+    
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+        shard_id, records = task
+        start = time.perf_counter()
+        try:
+            encoded = _encode_shard(embedder, records, batch_size, image_root)
+            results.put((shard_id, worker_id, encoded, time.perf_counter() - start, None))
+        except Exception as e:
+            results.put((shard_id, worker_id, None, time.perf_counter() - start, f"{type(e).__name__}: {e}"))
+
+
+class ParallelIngestor:
+    """
+    Encode documents in ``num_workers`` processes and store them from this one.
+    
+    Records (as for ``GeoSpatialRAG.add_documents``) are split into shards
+    that keep every image's captions together. Each worker loads the CLIP
+    model once and encodes whole shards with ``threads_per_worker`` torch
+    threads; the calling process is the only SQLite writer and stores each
+    shard as soon as it comes back. Already stored documents are skipped,
+    and so are records whose image is missing or cannot be decoded: they are
+    counted in the report under ``failed`` and listed in ``failed_images``.
+    
+    With the ``fork`` start method (the default where available) an
+    ``embedder`` passed in is inherited by the workers: its weights are shared
+    copy-on-write instead of being loaded again per process. Otherwise each
+    worker builds a ``CLIPEmbedder`` from ``embedder_kwargs``; safetensors
+    checkpoints are memory-mapped while loading, which keeps that cheap too.
+    """
+    
+    def __init__(
+        self,
+        db: SQLiteVectorDB,
+        embedder=None,
+        embedder_kwargs: Optional[Dict[str, Any]] = None,
+        num_workers: Optional[int] = None,
+        threads_per_worker: Optional[int] = None,
+        shard_size: int = 64,
+        batch_size: int = 32,
+        image_root: Optional[str] = None,
+        start_method: Optional[str] = None,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        if embedder is None and not embedder_kwargs:
+            raise ValueError("ParallelIngestor needs an embedder or embedder_kwargs")
+        self.db = db
+        self.embedder = embedder
+        self.embedder_kwargs = dict(embedder_kwargs or {})
+        self.model_name = embedder.model_name if embedder is not None else self.embedder_kwargs.get(
+            'model_name', "openai/clip-vit-base-patch32"
+        )
+        if embedder is not None and not self.embedder_kwargs:
+            self.embedder_kwargs = {'model_name': self.model_name, 'device': "cpu"}
+        
+        cpus = os.cpu_count() or 1
+        self.num_workers = num_workers or cpus
+        self.threads_per_worker = threads_per_worker or max(1, cpus // self.num_workers)
+        self.shard_size = shard_size
+        self.batch_size = batch_size
+        self.image_root = image_root
+        available = multiprocessing.get_all_start_methods()
+        self.start_method = start_method or ("fork" if "fork" in available else "spawn")
+        self.progress_callback = progress_callback
+    
+    def _pending(self, records: List[Dict[str, Any]], force: bool) -> List[Dict[str, Any]]:
+        """Attach ids to the records and drop those already stored for the model."""
+        records = [
+            dict(r, doc_id=make_document_id(r['text'], r.get('image_path', ""), r.get('doc_class', "document")))
+            for r in records
+        ]
+        if force:
+            return records
+        with_image = [r['doc_id'] for r in records if r.get('image_path')]
+        without_image = [r['doc_id'] for r in records if not r.get('image_path')]
+        existing = self.db.existing_ids(with_image, self.model_name, require_image=True, include_aliases=True)
+        existing |= self.db.existing_ids(without_image, self.model_name)
+        return [r for r in records if r['doc_id'] not in existing]
+    
+    def _write_shard(self, records: List[Dict[str, Any]], encoded: Dict[str, Any]) -> int:
+        documents = []
+        for record, text_embedding in zip(records, encoded['text_embeddings']):
+            image_path = record.get('image_path', "")
+            if image_path in encoded['failed_images']:
+                continue
+            documents.append({
+                'doc_id': record['doc_id'],
+                'text': record['text'],
+                'text_embedding': text_embedding,
+                'image_embedding': encoded['image_embeddings'].get(image_path),
+                'metadata': record.get('metadata'),
+                'doc_class': record.get('doc_class', "document"),
+                'image_path': image_path,
+                'model_name': self.model_name,
+            })
+        self.db.add_documents(documents)
+        return len(documents)
+    
+    def run(self, records: List[Dict[str, Any]], force: bool = False) -> Dict[str, Any]:
+        """
+        Ingest ``records`` and return a throughput report.
+        
+        The report has document counts, wall time, documents per second and
+        per-worker busy time; ``worker_utilization`` near 1 means the writer
+        kept up and the workers were never starved.
+        """
+        global _SHARED_EMBEDDER
+        start = time.perf_counter()
+        pending = self._pending(records, force)
+        shards = make_shards(pending, self.shard_size)
+        report = {
+            'documents': len(records),
+            'stored': 0,
+            'skipped': len(records) - len(pending),
+            'failed': 0,
+            'failed_images': {},
+            'shards': len(shards),
+            'workers': self.num_workers,
+            'threads_per_worker': self.threads_per_worker,
+            'start_method': self.start_method,
+        }
+        if not shards:
+            report.update(seconds=time.perf_counter() - start, documents_per_second=0.0)
+            return report
+        
+        context = multiprocessing.get_context(self.start_method)
+        tasks = context.Queue()
+        results = context.Queue(maxsize=2 * self.num_workers)
+        for shard_id, shard in enumerate(shards):
+            tasks.put((shard_id, shard))
+        for _ in range(self.num_workers):
+            tasks.put(None)
+        
+        if self.start_method == "fork":
+            _SHARED_EMBEDDER = self.embedder
+        workers = [
+            context.Process(
+                target=_worker_main,
+                args=(worker_id, tasks, results, self.threads_per_worker, self.batch_size,
+                      self.image_root, self.embedder_kwargs),
+                daemon=True
+            )
+            for worker_id in range(self.num_workers)
+        ]
+        try:
+            for worker in workers:
+                worker.start()
+            _SHARED_EMBEDDER = None
+            
+            busy = [0.0] * self.num_workers
+            write_seconds = 0.0
+            for done in range(len(shards)):
+                while True:
+                    try:
+                        shard_id, worker_id, encoded, seconds, error = results.get(timeout=1.0)
+                        break
+                    except queue.Empty:
+                        if not any(worker.is_alive() for worker in workers):
+                            raise RuntimeError("All ingestion workers exited before finishing")
+                if error is not None:
+                    raise RuntimeError(f"Worker {worker_id} failed on shard {shard_id}: {error}")
+                busy[worker_id] += seconds
+                SHARD_SECONDS.observe(seconds)
+                
+                for path, reason in encoded['failed_images'].items():
+                    logger.warning(f"Skipping captions of unreadable image {path}: {reason}")
+                report['failed_images'].update(encoded['failed_images'])
+                report['failed'] += sum(
+                    1 for r in shards[shard_id] if r.get('image_path') in encoded['failed_images']
+                )
+                
+                written = time.perf_counter()
+                report['stored'] += self._write_shard(shards[shard_id], encoded)
+                write_seconds += time.perf_counter() - written
+                if self.progress_callback:
+                    self.progress_callback({
+                        'shards_done': done + 1, 'shards': len(shards), 'stored': report['stored']
+                    })
+            
+            for worker in workers:
+                worker.join()
+        finally:
+            _SHARED_EMBEDDER = None
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+        
+        seconds = time.perf_counter() - start
+        report.update(
+            seconds=seconds,
+            documents_per_second=report['stored'] / seconds,
+            write_seconds=write_seconds,
+            worker_busy_seconds=busy,
+            worker_utilization=sum(busy) / (seconds * self.num_workers),
+        )
+        logger.info(
+            f"Ingested {report['stored']} documents with {self.num_workers} workers in {seconds:.1f}s "
+            f"({report['documents_per_second']:.1f} docs/s)"
+        )
+        return report
@@ -0,0 +1,140 @@
+"""
+Precomputed k-nearest-neighbour graph over stored documents.
+"""
+
+import time
+import logging
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .database import SQLiteVectorDB
+from .retriever import ResultSet, SQLiteRetriever
+
+logger = logging.getLogger(__name__)
+
+
+class NeighborGraph:
+    """
+    The ``k`` most similar documents of every stored document, for one model.
+    
+    Neighbours are scored exactly like a query built from the document's own
+    stored vectors, so a graph lookup returns what ``query_similar`` would
+    compute by scanning, in O(k). The graph records the database
+    ``write_version`` it was built at and is only used while that still
+    matches; any later write makes it stale until the next ``build``.
+    """
+    
+    def __init__(self, db: SQLiteVectorDB, model_name: str,
+                 combine_weights: Tuple[float, float] = (0.7, 0.3)):
+        self.db = db
+        self.model_name = model_name
+        self.combine_weights = tuple(combine_weights)
+    
+    def _info(self) -> Optional[tuple]:
+        with self.db.pool.read() as cursor:
+            cursor.execute(
+                "SELECT k, text_weight, image_weight, write_version FROM knn_graphs WHERE model_name = ?",
+                (self.model_name,)
+            )
+            return cursor.fetchone()
+    
+    def is_fresh(self, top_k: int = 1) -> bool:
+        """Whether the stored graph is current and holds at least ``top_k`` neighbours."""
+        info = self._info()
+        return (
+            info is not None
+            and info[0] >= top_k
+            and (info[1], info[2]) == self.combine_weights
+            and info[3] == self.db.write_version()
+        )
+    
+    def build(self, k: int = 10, batch_size: int = 256) -> int:
+        """
+        Compute the neighbour lists of every document with a text vector.
+        
+        Documents are processed ``batch_size`` at a time with one batched
+        scan each, so building costs about ``n / batch_size`` full scans.
+        Returns the number of documents in the graph.
+        """
+        start = time.perf_counter()
+        version = self.db.write_version()
+        with self.db.pool.write() as cursor:
+            cursor.execute("DELETE FROM knn_graph WHERE model_name = ?", (self.model_name,))
+            cursor.execute("DELETE FROM knn_graphs WHERE model_name = ?", (self.model_name,))
+        
+        built = 0
+        last_id = ""
+        while True:
+            with self.db.pool.read() as cursor:
+                cursor.execute(
+                    """SELECT te.id, te.embedding, COALESCE(ie.embedding, iv.embedding)
+                       FROM text_embeddings te
+                       JOIN descriptions d ON d.id = te.id
+                       LEFT JOIN image_embeddings ie ON ie.id = te.id AND ie.model_name = te.model_name
+                       LEFT JOIN image_vectors iv ON iv.path = d.path AND iv.model_name = te.model_name
+                       WHERE te.model_name = ? AND te.id > ? AND d.id NOT LIKE 'query_%'
+                       ORDER BY te.id LIMIT ?""",
+                    (self.model_name, last_id, batch_size)
+                )
+                rows = cursor.fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            
+            edges = []
+            with_image = [row for row in rows if row[2] is not None]
+            without_image = [row for row in rows if row[2] is None]
+            for group, use_image in ((with_image, True), (without_image, False)):
+                if not group:
+                    continue
+                retriever = SQLiteRetriever(
+                    self.db.db_path,
+                    np.stack([np.frombuffer(row[1], dtype=np.float32) for row in group]),
+                    np.stack([np.frombuffer(row[2], dtype=np.float32) for row in group]) if use_image else None,
+                    combine_weights=self.combine_weights,
+                    pool=self.db.pool,
+                    model_name=self.model_name
+                )
+                for row, documents in zip(group, retriever.get_relevant_documents_batch(top_k=k + 1)):
+                    neighbors = [d for d in documents if d.metadata['id'] != row[0]][:k]
+                    edges.extend(
+                        (row[0], self.model_name, rank, d.metadata['id'], d.metadata['similarity'])
+                        for rank, d in enumerate(neighbors)
+                    )
+            
+            with self.db.pool.write() as cursor:
+                cursor.executemany(
+                    """INSERT OR REPLACE INTO knn_graph (id, model_name, rank, neighbor_id, similarity)
+                       VALUES (?, ?, ?, ?, ?)""",
+                    edges
+                )
+            built += len(rows)
+        
+        with self.db.pool.write() as cursor:
+            cursor.execute(
+                """INSERT INTO knn_graphs (model_name, k, text_weight, image_weight, write_version)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (self.model_name, k, self.combine_weights[0], self.combine_weights[1], version)
+            )
+            self.db.bump_derived_version(cursor)
+        logger.info(
+            f"Built {k}-NN graph over {built} documents for {self.model_name} "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+        return built
+    
+    def neighbors(self, doc_id: str, top_k: int = 10) -> ResultSet:
+        """The stored nearest neighbours of ``doc_id``, best first."""
+        with self.db.pool.read() as cursor:
+            cursor.execute(
+                """SELECT g.neighbor_id, g.similarity, d.description, d.class
+                   FROM knn_graph g JOIN descriptions d ON d.id = g.neighbor_id
+                   WHERE g.id = ? AND g.model_name = ?
+                   ORDER BY g.rank LIMIT ?""",
+                (doc_id, self.model_name, top_k)
+            )
+            rows = cursor.fetchall()
+        return ResultSet(
+            [row[0] for row in rows], [row[2] for row in rows], [row[3] for row in rows], [row[1] for row in rows]
+        )
@@ -0,0 +1,9 @@
+"""
+Model wrappers used by the GeoSpatial-RAG pipeline.
+"""
+
+from .loading import load_pretrained, resolve_snapshot
+from .residency import ResidencyManager
+from .vlm_models import VLMManager
+
+__all__ = ["VLMManager", "ResidencyManager", "load_pretrained", "resolve_snapshot"]
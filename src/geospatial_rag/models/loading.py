@@ -0,0 +1,115 @@
+"""
+Model loading: local snapshot resolution, memory-mapped safetensors and load reports.
+"""
+
+import os
+import glob
+import time
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+import torch
+
+from ..metrics import REGISTRY, process_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+MODEL_LOAD_SECONDS = REGISTRY.gauge("model_load_seconds", "Time taken to load each model", ["model"])
+MODEL_RESIDENT_BYTES = REGISTRY.gauge(
+    "model_resident_bytes", "Growth of resident memory while loading each model", ["model"]
+)
+MODEL_PARAMETER_BYTES = REGISTRY.gauge(
+    "model_parameter_bytes", "Size of each model's parameters and buffers", ["model"]
+)
+
+
+def _is_snapshot(path: str) -> bool:
+    """Whether ``path`` is a directory holding a config and model weights."""
+    return (
+        os.path.isfile(os.path.join(path, "config.json"))
+        and any(glob.glob(os.path.join(path, pattern)) for pattern in ("*.safetensors", "*.bin"))
+    )
+
+
+def resolve_snapshot(model_name: str, local_files_only: bool = False) -> str:
+    """
+    Local directory to load ``model_name`` from, avoiding hub round-trips.
+    
+    A directory is used as is. A hub id is looked up in the local Hugging
+    Face cache first; only when it is not cached (and ``local_files_only``
+    is off) is the hub id returned for ``from_pretrained`` to download.
+    """
+    if os.path.isdir(model_name):
+        return model_name
+    try:
+        from huggingface_hub import snapshot_download
+        path = snapshot_download(model_name, local_files_only=True)
+        if _is_snapshot(path):
+            return path
+    except Exception as e:
+        logger.debug(f"No complete cached snapshot of {model_name}: {str(e)}")
+    if local_files_only:
+        raise FileNotFoundError(f"No local snapshot of {model_name} and local_files_only is set")
+    return model_name
+
+
+def parameter_bytes(model: torch.nn.Module) -> int:
+    """Bytes held by a model's parameters and buffers."""
+    return sum(t.numel() * t.element_size() for t in list(model.parameters()) + list(model.buffers()))
+
+
+def load_report(model_name: str, model: torch.nn.Module, seconds: float, rss_before: float,
+                source: str, safetensors: bool = False) -> Dict[str, Any]:
+    """Record load time and memory of a model in the metrics and return them."""
+    report = {
+        'model_name': model_name,
+        'source': source,
+        'safetensors': safetensors,
+        'load_seconds': seconds,
+        'rss_delta_bytes': max(0.0, process_rss_bytes() - rss_before),
+        'parameter_bytes': parameter_bytes(model),
+    }
+    MODEL_LOAD_SECONDS.set(seconds, model=model_name)
+    MODEL_RESIDENT_BYTES.set(report['rss_delta_bytes'], model=model_name)
+    MODEL_PARAMETER_BYTES.set(report['parameter_bytes'], model=model_name)
+    return report
+
+
+def load_pretrained(
+    model_class,
+    processor_class,
+    model_name: str,
+    local_files_only: bool = False,
+    torch_dtype: Optional[torch.dtype] = None
+) -> Tuple[Any, Any, Dict[str, Any]]:
+    """
+    Load a model and its processor and report what loading cost.
+    
+    The snapshot is resolved locally when possible. Safetensors weights are
+    memory-mapped and the model is built with ``low_cpu_mem_usage``, so
+    weights are materialized once instead of being allocated, initialized
+    and then overwritten. Returns ``(model, processor, report)``.
+    """
+    path = resolve_snapshot(model_name, local_files_only)
+    local = os.path.isdir(path)
+    safetensors = local and bool(glob.glob(os.path.join(path, "*.safetensors")))
+    
+    rss_before = process_rss_bytes()
+    start = time.perf_counter()
+    kwargs = {'local_files_only': local or local_files_only, 'low_cpu_mem_usage': True}
+    if safetensors:
+        kwargs['use_safetensors'] = True
+    if torch_dtype is not None:
+        kwargs['torch_dtype'] = torch_dtype
+    model = model_class.from_pretrained(path, **kwargs)
+    processor = processor_class.from_pretrained(path, local_files_only=local or local_files_only)
+    
+    report = load_report(
+        model_name, model, time.perf_counter() - start, rss_before,
+        source=path if local else "hub", safetensors=safetensors
+    )
+    logger.info(
+        f"Loaded {model_name} in {report['load_seconds']:.2f}s "
+        f"(+{report['rss_delta_bytes'] / 2**20:.0f} MiB resident, safetensors={safetensors})"
+    )
+    return model, processor, report
@@ -0,0 +1,196 @@
+"""
+Model residency: unloading idle models and keeping resident memory under a budget.
+"""
+
+import gc
+import ctypes
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+from ..metrics import REGISTRY, process_rss_bytes
+
+logger = logging.getLogger(__name__)
+
+MODEL_EVICTIONS = REGISTRY.counter("model_evictions_total", "Models unloaded to save memory", ["model", "reason"])
+MODEL_RELOADS = REGISTRY.counter("model_reloads_total", "Unloaded models loaded again on use", ["model"])
+MODEL_RELOAD_SECONDS = REGISTRY.histogram("model_reload_seconds", "Time to reload an unloaded model")
+
+
+def _release_memory():
+    """Collect garbage and hand freed heap pages back to the OS where glibc allows it."""
+    gc.collect()
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class ResidentModel:
+    """
+    Mixin for model wrappers whose weights can be dropped and loaded again on use.
+    
+    Subclasses keep their weights in ``self.model``, implement ``_reload`` and
+    run every forward pass inside ``in_use()``, which reloads the model first
+    if it was unloaded. ``unload`` never drops a model that is in use. Only
+    models loaded from a snapshot are reloadable; injected ones stay resident.
+    """
+    
+    def _init_residency(self, reloadable: bool):
+        self._residency_lock = threading.Lock()
+        self._active = 0
+        self.reloadable = reloadable
+        self.last_used = time.monotonic()
+        self.reloads = 0
+        self.evictions = 0
+    
+    def _reload(self):
+        raise NotImplementedError
+    
+    @property
+    def is_loaded(self) -> bool:
+        return getattr(self, 'model', None) is not None
+    
+    @contextmanager
+    def in_use(self):
+        """Keep the model loaded (loading it if needed) for the duration of the block."""
+        with self._residency_lock:
+            if not self.is_loaded:
+                start = time.perf_counter()
+                self._reload()
+                self.reloads += 1
+                MODEL_RELOADS.inc(model=self.model_name)
+                MODEL_RELOAD_SECONDS.observe(time.perf_counter() - start)
+                logger.info(f"Reloaded {self.model_name} in {time.perf_counter() - start:.2f}s")
+            self._active += 1
+        try:
+            yield
+        finally:
+            with self._residency_lock:
+                self._active -= 1
+                self.last_used = time.monotonic()
+    
+    def unload(self, reason: str = "manual") -> bool:
+        """Drop the model weights unless they are in use; returns whether it did."""
+        with self._residency_lock:
+            if not self.reloadable or not self.is_loaded or self._active:
+                return False
+            self.model = None
+            self.evictions += 1
+        _release_memory()
+        MODEL_EVICTIONS.inc(model=self.model_name, reason=reason)
+        logger.info(f"Unloaded {self.model_name} ({reason})")
+        return True
+    
+    def idle_seconds(self) -> float:
+        return 0.0 if self._active else time.monotonic() - self.last_used
+    
+    def residency(self) -> Dict[str, Any]:
+        """Whether the model is loaded, how long it has been idle and how often it moved."""
+        return {
+            'loaded': self.is_loaded,
+            'reloadable': self.reloadable,
+            'in_use': self._active,
+            'idle_seconds': self.idle_seconds(),
+            'reloads': self.reloads,
+            'evictions': self.evictions,
+        }
+
+
+class ResidencyManager:
+    """
+    Unload idle models and keep process memory under a budget.
+    
+    Models are registered with a priority; lower priorities are evicted
+    first (``GeoSpatialRAG`` registers the VLM at 0 and CLIP at 1), least
+    recently used first within a priority. ``enforce`` unloads models idle
+    for ``idle_seconds`` and then, while resident memory exceeds
+    ``memory_budget_bytes``, further models in eviction order. Unloaded
+    models reload transparently on their next use; their safetensors files
+    usually stay in the OS page cache, so a reload is mostly a memory map.
+    One manager can be shared by several pipelines in a process.
+    """
+    
+    def __init__(
+        self,
+        idle_seconds: Optional[float] = None,
+        memory_budget_bytes: Optional[float] = None,
+        check_interval: float = 30.0
+    ):
+        self.idle_seconds = idle_seconds
+        self.memory_budget_bytes = memory_budget_bytes
+        self.check_interval = check_interval
+        self._models = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+    
+    def register(self, model: ResidentModel, priority: int = 1, name: Optional[str] = None):
+        """Manage ``model``; models with a lower ``priority`` are evicted first."""
+        with self._lock:
+            if all(entry['model'] is not model for entry in self._models):
+                self._models.append({'model': model, 'priority': priority, 'name': name or model.model_name})
+    
+    def unregister(self, model: ResidentModel):
+        with self._lock:
+            self._models = [entry for entry in self._models if entry['model'] is not model]
+    
+    def enforce(self) -> List[str]:
+        """Apply the idle timeout and the memory budget once; returns the unloaded model names."""
+        with self._lock:
+            entries = list(self._models)
+        evicted = []
+        if self.idle_seconds is not None:
+            for entry in entries:
+                model = entry['model']
+                if model.is_loaded and model.idle_seconds() >= self.idle_seconds and model.unload("idle"):
+                    evicted.append(entry['name'])
+        
+        if self.memory_budget_bytes is not None:
+            candidates = sorted(
+                (entry for entry in entries if entry['model'].is_loaded),
+                key=lambda entry: (entry['priority'], entry['model'].last_used)
+            )
+            for entry in candidates:
+                if process_rss_bytes() <= self.memory_budget_bytes:
+                    break
+                if entry['model'].unload("memory"):
+                    evicted.append(entry['name'])
+        return evicted
+    
+    def _run(self):
+        while not self._stop.wait(self.check_interval):
+            try:
+                self.enforce()
+            except Exception as e:
+                logger.error(f"Error enforcing model residency: {str(e)}")
+    
+    def start(self) -> threading.Thread:
+        """Enforce every ``check_interval`` seconds on a daemon thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return self._thread
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="model-residency", daemon=True)
+        self._thread.start()
+        return self._thread
+    
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Budget, current resident memory and the residency of every managed model."""
+        with self._lock:
+            entries = list(self._models)
+        return {
+            'idle_seconds': self.idle_seconds,
+            'memory_budget_bytes': self.memory_budget_bytes,
+            'rss_bytes': process_rss_bytes(),
+            'models': {
+                entry['name']: dict(entry['model'].residency(), priority=entry['priority'])
+                for entry in entries
+            },
+        }
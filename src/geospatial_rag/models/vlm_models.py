@@ -0,0 +1,212 @@
+"""
+Vision-language model management for image captioning.
+"""
+
+import os
+import time
+import logging
+from typing import Any, Callable, Dict, List, Optional, Union
+
+import torch
+from PIL import Image
+from transformers import BlipForConditionalGeneration, BlipProcessor
+
+from ..metrics import REGISTRY, SIZE_BUCKETS, process_rss_bytes
+from ..utils import load_image
+from .loading import load_pretrained, load_report
+from .residency import ResidentModel
+
+logger = logging.getLogger(__name__)
+
+CAPTION_BATCH_SIZE = REGISTRY.histogram(
+    "caption_batch_size", "Images per caption generation call", buckets=SIZE_BUCKETS
+)
+CAPTION_SECONDS = REGISTRY.histogram("caption_seconds", "Duration of caption generation calls")
+
+
+class VLMManager(ResidentModel):
+    """BLIP-based captioner with batched generation."""
+    
+    def __init__(
+        self,
+        model_name: str = "Salesforce/blip-image-captioning-large",
+        device: str = "auto",
+        model: Optional[BlipForConditionalGeneration] = None,
+        processor: Optional[BlipProcessor] = None,
+        local_files_only: bool = False,
+        quantize: bool = False,
+        max_new_tokens: int = 30,
+        num_beams: int = 3,
+        batch_size: int = 8
+    ):
+        """
+        Load or adopt a BLIP captioning model.
+        
+        ``max_new_tokens`` and ``num_beams`` are the default generation
+        controls; greedy decoding (``num_beams=1``) is the fastest setting on
+        CPU. ``quantize`` applies dynamic int8 quantization on CPU. A model
+        loaded from a snapshot can be ``unload``-ed and reloads on next use.
+        """
+        self.model_name = model_name
+        self.local_files_only = local_files_only
+        self.quantize = quantize
+        self.max_new_tokens = max_new_tokens
+        self.num_beams = num_beams
+        self.batch_size = batch_size
+        self.device = self._setup_device(device)
+        self._load_model(model=model, processor=processor)
+        self._init_residency(reloadable=model is None)
+    
+    def _reload(self):
+        self._load_model(processor=self.processor)
+    
+    def _setup_device(self, device: str) -> torch.device:
+        """Setup and return the appropriate device."""
+        if device == "auto":
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        return torch.device(device)
+    
+    def _load_model(
+        self,
+        model: Optional[BlipForConditionalGeneration] = None,
+        processor: Optional[BlipProcessor] = None
+    ):
+        """Load the BLIP model and processor."""
+        try:
+            logger.info(f"Loading VLM model: {self.model_name}")
+            start = time.perf_counter()
+            rss_before = process_rss_bytes()
+            
+            if model is None:
+                model, loaded_processor, self.load_report = load_pretrained(
+                    BlipForConditionalGeneration, BlipProcessor, self.model_name,
+                    local_files_only=self.local_files_only
+                )
+                processor = processor or loaded_processor
+            else:
+                processor = processor or BlipProcessor.from_pretrained(
+                    self.model_name, local_files_only=self.local_files_only
+                )
+                self.load_report = load_report(
+                    self.model_name, model, time.perf_counter() - start, rss_before, source="provided"
+                )
+            self.processor = processor
+            self.model = model
+            self.model = self.model.to(self.device)
+            self.model.eval()
+            
+            if self.quantize and self.device.type == "cpu":
+                self.model = torch.ao.quantization.quantize_dynamic(
+                    self.model, {torch.nn.Linear}, dtype=torch.qint8
+                )
+            
+            self.input_size = self.model.config.vision_config.image_size
+            
+            logger.info(f"VLM model loaded successfully on {self.device}")
+        except Exception as e:
+            logger.error(f"Error loading VLM model: {str(e)}")
+            raise RuntimeError(f"Failed to load VLM model: {str(e)}")
+    
+    def _to_rgb(self, image: Union[Image.Image, str]) -> Image.Image:
+        """Open an image path near the model input size, or convert a PIL image to RGB."""
+        if isinstance(image, str):
+            return load_image(image, min_side=self.input_size)
+        return image.convert("RGB")
+    
+    def generate_captions(
+        self,
+        images: List[Union[Image.Image, str]],
+        prompt: Optional[str] = None,
+        max_new_tokens: Optional[int] = None,
+        num_beams: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        **generate_kwargs
+    ) -> List[str]:
+        """
+        Caption several images, ``batch_size`` images per ``generate`` call.
+        
+        ``prompt`` switches BLIP to conditional captioning (the caption
+        continues the prompt); extra keyword arguments go to ``generate``.
+        """
+        batch_size = batch_size or self.batch_size
+        generation = {
+            'max_new_tokens': max_new_tokens or self.max_new_tokens,
+            'num_beams': num_beams or self.num_beams,
+            **generate_kwargs,
+        }
+        captions = []
+        try:
+            for start in range(0, len(images), batch_size):
+                batch = [self._to_rgb(image) for image in images[start:start + batch_size]]
+                CAPTION_BATCH_SIZE.observe(len(batch))
+                began = time.perf_counter()
+                
+                text = [prompt] * len(batch) if prompt else None
+                with self.in_use():
+                    inputs = self.processor(images=batch, text=text, return_tensors="pt").to(self.device)
+                    with torch.no_grad():
+                        output_ids = self.model.generate(**inputs, **generation)
+                
+                captions.extend(
+                    caption.strip()
+                    for caption in self.processor.batch_decode(output_ids, skip_special_tokens=True)
+                )
+                CAPTION_SECONDS.observe(time.perf_counter() - began)
+            return captions
+        
+        except Exception as e:
+            logger.error(f"Error generating captions: {str(e)}")
+            raise
+    
+    def generate_caption(self, image: Union[Image.Image, str], prompt: Optional[str] = None,
+                         **generation) -> str:
+        """Caption a single image."""
+        return self.generate_captions([image], prompt=prompt, batch_size=1, **generation)[0]
+    
+    def precompute_captions(
+        self,
+        db,
+        image_root: Optional[str] = None,
+        batch_size: Optional[int] = None,
+        limit: Optional[int] = None,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+        **generation
+    ) -> int:
+        """
+        Caption every stored image that has no caption from this model yet.
+        
+        Captions are written to the database's ``captions`` table keyed by
+        image path, so query-time captioning of known images becomes a lookup.
+        The run is resumable: already-captioned paths are skipped.
+        """
+        batch_size = batch_size or self.batch_size
+        total = db.count_uncaptioned_paths(self.model_name)
+        done = 0
+        last_path = ""
+        logger.info(f"Precomputing captions for {total} images with {self.model_name}")
+        
+        while limit is None or done < limit:
+            count = batch_size if limit is None else min(batch_size, limit - done)
+            paths = db.uncaptioned_paths(self.model_name, after=last_path, limit=count)
+            if not paths:
+                break
+            last_path = paths[-1]
+            
+            files = {}
+            for path in paths:
+                image_file = os.path.join(image_root, path) if image_root and not os.path.isabs(path) else path
+                if os.path.exists(image_file):
+                    files[path] = image_file
+                else:
+                    logger.warning(f"Image not found for captioning: {image_file}")
+            
+            if files:
+                captions = self.generate_captions(list(files.values()), batch_size=batch_size, **generation)
+                db.add_captions(self.model_name, dict(zip(files, captions)))
+            done += len(paths)
+            
+            if progress_callback:
+                progress_callback({'model_name': self.model_name, 'total': total, 'processed': done})
+        
+        logger.info(f"Precomputed captions for {done} images")
+        return done
@@ -2,18 +2,35 @@
 Main pipeline for GeoSpatial-RAG system.
 """
 
+import os
+import time
 import logging
-from typing import Dict, List, Optional, Union, Any
+from typing import BinaryIO, Dict, Iterator, List, Optional, Union, Any
+import numpy as np
 from PIL import Image
 
 from .embeddings import CLIPEmbedder
-from .database import SQLiteVectorDB
+from .cache import QueryCache, image_fingerprint, normalize_text
+from .cascade import SignatureIndex
+from .classify import ZeroShotClassifier
+from .database import SQLiteVectorDB, make_document_id
+from .dedup import DuplicateIndex, compact
+from .knn import NeighborGraph
 from .retriever import SQLiteRetriever
+from .models.residency import ResidencyManager
 from .models.vlm_models import VLMManager
-from .utils import load_config, validate_image
+from .metrics import REGISTRY, MetricsSink
+from .tiling import SceneReader, chip_grid, iter_chip_batches, open_scene
+from .tracing import NULL_TRACE, Tracer
+from .utils import load_config, load_image, validate_image
 
 logger = logging.getLogger(__name__)
 
+QUERIES = REGISTRY.counter("queries_total", "Queries served", ["has_image"])
+QUERY_SECONDS = REGISTRY.histogram("query_seconds", "End-to-end query latency")
+CACHE_REQUESTS = REGISTRY.counter("cache_requests_total", "Cache lookups by outcome", ["cache", "result"])
+DOCUMENTS_INGESTED = REGISTRY.counter("documents_ingested_total", "Documents ingested", ["result"])
+
 
 class GeoSpatialRAG:
     """Main class for GeoSpatial-RAG system."""
@@ -23,63 +40,166 @@ class GeoSpatialRAG:
         db_path: str,
         config_path: Optional[str] = None,
         clip_model_name: str = "openai/clip-vit-base-patch32",
-        vlm_model_name: str = "Salesforce/blip-image-captioning-large",
+        vlm_model_name: Optional[str] = "Salesforce/blip-image-captioning-large",
         device: str = "auto",
+        embedder: Optional[CLIPEmbedder] = None,
+        trace_sinks: Optional[List[Any]] = None,
+        residency: Optional[ResidencyManager] = None,
         **kwargs
     ):
+        """
+        Set up the embedder, vector database and optional VLM.
+        
+        A pre-built ``embedder`` can be injected (for example one sharing a
+        model with other instances, or returning precomputed vectors in
+        benchmarks); passing ``vlm_model_name=None`` skips loading the VLM.
+        Other keyword arguments, or a ``config_path`` file, set the options
+        listed under "Pipeline Options" in the README.
+        """
         self.db_path = db_path
         self.config = load_config(config_path) if config_path else {}
         self.config.update(kwargs)
         
         logger.info("Initializing GeoSpatial-RAG system...")
         
-        self.embedder = CLIPEmbedder(model_name=clip_model_name, device=device)
-        self.db = SQLiteVectorDB(db_path)
+        local_files_only = self.config.get('local_files_only', False)
+        self.embedder = embedder or CLIPEmbedder(
+            model_name=clip_model_name, device=device, local_files_only=local_files_only
+        )
+        self.db = SQLiteVectorDB(
+            db_path,
+            read_only=self.config.get('read_only', False),
+            immutable=self.config.get('immutable', False),
+            mmap_size=self.config.get('mmap_size'),
+            cache_size=self.config.get('cache_size_kib')
+        )
         
-        try:
-            self.vlm_manager = VLMManager(model_name=vlm_model_name, device=device)
-        except Exception as e:
-            logger.warning(f"VLM manager initialization failed: {e}")
-            self.vlm_manager = None
+        self.vlm_manager = None
+        if vlm_model_name:
+            try:
+                self.vlm_manager = VLMManager(
+                    model_name=vlm_model_name,
+                    device=device,
+                    local_files_only=local_files_only,
+                    quantize=self.config.get('vlm_quantize', False),
+                    max_new_tokens=self.config.get('caption_max_new_tokens', 30),
+                    num_beams=self.config.get('caption_num_beams', 3)
+                )
+            except Exception as e:
+                logger.warning(f"VLM manager initialization failed: {e}")
+        
+        self.residency = residency
+        self._owns_residency = False
+        if residency is None and (
+            self.config.get('model_idle_seconds') is not None
+            or self.config.get('model_memory_budget_mb') is not None
+        ):
+            budget_mb = self.config.get('model_memory_budget_mb')
+            self.residency = ResidencyManager(
+                idle_seconds=self.config.get('model_idle_seconds'),
+                memory_budget_bytes=budget_mb * 2**20 if budget_mb is not None else None,
+                check_interval=self.config.get('residency_check_interval', 30.0)
+            )
+            self._owns_residency = True
+        if self.residency is not None:
+            if self.vlm_manager is not None:
+                self.residency.register(self.vlm_manager, priority=0)
+            if hasattr(self.embedder, 'unload'):
+                self.residency.register(self.embedder, priority=1)
+            if self._owns_residency:
+                self.residency.start()
         
         self.text_weight = self.config.get('text_weight', 0.7)
         self.image_weight = self.config.get('image_weight', 0.3)
         self.top_k = self.config.get('top_k', 5)
+        self.batch_size = self.config.get('batch_size', 16)
+        self.image_decode_size = self.config.get('image_decode_size') or max(
+            getattr(self.embedder, 'input_size', 224),
+            getattr(self.vlm_manager, 'input_size', 0) or 0
+        )
+        self.candidate_multiple = self.config.get('candidate_multiple', 10)
+        self.signature_index = None
+        if self.config.get('cascade'):
+            self.signature_index = SignatureIndex(
+                self.db, self.embedder.model_name, kind=self.config['cascade'],
+                dim=self.config.get('signature_dim', 64)
+            )
+        self.dedup_threshold = self.config.get('dedup_threshold')
+        cache_size = self.config.get('query_cache_size', 256)
+        self.query_cache = QueryCache(cache_size) if cache_size else None
+        self._duplicate_index = None
+        self._classifiers = {}
+        self.tracer = Tracer(trace_sinks)
+        # Per-stage latency histograms need every query traced, so they are
+        # opt-in; query, scan and scoring metrics are recorded regardless.
+        if self.config.get('metrics', False):
+            self.tracer.add_sink(MetricsSink(REGISTRY))
         
         logger.info("GeoSpatial-RAG system initialized successfully")
     
     def query(
         self,
         text: str,
-        image: Optional[Union[str, Image.Image]] = None,
+        image: Optional[Union[str, BinaryIO, Image.Image]] = None,
         top_k: Optional[int] = None,
         filter_class: Optional[str] = None,
-        generate_response: bool = True
+        generate_response: bool = True,
+        trace: bool = False,
+        group_by_image: bool = False
     ) -> Dict[str, Any]:
-        """Query the RAG system with text and/or image."""
+        """
+        Query the RAG system with text and/or image.
+        
+        ``group_by_image`` returns ``top_k`` distinct images instead of caption
+        rows, pooling caption scores per image (the ``group_pooling`` option,
+        ``max`` by default). With ``trace=True`` the per-stage timing tree is returned under
+        ``result['trace']``; it is also sent to the configured trace sinks.
+        Results are cached per normalized inputs, model and database version,
+        so a repeated query skips encoding and retrieval.
+        """
         logger.info(f"Processing query: '{text[:50]}...'")
         
         if top_k is None:
             top_k = self.top_k
         
-        if image is not None:
-            if isinstance(image, str):
-                image = Image.open(image).convert("RGB")
-            image = validate_image(image)
+        start = time.perf_counter()
+        has_image = image is not None
+        active_trace = self.tracer.start_trace(
+            "query", force=trace, top_k=top_k, filter_class=filter_class, has_image=has_image
+        )
         
-        text_embedding = self.embedder.encode_text(text)
-        image_embedding = None
-        if image is not None:
-            image_embedding = self.embedder.encode_image(image)
+        cache_key = self._query_cache_key(text, image, top_k, filter_class, generate_response, group_by_image)
+        if cache_key is not None:
+            with active_trace.span("cache_lookup") as span:
+                version = self.db.cache_version()
+                cached = self.query_cache.get(cache_key, version)
+                span.set("hit", cached is not None)
+            CACHE_REQUESTS.inc(cache="query", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                result = dict(cached, documents=cached['documents'].copy())
+                return self._finish_query(result, active_trace, has_image, start, trace)
         
-        retriever = SQLiteRetriever(
-            db_path=self.db_path,
-            query_embedding=text_embedding,
-            image_embedding=image_embedding,
-            combine_weights=(self.text_weight, self.image_weight)
-        )
+        image_path = image if isinstance(image, str) else None
+        image, text_embedding, image_embedding = self._encode_query(text, image, active_trace)
         
-        documents = retriever.get_relevant_documents(top_k=top_k, filter_class=filter_class)
+        with active_trace.span("retrieval"):
+            retriever = SQLiteRetriever(
+                db_path=self.db_path,
+                query_embedding=text_embedding,
+                image_embedding=image_embedding,
+                combine_weights=(self.text_weight, self.image_weight),
+                pool=self.db.pool,
+                model_name=self.embedder.model_name,
+                trace=active_trace,
+                cascade=self.signature_index,
+                candidate_multiple=self.candidate_multiple
+            )
+            if group_by_image:
+                documents = retriever.get_relevant_images(
+                    top_k=top_k, filter_class=filter_class, pooling=self.config.get('group_pooling', 'max')
+                )
+            else:
+                documents = retriever.get_relevant_documents(top_k=top_k, filter_class=filter_class)
         
         logger.info(f"Retrieved {len(documents)} relevant documents")
         
@@ -89,23 +209,440 @@ class GeoSpatialRAG:
             'num_retrieved': len(documents)
         }
         
+        cacheable = cache_key is not None
         if generate_response:
             try:
                 image_caption = None
                 if image is not None and self.vlm_manager:
-                    image_caption = self.vlm_manager.generate_caption(image)
+                    with active_trace.span("captioning"):
+                        image_caption = self._caption(image, image_path)
                     result['image_caption'] = image_caption
                 
-                context = self._build_context(documents)
-                response = self._generate_response(text, context, image_caption)
+                with active_trace.span("response_assembly"):
+                    context = self._build_context(documents)
+                    response = self._generate_response(text, context, image_caption)
                 result['response'] = response
                 
             except Exception as e:
                 logger.error(f"Error generating response: {str(e)}")
                 result['response'] = f"Error generating response: {str(e)}"
+                cacheable = False
+        
+        if cacheable:
+            self.query_cache.put(cache_key, dict(result, documents=documents.copy()), version)
+        return self._finish_query(result, active_trace, has_image, start, trace)
+    
+    def query_similar(
+        self,
+        doc_id: str,
+        top_k: Optional[int] = None,
+        filter_class: Optional[str] = None,
+        group_by_image: bool = False,
+        use_graph: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Find documents similar to a stored one ("more like this").
         
+        The document's stored text and image vectors are used as the query,
+        so no image is decoded and no model runs. When a current k-NN graph
+        (see ``build_knn_graph``) covers ``top_k`` and no filter or grouping is
+        requested, the neighbours are read straight from it. The document
+        itself (or, with ``group_by_image``, its own image) is excluded; ids
+        folded into a near-duplicate resolve to their canonical document.
+        """
+        if top_k is None:
+            top_k = self.top_k
+        start = time.perf_counter()
+        doc_id = self.db.resolve_alias(doc_id)
+        active_trace = self.tracer.start_trace("query_similar", top_k=top_k, filter_class=filter_class)
+        
+        with active_trace.span("load_embeddings"):
+            stored = self.db.get_embeddings(doc_id, self.embedder.model_name)
+        if stored is None or stored['text_embedding'] is None:
+            raise KeyError(f"No stored vectors for document {doc_id} under {self.embedder.model_name}")
+        
+        graph = NeighborGraph(self.db, self.embedder.model_name, (self.text_weight, self.image_weight))
+        if use_graph and not filter_class and not group_by_image and graph.is_fresh(top_k):
+            with active_trace.span("knn_graph"):
+                documents = graph.neighbors(doc_id, top_k)
+        else:
+            with active_trace.span("retrieval"):
+                retriever = SQLiteRetriever(
+                    db_path=self.db_path,
+                    query_embedding=stored['text_embedding'],
+                    image_embedding=stored['image_embedding'],
+                    combine_weights=(self.text_weight, self.image_weight),
+                    pool=self.db.pool,
+                    model_name=self.embedder.model_name,
+                    trace=active_trace,
+                    cascade=self.signature_index,
+                    candidate_multiple=self.candidate_multiple
+                )
+                if group_by_image:
+                    documents = retriever.get_relevant_images(
+                        top_k=top_k + 1, filter_class=filter_class,
+                        pooling=self.config.get('group_pooling', 'max')
+                    )
+                    own_path = stored['path'] or None
+                    documents = documents.take([
+                        i for i, (ids, path) in enumerate(zip(documents.columns['ids'], documents.columns['path']))
+                        if doc_id not in ids and (own_path is None or path != own_path)
+                    ])
+                else:
+                    documents = retriever.get_relevant_documents(top_k=top_k + 1, filter_class=filter_class)
+                    documents = documents.take(np.flatnonzero(documents.ids != doc_id))
+                documents = documents[:top_k]
+        
+        result = {
+            'query_id': doc_id,
+            'documents': documents,
+            'num_retrieved': len(documents)
+        }
+        return self._finish_query(result, active_trace, stored['image_embedding'] is not None, start, False)
+    
+    def build_knn_graph(self, k: int = 10, batch_size: int = 256) -> int:
+        """Precompute the ``k`` nearest neighbours of every document for ``query_similar``."""
+        graph = NeighborGraph(self.db, self.embedder.model_name, (self.text_weight, self.image_weight))
+        return graph.build(k=k, batch_size=batch_size)
+    
+    def _query_cache_key(self, text: str, image: Optional[Union[str, BinaryIO, Image.Image]], top_k: int,
+                         filter_class: Optional[str], generate_response: bool, group_by_image: bool):
+        """Key of a query in the result cache, or ``None`` when it cannot be cached."""
+        if self.query_cache is None:
+            return None
+        try:
+            fingerprint = image_fingerprint(image)
+        except (OSError, ValueError):
+            return None
+        return (
+            normalize_text(text), fingerprint, top_k, filter_class,
+            self.text_weight, self.image_weight, self.embedder.model_name,
+            generate_response, group_by_image, self.config.get('group_pooling', 'max'),
+            self.signature_index.kind if self.signature_index else None, self.candidate_multiple,
+            self.vlm_manager.model_name if self.vlm_manager else None,
+        )
+    
+    def _finish_query(self, result: Dict[str, Any], active_trace, has_image: bool,
+                      start: float, trace: bool) -> Dict[str, Any]:
+        """Close the query trace and record query metrics."""
+        active_trace.finish()
+        QUERIES.inc(has_image=str(has_image).lower())
+        QUERY_SECONDS.observe(time.perf_counter() - start)
+        if trace:
+            result['trace'] = active_trace.to_dict()
         return result
     
+    def _caption(self, image: Image.Image, image_path: Optional[str] = None) -> str:
+        """Look up a precomputed caption for a known image path, else generate one."""
+        if image_path:
+            candidates = [image_path]
+            image_root = self.config.get('image_root')
+            if image_root and os.path.isabs(image_path):
+                candidates.append(os.path.relpath(image_path, image_root))
+            for path in candidates:
+                caption = self.db.get_caption(path, self.vlm_manager.model_name)
+                if caption is not None:
+                    CACHE_REQUESTS.inc(cache="caption", result="hit")
+                    return caption
+            CACHE_REQUESTS.inc(cache="caption", result="miss")
+        return self.vlm_manager.generate_caption(image)
+    
+    def precompute_captions(self, batch_size: Optional[int] = None, **generation) -> int:
+        """Caption every stored image ahead of time; see ``VLMManager.precompute_captions``."""
+        if self.vlm_manager is None:
+            raise RuntimeError("No VLM loaded; initialize GeoSpatialRAG with a vlm_model_name")
+        return self.vlm_manager.precompute_captions(
+            self.db, image_root=self.config.get('image_root'), batch_size=batch_size, **generation
+        )
+    
+    def _encode_query(self, text: str, image: Optional[Union[str, BinaryIO, Image.Image]], trace=NULL_TRACE):
+        """Validate the query image and encode the text and image inputs."""
+        if image is not None:
+            with trace.span("image_validation"):
+                image = validate_image(load_image(image, min_side=self.image_decode_size))
+        
+        with trace.span("encode_text"):
+            text_embedding = self.embedder.encode_text(text)
+        image_embedding = None
+        if image is not None:
+            with trace.span("encode_image"):
+                image_embedding = self.embedder.encode_image(image)
+        
+        return image, text_embedding, image_embedding
+    
+    def query_pages(
+        self,
+        text: str,
+        image: Optional[Union[str, BinaryIO, Image.Image]] = None,
+        top_k: Optional[int] = None,
+        filter_class: Optional[str] = None,
+        page_size: int = 100,
+        cursor: Optional[int] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Stream ranked results page by page for large ``top_k`` and export jobs.
+        
+        Each yielded page is a result dict carrying its ``cursor`` and a
+        ``next_cursor``; passing ``next_cursor`` back as ``cursor`` resumes the
+        ranking at that position. ``next_cursor`` is ``None`` on the last page.
+        The ranked ``top_k`` is kept in the query cache (shared with ``query``
+        without a response), so resuming at a cursor neither re-encodes the
+        query nor rescans the database until the next write.
+        """
+        if top_k is None:
+            top_k = self.top_k
+        offset = cursor or 0
+        
+        cache_key = self._query_cache_key(text, image, top_k, filter_class, False, False)
+        documents = None
+        if cache_key is not None:
+            version = self.db.cache_version()
+            cached = self.query_cache.get(cache_key, version)
+            CACHE_REQUESTS.inc(cache="query", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                documents = cached['documents'].copy()
+        
+        if documents is None:
+            image, text_embedding, image_embedding = self._encode_query(text, image)
+            retriever = SQLiteRetriever(
+                db_path=self.db_path,
+                query_embedding=text_embedding,
+                image_embedding=image_embedding,
+                combine_weights=(self.text_weight, self.image_weight),
+                pool=self.db.pool,
+                model_name=self.embedder.model_name,
+                cascade=self.signature_index,
+                candidate_multiple=self.candidate_multiple
+            )
+            try:
+                documents = retriever.get_relevant_documents(top_k=top_k, filter_class=filter_class)
+            finally:
+                retriever.close()
+            if cache_key is not None:
+                self.query_cache.put(
+                    cache_key,
+                    {'query': text, 'documents': documents.copy(), 'num_retrieved': len(documents)},
+                    version
+                )
+        
+        while offset < len(documents):
+            end = offset + page_size
+            page = documents[offset:end]
+            yield {
+                'query': text,
+                'documents': page,
+                'num_retrieved': len(page),
+                'cursor': offset,
+                'next_cursor': end if end < len(documents) else None
+            }
+            offset = end
+    
+    def analyze_scene(
+        self,
+        scene: Union[str, Image.Image, SceneReader],
+        text: Optional[str] = None,
+        chip_size: Optional[int] = None,
+        stride: Optional[int] = None,
+        top_k: int = 3,
+        filter_class: Optional[str] = None,
+        batch_size: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        Search the database chip by chip across a large scene.
+        
+        The scene is read window by window (through rasterio for GeoTIFFs), cut
+        into ``chip_size`` chips every ``stride`` pixels and encoded in batches,
+        so peak memory is bounded by one batch of windows rather than the whole
+        scene. All chips are then ranked in a single database scan. With
+        ``text``, chips are ranked by the text query against stored captions
+        and by the chip itself against stored images.
+        """
+        chip_size = chip_size or self.config.get('chip_size', 512)
+        stride = stride or self.config.get('chip_stride', chip_size // 2)
+        batch_size = batch_size or self.batch_size
+        out_size = getattr(self.embedder, 'input_size', None)
+        
+        reader = open_scene(scene)
+        try:
+            chips = chip_grid(reader.width, reader.height, chip_size, stride)
+            logger.info(
+                f"Analyzing {reader.width}x{reader.height} scene as {len(chips)} chips "
+                f"of {chip_size}px with stride {stride}"
+            )
+            embeddings = []
+            for _, images in iter_chip_batches(reader, chips, batch_size, out_size):
+                embeddings.append(np.atleast_2d(self.embedder.encode_image(images)))
+            scene_size = reader.size
+        finally:
+            if reader is not scene:
+                reader.close()
+        
+        chip_embeddings = np.concatenate(embeddings)
+        if text:
+            text_embedding = self.embedder.encode_text(text)
+            query_embeddings = np.repeat(text_embedding[None, :], len(chips), axis=0)
+        else:
+            query_embeddings = chip_embeddings
+        
+        retriever = SQLiteRetriever(
+            db_path=self.db_path,
+            query_embedding=query_embeddings,
+            image_embedding=chip_embeddings,
+            combine_weights=(self.text_weight, self.image_weight),
+            pool=self.db.pool,
+            model_name=self.embedder.model_name
+        )
+        chip_documents = retriever.get_relevant_documents_batch(top_k=top_k, filter_class=filter_class)
+        
+        rows = max(chip.row for chip in chips) + 1
+        cols = max(chip.col for chip in chips) + 1
+        grid = [[None] * cols for _ in range(rows)]
+        for chip, documents in zip(chips, chip_documents):
+            grid[chip.row][chip.col] = {**chip.to_dict(), 'documents': documents}
+        
+        return {
+            'query': text,
+            'scene_size': scene_size,
+            'chip_size': chip_size,
+            'stride': stride,
+            'grid_shape': (rows, cols),
+            'num_chips': len(chips),
+            'grid': grid
+        }
+    
+    def add_documents(self, records: List[Dict[str, Any]], force: bool = False) -> List[str]:
+        """
+        Embed and store documents, skipping those already stored for the active model.
+        
+        Each record needs ``text`` and may carry ``image_path``, ``doc_class``
+        and ``metadata``. Ids are content-addressed, so re-running an ingestion
+        only encodes records that are new since the last run. With the
+        ``dedup_threshold`` option, records whose image nearly duplicates a
+        stored one are not stored but recorded as aliases of it.
+        """
+        model_name = self.embedder.model_name
+        doc_ids = [
+            make_document_id(r['text'], r.get('image_path', ""), r.get('doc_class', "document"))
+            for r in records
+        ]
+        
+        existing = set()
+        if not force:
+            with_image = [d for d, r in zip(doc_ids, records) if r.get('image_path')]
+            without_image = [d for d, r in zip(doc_ids, records) if not r.get('image_path')]
+            existing = self.db.existing_ids(with_image, model_name, require_image=True, include_aliases=True)
+            existing |= self.db.existing_ids(without_image, model_name)
+        
+        pending = [(d, r) for d, r in zip(doc_ids, records) if d not in existing]
+        image_cache = {}
+        duplicates = {}
+        if self.dedup_threshold and (
+            self._duplicate_index is None or self._duplicate_index.model_name != model_name
+        ):
+            self._duplicate_index = DuplicateIndex.from_db(self.db, model_name, self.dedup_threshold)
+        stored = 0
+        
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            text_embeddings = self.embedder.encode_text([r['text'] for _, r in batch])
+            documents = []
+            aliases = []
+            for (doc_id, record), text_embedding in zip(batch, text_embeddings):
+                image_path = record.get('image_path', "")
+                if image_path:
+                    hit = image_path in image_cache
+                    CACHE_REQUESTS.inc(cache="ingest_image", result="hit" if hit else "miss")
+                    if not hit:
+                        image_cache[image_path] = self.embedder.encode_image(image_path)
+                        if self.dedup_threshold:
+                            match = self._duplicate_index.match(image_path, image_cache[image_path])
+                            if match is not None:
+                                duplicates[image_path] = match
+                            else:
+                                self._duplicate_index.add(image_path, image_cache[image_path])
+                    if image_path in duplicates:
+                        canonical, similarity = duplicates[image_path]
+                        aliases.append({
+                            'alias_id': doc_id,
+                            'alias_path': image_path,
+                            'canonical_path': canonical,
+                            'model_name': model_name,
+                            'similarity': similarity,
+                        })
+                        continue
+                documents.append({
+                    'doc_id': doc_id,
+                    'text': record['text'],
+                    'text_embedding': text_embedding,
+                    'image_embedding': image_cache.get(image_path),
+                    'metadata': record.get('metadata'),
+                    'doc_class': record.get('doc_class', "document"),
+                    'image_path': image_path,
+                    'model_name': model_name,
+                })
+            self.db.add_documents(documents)
+            if aliases:
+                self.db.add_aliases(aliases)
+            stored += len(documents)
+        
+        DOCUMENTS_INGESTED.inc(stored, result="stored")
+        DOCUMENTS_INGESTED.inc(len(pending) - stored, result="duplicate")
+        DOCUMENTS_INGESTED.inc(len(records) - len(pending), result="skipped")
+        logger.info(
+            f"Ingested {stored} documents, merged {len(pending) - stored} near-duplicates, "
+            f"skipped {len(records) - len(pending)} unchanged"
+        )
+        return doc_ids
+    
+    def compact(self, threshold: Optional[float] = None, vacuum: bool = True, dry_run: bool = False) -> Dict[str, Any]:
+        """Fold near-duplicate stored images for the active model and reclaim space (see ``dedup.compact``)."""
+        report = compact(
+            self.db, self.embedder.model_name,
+            threshold=threshold or self.dedup_threshold or 0.98, vacuum=vacuum, dry_run=dry_run
+        )
+        self._duplicate_index = None
+        return report
+    
+    def build_signatures(self, kind: Optional[str] = None, refit: bool = False) -> int:
+        """Compute the cascade signatures missing for the active model and enable the cascade."""
+        kind = kind or self.config.get('cascade') or "binary"
+        index = self.signature_index
+        if index is None or index.kind != kind:
+            index = SignatureIndex(
+                self.db, self.embedder.model_name, kind=kind, dim=self.config.get('signature_dim', 64)
+            )
+        if refit:
+            index.fit()
+        written = index.build()
+        self.signature_index = index
+        return written
+    
+    def classify_images(
+        self,
+        images: List[Union[str, Image.Image]],
+        class_names: Optional[List[str]] = None,
+        templates: Optional[List[str]] = None,
+        top_k: int = 1,
+        batch_size: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Zero-shot scene labels for a batch of images (see ``classify.ZeroShotClassifier``).
+        
+        ``class_names`` defaults to the ``scene_classes`` option. Class prompt
+        vectors are stored in the database and reused across processes.
+        """
+        class_names = class_names or self.config.get('scene_classes')
+        if not class_names:
+            raise ValueError("No class names given and no scene_classes configured")
+        key = (self.embedder.model_name, tuple(class_names), tuple(templates or ()))
+        classifier = self._classifiers.get(key)
+        if classifier is None:
+            classifier = ZeroShotClassifier(
+                self.embedder, class_names, templates=templates, db=self.db, batch_size=self.batch_size
+            )
+            self._classifiers[key] = classifier
+        return classifier.classify(images, top_k=top_k, batch_size=batch_size)
+    
     def _build_context(self, documents: List) -> str:
         """Build context string from retrieved documents."""
         if not documents:
@@ -138,8 +675,48 @@ class GeoSpatialRAG:
         """Get database statistics."""
         return self.db.get_stats()
     
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Hit rate and size of the query result cache."""
+        return self.query_cache.stats() if self.query_cache else {}
+    
+    def get_model_stats(self) -> Dict[str, Any]:
+        """
+        Load time, memory and residency of each model.
+        
+        Per model this has the ``models.loading`` report of its latest load
+        and, for unloadable models, whether it is currently loaded, idle time
+        and eviction counts; ``residency`` summarizes the residency manager.
+        """
+        models = {'clip': self.embedder, 'vlm': self.vlm_manager}
+        stats = {
+            role: dict(getattr(model, 'load_report', None) or {}, **(
+                model.residency() if hasattr(model, 'residency') else {}
+            ))
+            for role, model in models.items() if model is not None
+        }
+        if self.residency is not None:
+            residency = self.residency.stats()
+            stats['residency'] = {key: value for key, value in residency.items() if key != 'models'}
+        return stats
+    
+    def get_metrics(self) -> str:
+        """Current metrics in the Prometheus text exposition format."""
+        return REGISTRY.render()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+    
     def close(self):
         """Close database connections and cleanup."""
+        if getattr(self, 'residency', None) is not None:
+            for model in (self.embedder, self.vlm_manager):
+                if model is not None:
+                    self.residency.unregister(model)
+            if self._owns_residency:
+                self.residency.stop()
         if hasattr(self, 'db'):
             self.db.close()
         logger.info("GeoSpatial-RAG system closed")
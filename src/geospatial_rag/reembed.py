@@ -0,0 +1,177 @@
+"""
+Incremental re-embedding of stored documents for a new CLIP model.
+"""
+
+import os
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from .database import SQLiteVectorDB
+
+logger = logging.getLogger(__name__)
+
+
+class ReembeddingJob:
+    """
+    Background job that fills in vectors for documents missing them under a model.
+    
+    Only rows without a text vector (or, for rows with an image path, without
+    an image vector) for ``embedder.model_name`` are processed, in id order and
+    in batches, so the job can be stopped and resumed at any point. Retrieval
+    keeps serving the old model's vectors until the application switches over.
+    """
+    
+    def __init__(
+        self,
+        db: SQLiteVectorDB,
+        embedder,
+        batch_size: int = 32,
+        throttle: float = 0.0,
+        image_root: Optional[str] = None,
+        include_images: bool = True,
+        progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None
+    ):
+        self.db = db
+        self.embedder = embedder
+        self.model_name = embedder.model_name
+        self.batch_size = batch_size
+        self.throttle = throttle
+        self.image_root = image_root
+        self.include_images = include_images
+        self.progress_callback = progress_callback
+        
+        self._stop = threading.Event()
+        self._thread = None
+        self._last_id = ""
+        self.total = 0
+        self.processed = 0
+        self.started_at = None
+    
+    def _missing_condition(self) -> str:
+        """SQL condition selecting rows that still need vectors for the model."""
+        condition = """NOT EXISTS (
+            SELECT 1 FROM text_embeddings te WHERE te.id = d.id AND te.model_name = :model
+        )"""
+        if self.include_images:
+            condition += """ OR (COALESCE(d.path, '') != '' AND NOT EXISTS (
+                SELECT 1 FROM image_embeddings ie WHERE ie.id = d.id AND ie.model_name = :model
+            ) AND NOT EXISTS (
+                SELECT 1 FROM image_vectors iv WHERE iv.path = d.path AND iv.model_name = :model
+            ))"""
+        return f"({condition})"
+    
+    def pending_count(self) -> int:
+        """Count the documents still missing vectors for the model."""
+        with self.db.pool.read() as cursor:
+            cursor.execute(
+                f"SELECT COUNT(*) FROM descriptions d WHERE {self._missing_condition()}",
+                {"model": self.model_name}
+            )
+            return cursor.fetchone()[0]
+    
+    def _next_batch(self) -> List[tuple]:
+        """Fetch the next batch of documents after the last processed id."""
+        with self.db.pool.read() as cursor:
+            cursor.execute(
+                f"""SELECT d.id, d.description, d.path FROM descriptions d
+                    WHERE d.id > :last_id AND {self._missing_condition()}
+                    ORDER BY d.id LIMIT :limit""",
+                {"model": self.model_name, "last_id": self._last_id, "limit": self.batch_size}
+            )
+            return [tuple(row) for row in cursor.fetchall()]
+    
+    def _resolve_path(self, path: str) -> str:
+        if self.image_root and not os.path.isabs(path):
+            return os.path.join(self.image_root, path)
+        return path
+    
+    def run_batch(self) -> int:
+        """Re-embed one batch; returns the number of documents processed."""
+        rows = self._next_batch()
+        if not rows:
+            return 0
+        
+        text_embeddings = dict(zip(
+            [row[0] for row in rows],
+            self.embedder.encode_text([row[1] or "" for row in rows])
+        ))
+        
+        image_embeddings = {}
+        if self.include_images:
+            by_path = {}
+            for doc_id, _, path in rows:
+                if not path:
+                    continue
+                if path not in by_path:
+                    image_file = self._resolve_path(path)
+                    if not os.path.exists(image_file):
+                        logger.warning(f"Image not found for re-embedding: {image_file}")
+                        by_path[path] = None
+                        continue
+                    by_path[path] = self.embedder.encode_image(image_file)
+                if by_path[path] is not None:
+                    image_embeddings[doc_id] = by_path[path]
+        
+        self.db.add_embeddings(self.model_name, text_embeddings, image_embeddings)
+        self._last_id = rows[-1][0]
+        self.processed += len(rows)
+        return len(rows)
+    
+    @property
+    def progress(self) -> Dict[str, Any]:
+        """Snapshot of the job's progress."""
+        elapsed = time.time() - self.started_at if self.started_at else 0.0
+        return {
+            'model_name': self.model_name,
+            'total': self.total,
+            'processed': self.processed,
+            'remaining': max(self.total - self.processed, 0),
+            'elapsed': elapsed,
+            'docs_per_second': self.processed / elapsed if elapsed > 0 else 0.0,
+            'running': self.is_running,
+        }
+    
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def run(self) -> Dict[str, Any]:
+        """Process batches until no documents are missing vectors or the job is stopped."""
+        self._stop.clear()
+        self._last_id = ""
+        self.processed = 0
+        self.total = self.pending_count()
+        self.started_at = time.time()
+        logger.info(f"Re-embedding {self.total} documents for {self.model_name}")
+        
+        while not self._stop.is_set():
+            try:
+                if self.run_batch() == 0:
+                    break
+            except Exception as e:
+                logger.error(f"Re-embedding batch failed: {str(e)}")
+                raise
+            
+            if self.progress_callback:
+                self.progress_callback(self.progress)
+            if self.throttle:
+                self._stop.wait(self.throttle)
+        
+        logger.info(f"Re-embedding finished: {self.processed}/{self.total} documents")
+        return self.progress
+    
+    def start(self) -> threading.Thread:
+        """Run the job on a daemon thread."""
+        if self.is_running:
+            return self._thread
+        self._thread = threading.Thread(target=self.run, name="reembedding-job", daemon=True)
+        self._thread.start()
+        return self._thread
+    
+    def stop(self, timeout: Optional[float] = None):
+        """Ask the job to stop after the current batch and wait for it."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -2,30 +2,203 @@
 Custom retriever implementation for SQLite vector database.
 """
 
+import copy
 import sqlite3
+import time
 import numpy as np
-from typing import List, Optional
+from typing import Any, Dict, Iterator, List, Optional, Sequence
 import logging
 
+from .database import ConnectionPool
+from .metrics import REGISTRY, ROW_BUCKETS
+from .tracing import NULL_TRACE
+
 logger = logging.getLogger(__name__)
 
+ROWS_SCANNED = REGISTRY.histogram(
+    "retriever_rows_scanned", "Candidate rows scored per retrieval", buckets=ROW_BUCKETS
+)
+SCAN_SECONDS = REGISTRY.histogram("retriever_scan_seconds", "Time spent fetching rows from SQLite")
+SCORE_SECONDS = REGISTRY.histogram("retriever_score_seconds", "Time spent scoring fetched rows")
+
 # Simple Document class for compatibility
 class Document:
+    __slots__ = ("page_content", "metadata")
+    
     def __init__(self, page_content: str, metadata: dict = None):
         self.page_content = page_content
         self.metadata = metadata or {}
+    
+    def __repr__(self):
+        return f"Document(page_content={self.page_content!r}, metadata={self.metadata!r})"
+
+
+def _object_array(values: Sequence) -> np.ndarray:
+    """1-D object array of ``values``, even when they are themselves lists."""
+    array = np.empty(len(values), dtype=object)
+    for i, value in enumerate(values):
+        array[i] = value
+    return array
+
+
+class ResultSet:
+    """
+    Ranked retrieval results stored column by column.
+    
+    Ids, captions, classes and scores are kept as arrays, plus optional extra
+    per-row ``columns`` that end up in each document's metadata. ``Document``
+    objects are only built for the rows a caller reads, by index or by
+    iteration, and then reused. It stands in for the list of documents it
+    replaces: ``len``, indexing, iteration and slicing all work, and slices
+    are again ``ResultSet``s sharing the same arrays.
+    """
+    
+    __slots__ = ("ids", "descriptions", "classes", "scores", "columns", "_documents")
+    
+    def __init__(self, ids: Sequence[str], descriptions: Sequence[str], classes: Sequence[str],
+                 scores: Sequence[float], columns: Optional[Dict[str, Sequence]] = None):
+        self.ids = _object_array(ids)
+        self.descriptions = _object_array(descriptions)
+        self.classes = _object_array(classes)
+        self.scores = np.asarray(scores, dtype=np.float64)
+        self.columns = {name: _object_array(values) for name, values in (columns or {}).items()}
+        self._documents = [None] * len(self.ids)
+    
+    @classmethod
+    def empty(cls) -> "ResultSet":
+        return cls([], [], [], [])
+    
+    def __len__(self) -> int:
+        return len(self.ids)
+    
+    def __repr__(self):
+        return f"ResultSet({len(self)} documents)"
+    
+    def _document(self, i: int) -> Document:
+        document = self._documents[i]
+        if document is None:
+            metadata = {"id": self.ids[i], "class": self.classes[i], "similarity": float(self.scores[i])}
+            for name, values in self.columns.items():
+                metadata[name] = values[i]
+            document = Document(page_content=self.descriptions[i], metadata=metadata)
+            self._documents[i] = document
+        return document
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(range(len(self))[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ResultSet index out of range")
+        return self._document(index)
+    
+    def __iter__(self) -> Iterator[Document]:
+        for i in range(len(self)):
+            yield self._document(i)
+    
+    def copy(self) -> "ResultSet":
+        """
+        An independent copy: documents are built afresh and column values
+        are deep-copied, so changes to one never show up in the other.
+        """
+        result = self.take(range(len(self)))
+        result.columns = {name: copy.deepcopy(values) for name, values in result.columns.items()}
+        result._documents = [None] * len(result)
+        return result
+    
+    def take(self, indices: Sequence[int]) -> "ResultSet":
+        """The rows at ``indices``, in that order; already built documents are kept."""
+        indices = np.asarray(indices, dtype=np.int64)
+        result = ResultSet.__new__(ResultSet)
+        result.ids = self.ids[indices]
+        result.descriptions = self.descriptions[indices]
+        result.classes = self.classes[indices]
+        result.scores = self.scores[indices]
+        result.columns = {name: values[indices] for name, values in self.columns.items()}
+        result._documents = [self._documents[i] for i in indices]
+        return result
+    
+    @classmethod
+    def concat(cls, result_sets: Sequence["ResultSet"]) -> "ResultSet":
+        """Join result sets end to end without re-ranking."""
+        result_sets = [r for r in result_sets if len(r)]
+        if not result_sets:
+            return cls.empty()
+        if len(result_sets) == 1:
+            return result_sets[0]
+        names = list(result_sets[0].columns)
+        result = cls.__new__(cls)
+        result.ids = np.concatenate([r.ids for r in result_sets])
+        result.descriptions = np.concatenate([r.descriptions for r in result_sets])
+        result.classes = np.concatenate([r.classes for r in result_sets])
+        result.scores = np.concatenate([r.scores for r in result_sets])
+        result.columns = {
+            name: np.concatenate([
+                r.columns.get(name, _object_array([None] * len(r))) for r in result_sets
+            ])
+            for name in names
+        }
+        result._documents = [d for r in result_sets for d in r._documents]
+        return result
+    
+    @classmethod
+    def merge(cls, result_sets: Sequence["ResultSet"], top_k: Optional[int] = None) -> "ResultSet":
+        """
+        Combine rankings, e.g. from several queries or database shards.
+        
+        Rows are ordered by score and each id is kept once, with its best
+        score; ``top_k`` truncates the merged ranking.
+        """
+        combined = cls.concat(result_sets)
+        order = np.argsort(-combined.scores, kind="stable")
+        _, first = np.unique(combined.ids[order].astype(str), return_index=True)
+        order = order[np.sort(first)]
+        return combined.take(order[:top_k] if top_k is not None else order)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain, JSON-serializable columns."""
+        return {
+            'ids': self.ids.tolist(),
+            'descriptions': self.descriptions.tolist(),
+            'classes': self.classes.tolist(),
+            'scores': self.scores.tolist(),
+            'columns': {name: values.tolist() for name, values in self.columns.items()},
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ResultSet":
+        return cls(data['ids'], data['descriptions'], data['classes'], data['scores'], data.get('columns'))
+    
+    def __getstate__(self):
+        return self.to_dict()
+    
+    def __setstate__(self, state):
+        self.__init__(state['ids'], state['descriptions'], state['classes'], state['scores'], state['columns'])
 
 
 class SQLiteRetriever:
     """Custom retriever class that works with SQLite vector database."""
     
-    def __init__(self, db_path: str, query_embedding=None, image_embedding=None, 
-                 combine_weights=(0.7, 0.3)):
+    def __init__(self, db_path: str, query_embedding=None, image_embedding=None,
+                 combine_weights=(0.7, 0.3), fetch_size: int = 4096,
+                 pool: Optional[ConnectionPool] = None, model_name: Optional[str] = None,
+                 trace=NULL_TRACE, cascade=None, candidate_multiple: int = 10):
         self.db_path = db_path
-        self.connection = sqlite3.connect(db_path)
+        # A shared pool hands out this thread's read connection; without one
+        # the retriever owns a private connection and closes it itself.
+        self.pool = pool
+        self.connection = pool.reader() if pool else sqlite3.connect(db_path)
         self.query_embedding = query_embedding
         self.image_embedding = image_embedding
         self.combine_weights = combine_weights
+        self.model_name = model_name
+        self.fetch_size = fetch_size
+        self.trace = trace
+        # Optional SignatureIndex: scan compact signatures first and re-rank
+        # only ``candidate_multiple * top_k`` rows with the full vectors.
+        self.cascade = cascade
+        self.candidate_multiple = candidate_multiple
     
     def _compute_similarity(self, embedding_a, embedding_b):
         """Compute cosine similarity between two embeddings."""
@@ -33,64 +206,470 @@ class SQLiteRetriever:
             np.linalg.norm(embedding_a) * np.linalg.norm(embedding_b)
         )
     
-    def get_relevant_documents(self, top_k=10, filter_class=None):
-        """Retrieve relevant documents based on embedding similarity."""
+    def _compute_similarities(self, query, matrix):
+        """
+        Compute cosine similarity between a query and every row of a matrix.
+        
+        A 2-D ``query`` holds one query per row and yields a
+        ``(len(matrix), len(query))`` score matrix.
+        """
+        return (matrix @ query.T) / np.multiply.outer(
+            np.linalg.norm(matrix, axis=1), np.linalg.norm(query, axis=-1)
+        )
+    
+    def _execute_scan(self, cursor, filter_class=None, ids=None, with_path=False, unsigned=None):
+        """
+        Run the candidate scan query.
+        
+        Only vectors with the same dimension as the query take part, and when
+        ``model_name`` is set only vectors produced by that model; rows still
+        waiting to be re-embedded for the model are skipped rather than mixed in.
+        With an ``unsigned`` signature index only rows that have no signature
+        in it are scanned.
+        """
+        text_join = "JOIN text_embeddings te ON d.id = te.id AND te.embedding_dim = ?"
+        join_params = [np.shape(self.query_embedding)[-1]]
+        if self.model_name is not None:
+            text_join += " AND te.model_name = ?"
+            join_params.append(self.model_name)
+        
+        # Image vectors are only read when there is an image query to score.
+        image_join = ""
+        image_column = "NULL"
+        if self.image_embedding is not None:
+            image_dim = np.shape(self.image_embedding)[-1]
+            image_join = "LEFT JOIN image_embeddings ie ON d.id = ie.id AND ie.embedding_dim = ?"
+            join_params.append(image_dim)
+            image_column = "ie.embedding"
+            if self.model_name is not None:
+                image_join += " AND ie.model_name = ?"
+                join_params.append(self.model_name)
+                # Rows whose per-caption copy was dropped share one vector per image path.
+                image_join += """
+            LEFT JOIN image_vectors iv ON iv.path = d.path AND iv.model_name = ? AND iv.embedding_dim = ?"""
+                join_params.extend([self.model_name, image_dim])
+                image_column = "COALESCE(ie.embedding, iv.embedding)"
+        
+        conditions = []
+        params = []
+        if ids is not None:
+            conditions.append(f"d.id IN ({','.join('?' * len(ids))})")
+            params.extend(ids)
+        if filter_class:
+            conditions.append("d.class = ?")
+            params.append(filter_class)
+        if unsigned is not None:
+            conditions.append("""NOT EXISTS (
+                SELECT 1 FROM signatures s WHERE s.id = d.id AND s.model_name = ? AND s.kind = ?
+            )""")
+            params.extend([unsigned.model_name, unsigned.kind])
+        conditions.append("d.id NOT LIKE 'query_%'")
+        
+        cursor.execute(f"""
+            SELECT d.id, te.embedding, {image_column}, d.description, d.class{", d.path" if with_path else ""}
+            FROM descriptions d
+            {text_join}
+            {image_join}
+            WHERE {" AND ".join(conditions)}
+        """, join_params + params)
+    
+    def _score_chunk(self, rows):
+        """Score a chunk of scan rows with vectorized similarity."""
+        text_matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+        scores = self._compute_similarities(self.query_embedding, text_matrix)
+        
+        if self.image_embedding is not None:
+            with_image = [i for i, row in enumerate(rows) if row[2] is not None]
+            if with_image:
+                image_matrix = np.stack([
+                    np.frombuffer(rows[i][2], dtype=np.float32) for i in with_image
+                ])
+                img_scores = self._compute_similarities(self.image_embedding, image_matrix)
+                scores[with_image] = (
+                    self.combine_weights[0] * scores[with_image] +
+                    self.combine_weights[1] * img_scores
+                )
+        
+        return scores
+    
+    def _iter_scored_chunks(self, filter_class=None, with_path=False):
+        """
+        Stream candidate rows from SQLite in chunks of ``fetch_size`` with their scores.
+        
+        Only one chunk of raw embedding blobs is held in memory at a time.
+        """
         cursor = self.connection.cursor()
+        scan_seconds = score_seconds = 0.0
+        rows_seen = 0
         
-        if self.query_embedding is None:
-            logger.warning("No query embedding provided")
-            return []
+        try:
+            started = time.perf_counter()
+            self._execute_scan(cursor, filter_class, with_path=with_path)
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                fetched = time.perf_counter()
+                scan_seconds += fetched - started
+                if not rows:
+                    break
+                scores = self._score_chunk(rows)
+                score_seconds += time.perf_counter() - fetched
+                rows_seen += len(rows)
+                yield rows, scores
+                started = time.perf_counter()
+        finally:
+            cursor.close()
+        
+        ROWS_SCANNED.observe(rows_seen)
+        SCAN_SECONDS.observe(scan_seconds)
+        SCORE_SECONDS.observe(score_seconds)
+        self.trace.record("sqlite_scan", scan_seconds, rows=rows_seen)
+        self.trace.record("scoring", score_seconds, rows=rows_seen)
+    
+    def _score_documents(self, filter_class=None):
+        """
+        Score every candidate row once.
+        
+        Only the scores, ids, descriptions and classes are kept in memory,
+        never the raw embedding blobs of the whole table.
+        """
+        ids, descriptions, classes, score_chunks = [], [], [], []
+        for rows, scores in self._iter_scored_chunks(filter_class):
+            score_chunks.append(scores)
+            for row in rows:
+                ids.append(row[0])
+                descriptions.append(row[3])
+                classes.append(row[4])
         
+        scores = np.concatenate(score_chunks) if score_chunks else np.zeros(0, dtype=np.float32)
+        return ids, descriptions, classes, scores
+    
+    def _cascade_documents(self, filter_class, stop):
+        """
+        Score candidates in two stages: signatures for every row, full vectors for the best few.
+        
+        Only the ``candidate_multiple * stop`` rows with the highest approximate
+        scores are fetched again and scored exactly, so the float32 vectors of
+        the rest of the table are never read. Rows without a signature yet
+        (added since the last ``build``) are scored exactly and merged in, so
+        they are never missed; an index without a fitted projection falls back
+        to the exact scan.
+        """
+        index = self.cascade
+        if not index.ready:
+            return self._score_documents(filter_class)
+        num_candidates = max(stop * self.candidate_multiple, stop)
+        text_query = np.asarray(self.query_embedding, dtype=np.float32)
+        text_signature = index.query_signature(text_query)
+        image_query = image_signature = None
+        if self.image_embedding is not None:
+            image_query = np.asarray(self.image_embedding, dtype=np.float32)
+            image_signature = index.query_signature(image_query)
+        
+        conditions = ["s.model_name = ?", "s.kind = ?", "d.id NOT LIKE 'query_%'"]
+        params = [index.model_name, index.kind]
         if filter_class:
-            cursor.execute("""
-                SELECT d.id, te.embedding, ie.embedding, d.description, d.class 
-                FROM descriptions d
-                JOIN text_embeddings te ON d.id = te.id
-                LEFT JOIN image_embeddings ie ON d.id = ie.id
-                WHERE d.class = ? AND d.id NOT LIKE 'query_%'
-            """, (filter_class,))
-        else:
-            cursor.execute("""
-                SELECT d.id, te.embedding, ie.embedding, d.description, d.class 
-                FROM descriptions d
-                JOIN text_embeddings te ON d.id = te.id
-                LEFT JOIN image_embeddings ie ON d.id = ie.id
-                WHERE d.id NOT LIKE 'query_%'
-            """)
-        
-        results = cursor.fetchall()
-        similarities = []
-        
-        for id, text_emb_bytes, img_emb_bytes, description, item_class in results:
-            text_emb = np.frombuffer(text_emb_bytes, dtype=np.float32)
-            
-            text_similarity = self._compute_similarity(self.query_embedding, text_emb)
-            combined_similarity = text_similarity
-            
-            if self.image_embedding is not None and img_emb_bytes is not None:
-                img_emb = np.frombuffer(img_emb_bytes, dtype=np.float32)
-                img_similarity = self._compute_similarity(self.image_embedding, img_emb)
+            conditions.append("d.class = ?")
+            params.append(filter_class)
+        
+        best_ids = []
+        best_scores = np.zeros(0, dtype=np.float32)
+        cursor = self.connection.cursor()
+        started = time.perf_counter()
+        rows_seen = 0
+        try:
+            cursor.execute(f"""
+                SELECT s.id, s.text_signature, s.image_signature
+                FROM signatures s JOIN descriptions d ON d.id = s.id
+                WHERE {" AND ".join(conditions)}
+            """, params)
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if not rows:
+                    break
+                rows_seen += len(rows)
+                scores = index.similarities(
+                    text_query, text_signature, index.decode([row[1] for row in rows])
+                )
+                if image_signature is not None:
+                    with_image = [i for i, row in enumerate(rows) if row[2] is not None]
+                    if with_image:
+                        image_scores = index.similarities(
+                            image_query, image_signature, index.decode([rows[i][2] for i in with_image])
+                        )
+                        scores[with_image] = (
+                            self.combine_weights[0] * scores[with_image] +
+                            self.combine_weights[1] * image_scores
+                        )
                 
-                combined_similarity = (
-                    self.combine_weights[0] * text_similarity + 
-                    self.combine_weights[1] * img_similarity
+                best_ids.extend(row[0] for row in rows)
+                best_scores = np.concatenate([best_scores, scores])
+                if len(best_scores) > num_candidates:
+                    keep = np.argpartition(-best_scores, num_candidates - 1)[:num_candidates]
+                    best_ids = [best_ids[i] for i in keep]
+                    best_scores = best_scores[keep]
+        finally:
+            cursor.close()
+        self.trace.record(
+            "signature_scan", time.perf_counter() - started, rows=rows_seen, kind=index.kind
+        )
+        
+        ids, descriptions, classes, score_chunks = [], [], [], []
+        started = time.perf_counter()
+        cursor = self.connection.cursor()
+        try:
+            for start in range(0, len(best_ids), 500):
+                self._execute_scan(cursor, filter_class, ids=best_ids[start:start + 500])
+                rows = cursor.fetchall()
+                if not rows:
+                    continue
+                score_chunks.append(self._score_chunk(rows))
+                for row in rows:
+                    ids.append(row[0])
+                    descriptions.append(row[3])
+                    classes.append(row[4])
+            
+            self._execute_scan(cursor, filter_class, unsigned=index)
+            while True:
+                rows = cursor.fetchmany(self.fetch_size)
+                if not rows:
+                    break
+                rows_seen += len(rows)
+                score_chunks.append(self._score_chunk(rows))
+                for row in rows:
+                    ids.append(row[0])
+                    descriptions.append(row[3])
+                    classes.append(row[4])
+        finally:
+            cursor.close()
+        self.trace.record("rerank", time.perf_counter() - started, rows=len(ids))
+        ROWS_SCANNED.observe(rows_seen)
+        
+        scores = np.concatenate(score_chunks) if score_chunks else np.zeros(0, dtype=np.float32)
+        return ids, descriptions, classes, scores
+    
+    def _image_scores(self, paths):
+        """
+        Score the shared ``image_vectors`` of the given paths against the image
+        query, falling back to a per-caption vector for images that have none.
+        """
+        scores = {}
+        with_path = [path for path in paths if path]
+        params = [self.model_name, np.shape(self.image_embedding)[-1]]
+        cursor = self.connection.cursor()
+        try:
+            for start in range(0, len(with_path), 500):
+                chunk = with_path[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(
+                    f"""SELECT path, embedding FROM image_vectors
+                        WHERE model_name = ? AND embedding_dim = ? AND path IN ({placeholders})
+                        UNION ALL
+                        SELECT d.path, MIN(ie.embedding) FROM descriptions d
+                        JOIN image_embeddings ie ON ie.id = d.id AND ie.model_name = ? AND ie.embedding_dim = ?
+                        WHERE d.path IN ({placeholders}) AND NOT EXISTS (
+                            SELECT 1 FROM image_vectors iv WHERE iv.path = d.path AND iv.model_name = ie.model_name
+                        )
+                        GROUP BY d.path""",
+                    [*params, *chunk, *params, *chunk]
                 )
+                rows = cursor.fetchall()
+                if rows:
+                    matrix = np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows])
+                    scores.update(zip(
+                        [row[0] for row in rows], self._compute_similarities(self.image_embedding, matrix)
+                    ))
+        finally:
+            cursor.close()
+        return scores
+    
+    def get_relevant_images(self, top_k=10, filter_class=None, pooling: str = "max") -> ResultSet:
+        """
+        Retrieve the ``top_k`` most relevant distinct images.
+        
+        Caption rows are scored against the text query and pooled per image
+        path (``max`` or ``mean``) with a vectorized segment reduction; the
+        image query is scored once per image against ``image_vectors``. Each
+        result carries the best-matching caption as ``page_content`` and all
+        of the image's captions in its metadata. Rows without a path form
+        their own group.
+        """
+        if self.query_embedding is None:
+            logger.warning("No query embedding provided")
+            return ResultSet.empty()
+        if pooling not in ("max", "mean"):
+            raise ValueError(f"Unknown pooling '{pooling}', expected 'max' or 'mean'")
+        
+        saved_image, self.image_embedding = self.image_embedding, None
+        try:
+            ids, descriptions, classes, paths, score_chunks = [], [], [], [], []
+            for rows, scores in self._iter_scored_chunks(filter_class, with_path=True):
+                score_chunks.append(scores)
+                for row in rows:
+                    ids.append(row[0])
+                    descriptions.append(row[3])
+                    classes.append(row[4])
+                    paths.append(row[5] or "")
+        finally:
+            self.image_embedding = saved_image
+        if not ids:
+            return ResultSet.empty()
+        
+        with self.trace.span("grouping", rows=len(ids)):
+            text_scores = np.concatenate(score_chunks)
+            keys = [path or f"\x00{doc_id}" for path, doc_id in zip(paths, ids)]
+            group_keys, inverse = np.unique(np.array(keys, dtype=object), return_inverse=True)
+            # Sort rows by group, best caption first, so each group is a contiguous segment.
+            order = np.lexsort((-text_scores, inverse))
+            starts = np.flatnonzero(np.r_[True, np.diff(inverse[order]) != 0])
+            ends = np.r_[starts[1:], len(order)]
+            best_rows = order[starts]
+            if pooling == "max":
+                pooled = text_scores[best_rows]
+            else:
+                pooled = np.bincount(inverse, weights=text_scores) / np.bincount(inverse)
             
-            doc = Document(
-                page_content=description,
-                metadata={
-                    "id": id,
-                    "class": item_class,
-                    "similarity": float(combined_similarity)
-                }
+            group_scores = pooled.astype(np.float64)
+            if self.image_embedding is not None and self.model_name is not None:
+                group_paths = [paths[row] for row in best_rows]
+                image_scores = self._image_scores(group_paths)
+                with_image = [i for i, path in enumerate(group_paths) if path in image_scores]
+                if with_image:
+                    group_scores[with_image] = (
+                        self.combine_weights[0] * group_scores[with_image] +
+                        self.combine_weights[1] * np.array([image_scores[group_paths[i]] for i in with_image])
+                    )
+        
+        with self.trace.span("ranking", candidates=len(group_scores)):
+            ranked = self._rank(group_scores, top_k)
+        
+        best = best_rows[ranked]
+        members = [order[starts[group]:ends[group]] for group in ranked]
+        return ResultSet(
+            [ids[i] for i in best],
+            [descriptions[i] for i in best],
+            [classes[i] for i in best],
+            group_scores[ranked],
+            columns={
+                "path": [paths[i] for i in best],
+                "captions": [[descriptions[i] for i in rows] for rows in members],
+                "ids": [[ids[i] for i in rows] for rows in members],
+            }
+        )
+    
+    @staticmethod
+    def _rank(scores, stop):
+        """Return the indices of the ``stop`` best scores in descending order."""
+        stop = min(stop, len(scores))
+        if stop <= 0:
+            return np.zeros(0, dtype=np.int64)
+        if stop < len(scores):
+            candidates = np.argpartition(-scores, stop - 1)[:stop]
+            candidates.sort()
+        else:
+            candidates = np.arange(len(scores))
+        order = np.argsort(-scores[candidates], kind="stable")
+        return candidates[order]
+    
+    def iter_relevant_documents(
+        self,
+        top_k: int = 10,
+        filter_class: Optional[str] = None,
+        page_size: int = 100,
+        offset: int = 0
+    ) -> Iterator[ResultSet]:
+        """
+        Lazily yield ranked documents in pages.
+        
+        Scores are computed once and only the best ``offset + top_k`` rows are
+        ordered, using a partial sort; each page is a ``ResultSet`` whose
+        ``Document`` objects are only built as the caller reads them.
+        """
+        if self.query_embedding is None:
+            logger.warning("No query embedding provided")
+            return
+        
+        if self.cascade is not None:
+            ids, descriptions, classes, scores = self._cascade_documents(filter_class, offset + top_k)
+        else:
+            ids, descriptions, classes, scores = self._score_documents(filter_class)
+        with self.trace.span("ranking", candidates=len(scores)):
+            ranked = self._rank(scores, offset + top_k)[offset:]
+        
+        for start in range(0, len(ranked), page_size):
+            started = time.perf_counter()
+            rows = ranked[start:start + page_size]
+            page = ResultSet(
+                [ids[i] for i in rows], [descriptions[i] for i in rows], [classes[i] for i in rows], scores[rows]
             )
+            self.trace.record("materialize", time.perf_counter() - started, documents=len(page))
+            yield page
+    
+    def get_relevant_documents(self, top_k=10, filter_class=None) -> ResultSet:
+        """Retrieve relevant documents based on embedding similarity."""
+        return ResultSet.concat(list(self.iter_relevant_documents(
+            top_k=top_k, filter_class=filter_class, page_size=max(top_k, 1)
+        )))
+    
+    def get_relevant_documents_batch(self, top_k=10, filter_class=None) -> List[ResultSet]:
+        """
+        Retrieve documents for many queries with a single scan.
+        
+        ``query_embedding`` (and ``image_embedding``, if set) hold one query
+        per row. A running top-``k`` per query is merged chunk by chunk, so
+        scores take ``(k + fetch_size) x queries`` floats however large the
+        table is; the id, description and class of every scanned row are
+        kept until the end, so that part grows with the table. Returns one
+        ranked list per query.
+        """
+        if self.query_embedding is None:
+            logger.warning("No query embedding provided")
+            return []
+        
+        num_queries = len(self.query_embedding)
+        if top_k <= 0:
+            return [ResultSet.empty() for _ in range(num_queries)]
+        best_scores = np.zeros((0, num_queries), dtype=np.float32)
+        best_rows = np.zeros((0, num_queries), dtype=np.int64)
+        ids, descriptions, classes = [], [], []
+        
+        for rows, scores in self._iter_scored_chunks(filter_class):
+            row_index = np.arange(len(ids), len(ids) + len(rows))
+            for row in rows:
+                ids.append(row[0])
+                descriptions.append(row[3])
+                classes.append(row[4])
             
-            similarities.append((doc, combined_similarity))
+            best_scores = np.concatenate([best_scores, scores])
+            best_rows = np.concatenate([
+                best_rows, np.broadcast_to(row_index[:, None], scores.shape)
+            ])
+            if len(best_scores) > top_k:
+                keep = np.argpartition(-best_scores, top_k - 1, axis=0)[:top_k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=0)
+                best_rows = np.take_along_axis(best_rows, keep, axis=0)
+        
+        with self.trace.span("ranking", candidates=len(ids), queries=num_queries):
+            order = np.argsort(-best_scores, axis=0, kind="stable")
+            best_scores = np.take_along_axis(best_scores, order, axis=0)
+            best_rows = np.take_along_axis(best_rows, order, axis=0)
         
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        return [doc for doc, _ in similarities[:top_k]]
+        results = []
+        for query in range(num_queries):
+            rows = best_rows[:, query]
+            results.append(ResultSet(
+                [ids[i] for i in rows], [descriptions[i] for i in rows], [classes[i] for i in rows],
+                best_scores[:, query]
+            ))
+        return results
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
     
     def close(self):
-        """Close the database connection."""
-        if self.connection:
+        """Close the database connection unless it belongs to a shared pool."""
+        if self.connection and self.pool is None:
             self.connection.close()
+        self.connection = None
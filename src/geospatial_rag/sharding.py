@@ -0,0 +1,134 @@
+"""
+Multi-node ingestion: manifest sharding and merging of partial databases.
+
+Every node reads the same manifest, keeps shard ``i`` of ``N`` and writes
+its own partial database; the partial files are then merged into one.
+
+Example:
+    python -m geospatial_rag.sharding ingest manifest.jsonl --shard 0 --num-shards 4 --output part-0.db
+    python -m geospatial_rag.sharding merge merged.db part-0.db part-1.db part-2.db part-3.db
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from .database import SQLiteVectorDB
+from .ingest import ParallelIngestor
+
+logger = logging.getLogger(__name__)
+
+
+def read_manifest(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the records of a JSON Lines manifest.
+    
+    Each line is an object with ``text`` and optionally ``image_path``,
+    ``doc_class`` and ``metadata``, as for ``GeoSpatialRAG.add_documents``.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def shard_of(record: Dict[str, Any], num_shards: int) -> int:
+    """
+    Shard a record belongs to.
+    
+    Records are assigned by a stable hash of their image path (or their text
+    when there is no image), so all captions of an image land on the same
+    node and every node computes the same split without coordination.
+    """
+    key = record.get('image_path') or record['text']
+    return int(hashlib.sha1(key.encode("utf-8")).hexdigest()[:8], 16) % num_shards
+
+
+def shard_records(records: Iterable[Dict[str, Any]], shard_index: int, num_shards: int) -> List[Dict[str, Any]]:
+    """The records of ``shard_index`` out of ``num_shards``."""
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Shard index {shard_index} out of range for {num_shards} shards")
+    return [record for record in records if shard_of(record, num_shards) == shard_index]
+
+
+def ingest_shard(
+    manifest_path: str,
+    shard_index: int,
+    num_shards: int,
+    output_path: str,
+    embedder=None,
+    embedder_kwargs: Optional[Dict[str, Any]] = None,
+    **ingestor_kwargs
+) -> Dict[str, Any]:
+    """
+    Ingest one shard of a manifest into its own partial database.
+    
+    Extra keyword arguments go to ``ParallelIngestor`` (``num_workers``,
+    ``image_root`` and so on). Re-running a shard only encodes what is
+    missing from its partial database.
+    """
+    records = shard_records(read_manifest(manifest_path), shard_index, num_shards)
+    logger.info(f"Shard {shard_index}/{num_shards}: {len(records)} records -> {output_path}")
+    with SQLiteVectorDB(output_path) as db:
+        report = ParallelIngestor(
+            db, embedder=embedder, embedder_kwargs=embedder_kwargs, **ingestor_kwargs
+        ).run(records)
+    report.update(shard=shard_index, num_shards=num_shards, output=output_path)
+    return report
+
+
+def merge_databases(output_path: str, partial_paths: List[str], optimize: bool = True,
+                    rebuild_derived: bool = True) -> Dict[str, Any]:
+    """Merge partial databases into ``output_path``; see ``SQLiteVectorDB.merge``."""
+    with SQLiteVectorDB(output_path) as db:
+        report = db.merge(partial_paths, optimize=optimize, rebuild_derived=rebuild_derived)
+        report['total_documents'] = db.get_stats()['total_documents']
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded ingestion and partial database merging")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    ingest = commands.add_parser("ingest", help="Ingest one shard of a manifest")
+    ingest.add_argument("manifest")
+    ingest.add_argument("--shard", type=int, required=True)
+    ingest.add_argument("--num-shards", type=int, required=True)
+    ingest.add_argument("--output", required=True)
+    ingest.add_argument("--model", default="openai/clip-vit-base-patch32")
+    ingest.add_argument("--device", default="cpu")
+    ingest.add_argument("--local-files-only", action="store_true")
+    ingest.add_argument("--workers", type=int, default=None)
+    ingest.add_argument("--threads-per-worker", type=int, default=None)
+    ingest.add_argument("--image-root", default=None)
+    
+    merge = commands.add_parser("merge", help="Merge partial databases into one")
+    merge.add_argument("output")
+    merge.add_argument("partials", nargs="+")
+    merge.add_argument("--no-optimize", action="store_true")
+    merge.add_argument("--no-rebuild-derived", action="store_true")
+    
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "ingest":
+        report = ingest_shard(
+            args.manifest, args.shard, args.num_shards, args.output,
+            embedder_kwargs={
+                'model_name': args.model, 'device': args.device, 'local_files_only': args.local_files_only
+            },
+            num_workers=args.workers,
+            threads_per_worker=args.threads_per_worker,
+            image_root=args.image_root
+        )
+    else:
+        report = merge_databases(
+            args.output, args.partials,
+            optimize=not args.no_optimize, rebuild_derived=not args.no_rebuild_derived
+        )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Windowed reading and chipping of large remote sensing scenes.
+"""
+
+import logging
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class Chip:
+    """Position of one chip within a scene grid."""
+    
+    __slots__ = ("row", "col", "x", "y", "width", "height")
+    
+    def __init__(self, row: int, col: int, x: int, y: int, width: int, height: int):
+        self.row = row
+        self.col = col
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+    
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+def _axis_offsets(length: int, chip_size: int, stride: int) -> List[int]:
+    """Chip start offsets along one axis, with a final chip flush against the edge."""
+    if length <= chip_size:
+        return [0]
+    offsets = list(range(0, length - chip_size + 1, stride))
+    if offsets[-1] != length - chip_size:
+        offsets.append(length - chip_size)
+    return offsets
+
+
+def chip_grid(width: int, height: int, chip_size: int, stride: Optional[int] = None) -> List[Chip]:
+    """
+    Lay out overlapping chips over a ``width x height`` scene.
+    
+    ``stride`` defaults to ``chip_size`` (no overlap). The last row and column
+    are shifted to end at the scene border, so every pixel is covered without
+    padding.
+    """
+    stride = stride or chip_size
+    if chip_size <= 0 or stride <= 0:
+        raise ValueError("chip_size and stride must be positive")
+    
+    chips = []
+    for row, y in enumerate(_axis_offsets(height, chip_size, stride)):
+        for col, x in enumerate(_axis_offsets(width, chip_size, stride)):
+            chips.append(Chip(row, col, x, y, min(chip_size, width), min(chip_size, height)))
+    return chips
+
+
+def _fit_size(width: int, height: int, out_size: int) -> Tuple[int, int]:
+    """Size of a ``width x height`` window scaled to fit an ``out_size`` square."""
+    scale = out_size / max(width, height)
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _pad_square(chip: Image.Image, out_size: int) -> Image.Image:
+    """Centre ``chip`` on a black ``out_size`` square."""
+    if chip.size == (out_size, out_size):
+        return chip
+    canvas = Image.new("RGB", (out_size, out_size))
+    canvas.paste(chip, ((out_size - chip.width) // 2, (out_size - chip.height) // 2))
+    return canvas
+
+
+class SceneReader:
+    """
+    Reads rectangular windows of a scene as RGB images.
+    
+    With ``out_size`` a window is scaled to fit an ``out_size`` square and,
+    when it is not square (edge chips of scenes smaller than a chip), padded
+    with black rather than stretched.
+    """
+    
+    width = 0
+    height = 0
+    
+    @property
+    def size(self) -> Tuple[int, int]:
+        return self.width, self.height
+    
+    def read(self, x: int, y: int, width: int, height: int,
+             out_size: Optional[int] = None) -> Image.Image:
+        raise NotImplementedError
+    
+    def close(self):
+        pass
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class PILSceneReader(SceneReader):
+    """
+    Window reader backed by PIL.
+    
+    PIL cannot decode part of a JPEG or striped TIFF, so the scene is decoded
+    once on the first read; use ``RasterioSceneReader`` to keep memory bounded
+    by the window size.
+    """
+    
+    def __init__(self, source: Union[str, Image.Image]):
+        self._owned = isinstance(source, str)
+        self.image = Image.open(source) if self._owned else source
+        self.width, self.height = self.image.size
+    
+    def read(self, x: int, y: int, width: int, height: int,
+             out_size: Optional[int] = None) -> Image.Image:
+        chip = self.image.crop((x, y, x + width, y + height))
+        if chip.mode != "RGB":
+            chip = chip.convert("RGB")
+        if out_size:
+            size = _fit_size(width, height, out_size)
+            if size != chip.size:
+                chip = chip.resize(size, Image.Resampling.BILINEAR)
+            chip = _pad_square(chip, out_size)
+        return chip
+    
+    def close(self):
+        if self._owned:
+            self.image.close()
+
+
+class RasterioSceneReader(SceneReader):
+    """
+    Window reader backed by rasterio, for GeoTIFFs and other GDAL rasters.
+    
+    Only the requested window is decoded, resampled straight to ``out_size``
+    when given. Rasters that are not 8-bit are linearly stretched to 0-255
+    using ``value_range``, which defaults to the 2nd-98th percentile of a
+    low-resolution overview of the whole scene, so all chips share one scale.
+    """
+    
+    def __init__(self, path: str, bands: Sequence[int] = (1, 2, 3),
+                 value_range: Optional[Tuple[float, float]] = None):
+        try:
+            import rasterio
+            from rasterio.enums import Resampling
+            from rasterio.windows import Window
+        except ImportError:
+            raise ImportError("RasterioSceneReader requires rasterio: pip install rasterio")
+        self._window_cls = Window
+        self._resampling = Resampling.bilinear
+        self.dataset = rasterio.open(path)
+        self.width, self.height = self.dataset.width, self.dataset.height
+        
+        self.bands = [band for band in bands if band <= self.dataset.count] or [1]
+        if len(self.bands) < 3:
+            self.bands = [self.bands[0]] * 3
+        
+        self.value_range = value_range
+        if self.value_range is None and self.dataset.dtypes[0] != "uint8":
+            self.value_range = self._overview_range()
+    
+    def _overview_range(self, max_side: int = 1024) -> Tuple[float, float]:
+        scale = max(self.width, self.height) / max_side
+        shape = (len(set(self.bands)), max(1, int(self.height / scale)), max(1, int(self.width / scale)))
+        overview = self.dataset.read(sorted(set(self.bands)), out_shape=shape, masked=True)
+        low, high = np.percentile(overview.compressed(), (2, 98))
+        return float(low), float(high) if high > low else float(low) + 1.0
+    
+    def read(self, x: int, y: int, width: int, height: int,
+             out_size: Optional[int] = None) -> Image.Image:
+        out_width, out_height = _fit_size(width, height, out_size) if out_size else (width, height)
+        out_shape = (3, out_height, out_width)
+        data = self.dataset.read(
+            self.bands,
+            window=self._window_cls(x, y, width, height),
+            out_shape=out_shape,
+            resampling=self._resampling,
+        )
+        if self.value_range is not None:
+            low, high = self.value_range
+            data = np.clip((data.astype(np.float32) - low) * (255.0 / (high - low)), 0, 255)
+        chip = Image.fromarray(np.ascontiguousarray(data.transpose(1, 2, 0).astype(np.uint8)), "RGB")
+        return _pad_square(chip, out_size) if out_size else chip
+    
+    def close(self):
+        self.dataset.close()
+
+
+def open_scene(source: Union[str, Image.Image, SceneReader], **kwargs) -> SceneReader:
+    """
+    Open a scene for windowed reading.
+    
+    GeoTIFFs go through rasterio when it is installed; everything else, and
+    in-memory PIL images, falls back to ``PILSceneReader``.
+    """
+    if isinstance(source, SceneReader):
+        return source
+    if isinstance(source, str) and source.lower().endswith((".tif", ".tiff", ".jp2", ".vrt")):
+        try:
+            return RasterioSceneReader(source, **kwargs)
+        except ImportError:
+            logger.warning("rasterio not installed; decoding the whole scene with PIL")
+    return PILSceneReader(source)
+
+
+def iter_chip_batches(
+    reader: SceneReader,
+    chips: List[Chip],
+    batch_size: int,
+    out_size: Optional[int] = None
+) -> Iterator[Tuple[List[Chip], List[Image.Image]]]:
+    """Read chips a batch at a time, so at most ``batch_size`` windows are decoded at once."""
+    for start in range(0, len(chips), batch_size):
+        batch = chips[start:start + batch_size]
+        yield batch, [reader.read(c.x, c.y, c.width, c.height, out_size) for c in batch]
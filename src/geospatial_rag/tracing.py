@@ -0,0 +1,258 @@
+"""
+Lightweight hierarchical timing spans for query tracing.
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """A named, timed section of work with optional attributes and child spans."""
+    
+    __slots__ = ("name", "attributes", "children", "start", "end")
+    
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                 start: Optional[float] = None):
+        self.name = name
+        self.attributes = attributes or {}
+        self.children = []
+        self.start = time.perf_counter() if start is None else start
+        self.end = None
+    
+    def set(self, key: str, value: Any):
+        """Attach an attribute (for example a row count) to the span."""
+        self.attributes[key] = value
+    
+    @property
+    def duration_ms(self) -> float:
+        end = time.perf_counter() if self.end is None else self.end
+        return (end - self.start) * 1000.0
+    
+    def to_dict(self, origin: float) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'start_ms': (self.start - origin) * 1000.0,
+            'duration_ms': self.duration_ms,
+            'attributes': dict(self.attributes),
+            'children': [child.to_dict(origin) for child in self.children],
+        }
+
+
+class _NullSpan:
+    """Span stand-in used when tracing is disabled; every operation is a no-op."""
+    
+    __slots__ = ()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+    
+    def set(self, key: str, value: Any):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _SpanContext:
+    __slots__ = ("trace", "span")
+    
+    def __init__(self, trace: "Trace", span: Span):
+        self.trace = trace
+        self.span = span
+    
+    def __enter__(self) -> Span:
+        return self.span
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.span.end = time.perf_counter()
+        if exc_type is not None:
+            self.span.set("error", exc_type.__name__)
+        self.trace._stack.pop()
+        return False
+
+
+class Trace:
+    """
+    Span tree for one operation, such as a single ``GeoSpatialRAG.query`` call.
+    
+    A trace belongs to the thread that runs the operation; concurrent queries
+    each get their own trace, so no locking is needed while spans are open.
+    """
+    
+    enabled = True
+    
+    def __init__(self, name: str, sinks: Optional[List[Any]] = None, **attributes):
+        self.root = Span(name, attributes)
+        self.sinks = sinks or []
+        self.started_ns = time.time_ns()
+        self._stack = [self.root]
+        self._finished = False
+    
+    def span(self, name: str, **attributes) -> _SpanContext:
+        """Open a child span of the innermost open span."""
+        span = Span(name, attributes)
+        self._stack[-1].children.append(span)
+        self._stack.append(span)
+        return _SpanContext(self, span)
+    
+    def record(self, name: str, seconds: float, **attributes):
+        """Add an already-measured span, e.g. time accumulated over a loop."""
+        end = time.perf_counter()
+        span = Span(name, attributes, start=end - seconds)
+        span.end = end
+        self._stack[-1].children.append(span)
+    
+    def to_ns(self, perf_time: float) -> int:
+        """Convert a ``perf_counter`` reading into epoch nanoseconds."""
+        return self.started_ns + int((perf_time - self.root.start) * 1e9)
+    
+    def walk(self) -> Iterator[Tuple[int, Span]]:
+        """Yield ``(depth, span)`` pairs in depth-first order."""
+        stack = [(0, self.root)]
+        while stack:
+            depth, span = stack.pop()
+            yield depth, span
+            stack.extend((depth + 1, child) for child in reversed(span.children))
+    
+    def finish(self):
+        """Close the root span and hand the trace to every sink."""
+        if self._finished:
+            return
+        self._finished = True
+        self.root.end = time.perf_counter()
+        for sink in self.sinks:
+            try:
+                sink.emit(self)
+            except Exception as e:
+                logger.warning(f"Trace sink {type(sink).__name__} failed: {str(e)}")
+    
+    def to_dict(self) -> Dict[str, Any]:
+        result = self.root.to_dict(self.root.start)
+        result['started_at'] = self.started_ns / 1e9
+        return result
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.finish()
+        return False
+
+
+class NullTrace:
+    """Disabled trace: spans cost one attribute lookup and a shared no-op object."""
+    
+    enabled = False
+    
+    def span(self, name: str, **attributes) -> _NullSpan:
+        return _NULL_SPAN
+    
+    def record(self, name: str, seconds: float, **attributes):
+        pass
+    
+    def finish(self):
+        pass
+    
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_TRACE = NullTrace()
+
+
+class Tracer:
+    """Creates traces and routes finished ones to the configured sinks."""
+    
+    def __init__(self, sinks: Optional[List[Any]] = None):
+        self.sinks = list(sinks or [])
+    
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+    
+    def start_trace(self, name: str, force: bool = False, **attributes):
+        """
+        Start a trace, or return ``NULL_TRACE`` when nobody would consume it.
+        
+        ``force`` records a trace even without sinks, so callers can return
+        it to the user.
+        """
+        if not force and not self.sinks:
+            return NULL_TRACE
+        return Trace(name, self.sinks, **attributes)
+
+
+class LoggingSink:
+    """Log each finished trace as an indented tree of stage timings."""
+    
+    def __init__(self, log: Optional[logging.Logger] = None, level: int = logging.INFO):
+        self.log = log or logger
+        self.level = level
+    
+    def emit(self, trace: Trace):
+        lines = []
+        for depth, span in trace.walk():
+            attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+            lines.append(f"{'  ' * depth}{span.name}: {span.duration_ms:.2f} ms {attributes}".rstrip())
+        self.log.log(self.level, "Trace\n" + "\n".join(lines))
+
+
+class JSONLinesSink:
+    """Append each finished trace to a file as one JSON object per line."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+    
+    def emit(self, trace: Trace):
+        line = json.dumps(trace.to_dict())
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+
+class OpenTelemetrySink:
+    """
+    Re-emit finished traces as OpenTelemetry spans.
+    
+    Requires the ``opentelemetry-api`` package; spans go to whatever tracer
+    provider the application has configured.
+    """
+    
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import trace as otel_trace
+        except ImportError:
+            raise ImportError(
+                "OpenTelemetrySink requires opentelemetry-api: pip install opentelemetry-api"
+            )
+        self._set_span_in_context = otel_trace.set_span_in_context
+        self.tracer = tracer or otel_trace.get_tracer("geospatial_rag")
+    
+    def _export(self, trace: Trace, span: Span, context):
+        otel_span = self.tracer.start_span(
+            span.name,
+            context=context,
+            start_time=trace.to_ns(span.start),
+            attributes={k: v for k, v in span.attributes.items() if v is not None},
+        )
+        child_context = self._set_span_in_context(otel_span)
+        for child in span.children:
+            self._export(trace, child, child_context)
+        otel_span.end(end_time=trace.to_ns(span.end if span.end is not None else span.start))
+    
+    def emit(self, trace: Trace):
+        self._export(trace, trace.root, None)
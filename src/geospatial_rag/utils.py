@@ -6,8 +6,8 @@ import os
 import json
 import logging
 import logging.config
-from typing import Dict, Any, Optional
-from PIL import Image
+from typing import BinaryIO, Dict, Any, Optional, Tuple, Union
+from PIL import Image, ImageFile
 
 
 def load_config(config_path: Optional[str] = None) -> Dict[str, Any]:
@@ -81,6 +81,69 @@ def setup_logging(log_level: str = "INFO", log_file: Optional[str] = None) -> No
     logging.config.dictConfig(logging_config)
 
 
+def _target_size(size: Tuple[int, int], min_side: Optional[int], max_size: Tuple[int, int]) -> Tuple[int, int]:
+    """Output size with the shorter side at ``min_side``, capped to fit in ``max_size``."""
+    width, height = size
+    scale = min(max_size[0] / width, max_size[1] / height, 1.0)
+    if min_side:
+        scale = min(scale, max(min_side / min(width, height), 0.0))
+    return max(1, round(width * scale)), max(1, round(height * scale))
+
+
+def _select_pyramid_level(image: Image.Image, target: Tuple[int, int]):
+    """Seek a multi-page TIFF to its smallest level that still covers ``target``."""
+    best_frame, best_area = None, None
+    base_width, base_height = image.size
+    for frame in range(getattr(image, "n_frames", 1)):
+        image.seek(frame)
+        width, height = image.size
+        same_aspect = abs(width / height - base_width / base_height) < 0.02
+        if same_aspect and width >= target[0] and height >= target[1]:
+            if best_area is None or width * height < best_area:
+                best_frame, best_area = frame, width * height
+    image.seek(best_frame or 0)
+
+
+def load_image(
+    source: Union[str, BinaryIO, Image.Image],
+    min_side: Optional[int] = None,
+    max_size: Tuple[int, int] = (1024, 1024)
+) -> Image.Image:
+    """
+    Decode an image straight to the resolution it is needed at.
+    
+    The output keeps the aspect ratio, has its shorter side at ``min_side``
+    (e.g. the model's input size) and fits in ``max_size``; smaller images
+    are never upscaled. For paths, file objects and not-yet-loaded PIL images
+    opened from a file, JPEGs are decoded at 1/2, 1/4 or 1/8 scale with
+    ``draft()`` and tiled TIFF pyramids are read from the smallest sufficient
+    level. The remaining downscale is one resize that starts with a cheap
+    integer ``reduce()``. A PIL image passed in is never modified: its file
+    is opened again for the reduced decode.
+    """
+    image = source if isinstance(source, Image.Image) else Image.open(source)
+    target = _target_size(image.size, min_side, max_size)
+    lazy = isinstance(image, ImageFile.ImageFile) and bool(image.tile)
+    
+    if lazy and target != image.size and image is source:
+        # draft() and seek() change the image in place; only do that to our own copy.
+        lazy = bool(getattr(image, "filename", None)) and image.tell() == 0
+        if lazy:
+            image = Image.open(image.filename)
+    
+    if lazy and target != image.size:
+        if image.format == "TIFF" and getattr(image, "n_frames", 1) > 1:
+            _select_pyramid_level(image, target)
+        elif image.format == "JPEG":
+            image.draft("RGB", target)
+    
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    if image.size != target:
+        image = image.resize(target, Image.Resampling.LANCZOS, reducing_gap=3.0)
+    return image
+
+
 def validate_image(image: Image.Image, max_size: tuple = (1024, 1024)) -> Image.Image:
     """Validate and preprocess an image."""
     if not isinstance(image, Image.Image):
@@ -90,6 +153,6 @@ def validate_image(image: Image.Image, max_size: tuple = (1024, 1024)) -> Image.
         image = image.convert('RGB')
     
     if image.size[0] > max_size[0] or image.size[1] > max_size[1]:
-        image.thumbnail(max_size, Image.Resampling.LANCZOS)
+        image.thumbnail(max_size, Image.Resampling.LANCZOS, reducing_gap=3.0)
     
     return image
@@ -285,7 +285,8 @@ def main():
                             # Process uploaded image
                             image_input = None
                             if uploaded_image is not None:
-                                image_input = Image.open(uploaded_image).convert("RGB")
+                                # Passed as the raw upload so the pipeline decodes it at reduced size.
+                                image_input = uploaded_image
                             
                             # Query the RAG system
                             results = st.session_state.rag_system.query(
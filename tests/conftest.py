@@ -0,0 +1,73 @@
+"""
+Shared fixtures: a small random CLIP snapshot and synthetic scenes, so the
+tests run offline and in seconds.
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from geospatial_rag import GeoSpatialRAG
+from geospatial_rag.embeddings import CLIPEmbedder
+
+from .tiny_clip import build_tiny_clip
+
+CAPTIONS = [
+    "many buildings and green trees are around a storage tank",
+    "a playground is next to a school",
+    "several boats are docked in the port",
+    "a river runs through the farmland with a bridge over it",
+    "this is a dense residential area with many houses and roads",
+]
+
+
+@pytest.fixture(scope="session")
+def tiny_clip(tmp_path_factory) -> str:
+    """Directory of a randomly initialized 64-d CLIP snapshot."""
+    return build_tiny_clip(str(tmp_path_factory.mktemp("tiny_clip")))
+
+
+@pytest.fixture(scope="session")
+def embedder(tiny_clip) -> CLIPEmbedder:
+    return CLIPEmbedder(model_name=tiny_clip, device="cpu", local_files_only=True)
+
+
+@pytest.fixture(scope="session")
+def image_dir(tmp_path_factory) -> str:
+    """Eight random 64 x 64 JPEG scenes."""
+    path = tmp_path_factory.mktemp("images")
+    rng = np.random.default_rng(0)
+    for i in range(8):
+        Image.fromarray(rng.integers(0, 255, (64, 64, 3), dtype=np.uint8)).save(path / f"scene_{i}.jpg")
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def records(image_dir):
+    """Three captions per scene, in two classes, with paths relative to ``image_dir``."""
+    return [
+        {'text': f"{CAPTIONS[c]} ({name})", 'image_path': name, 'doc_class': "port" if i % 2 else "farmland"}
+        for i, name in enumerate(sorted(os.listdir(image_dir)))
+        for c in range(3)
+    ]
+
+
+@pytest.fixture(scope="session")
+def absolute_records(records, image_dir):
+    """``records`` with absolute image paths, as ``GeoSpatialRAG.add_documents`` takes them."""
+    return [dict(r, image_path=os.path.join(image_dir, r['image_path'])) for r in records]
+
+
+@pytest.fixture
+def rag(tmp_path, embedder, absolute_records):
+    """A pipeline over a fresh database holding ``records``, without a VLM."""
+    pipeline = GeoSpatialRAG(str(tmp_path / "rag.db"), embedder=embedder, vlm_model_name=None)
+    pipeline.add_documents(absolute_records)
+    yield pipeline
+    pipeline.close()
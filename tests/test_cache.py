@@ -0,0 +1,56 @@
+"""
+Query cache hits, copies and invalidation.
+"""
+
+from PIL import Image
+
+
+def ids(result):
+    return [d.metadata['id'] for d in result['documents']]
+
+
+def test_query_cache_hits_and_copies(rag):
+    first = rag.query("boats docked in the port", generate_response=False)
+    first['documents'][0].metadata['id'] = "changed by caller"
+    second = rag.query("Boats  docked in the PORT", generate_response=False)
+    
+    assert rag.get_cache_stats()['hits'] == 1
+    assert ids(second)[0] != "changed by caller"
+    assert second['documents'] is not first['documents']
+
+
+def test_query_cache_invalidated_by_writes(rag):
+    before = rag.query("boats docked in the port", generate_response=False)
+    rag.add_documents([{'text': "boats docked in the port", 'doc_class': "port"}])
+    after = rag.query("boats docked in the port", generate_response=False)
+    
+    assert rag.get_cache_stats()['hits'] == 0
+    assert rag.get_cache_stats()['invalidations'] == 1
+    assert ids(after) != ids(before)
+    
+    rag.db.delete_documents([ids(after)[0]])
+    assert ids(rag.query("boats docked in the port", generate_response=False)) == ids(before)
+
+
+def test_query_cache_invalidated_by_derived_writes(rag):
+    rag.query("a school playground", generate_response=False)
+    rag.build_signatures("binary")
+    rag.query("a school playground", generate_response=False)
+    rag.db.add_captions("captioner", {"scene_0.jpg": "a caption"})
+    rag.query("a school playground", generate_response=False)
+    
+    assert rag.get_cache_stats()['hits'] == 0
+    assert rag.get_cache_stats()['invalidations'] == 2
+
+
+def test_query_cache_image_keys(rag, absolute_records):
+    path = absolute_records[0]['image_path']
+    rag.query("a scene", image=path, generate_response=False)
+    rag.query("a scene", image=Image.open(path), generate_response=False)
+    assert rag.get_cache_stats()['hits'] == 1
+    
+    # Images with no file behind them are not fingerprinted, so never cached.
+    in_memory = Image.new("RGB", (64, 64))
+    rag.query("a scene", image=in_memory, generate_response=False)
+    rag.query("a scene", image=in_memory, generate_response=False)
+    assert rag.get_cache_stats()['hits'] == 1
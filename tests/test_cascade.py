@@ -0,0 +1,43 @@
+"""
+Cascade retrieval against exact search.
+"""
+
+import pytest
+
+from geospatial_rag.cascade import SignatureIndex
+from geospatial_rag.retriever import SQLiteRetriever
+
+QUERIES = ["a storage tank among trees", "boats docked in the port", "a school playground"]
+
+
+def ranking(rag, text, cascade=None, top_k=5, candidate_multiple=10, filter_class=None):
+    retriever = SQLiteRetriever(
+        rag.db_path, query_embedding=rag.embedder.encode_text(text), pool=rag.db.pool,
+        model_name=rag.embedder.model_name, cascade=cascade, candidate_multiple=candidate_multiple
+    )
+    documents = retriever.get_relevant_documents(top_k=top_k, filter_class=filter_class)
+    return [(d.metadata['id'], round(d.metadata['similarity'], 5)) for d in documents]
+
+
+@pytest.mark.parametrize("kind", ["binary", "pca"])
+def test_cascade_matches_exact(rag, records, kind):
+    index = SignatureIndex(rag.db, rag.embedder.model_name, kind=kind, dim=16)
+    # Unbuilt (and for PCA unfitted) indexes fall back to exact scoring.
+    for text in QUERIES:
+        assert ranking(rag, text, index) == ranking(rag, text)
+    
+    assert index.build() == len(records)
+    # A candidate pool as large as the corpus makes the exact rerank see every row.
+    for text in QUERIES:
+        assert ranking(rag, text, index, candidate_multiple=len(records)) == ranking(rag, text)
+        assert ranking(rag, text, index, candidate_multiple=len(records), filter_class="port") == \
+            ranking(rag, text, filter_class="port")
+
+
+def test_cascade_scores_unsigned_rows(rag):
+    index = SignatureIndex(rag.db, rag.embedder.model_name, kind="binary")
+    index.build()
+    rag.add_documents([{'text': "a lone lighthouse on a rocky cape", 'doc_class': "coast"}])
+    
+    exact = ranking(rag, "a lone lighthouse on a rocky cape", top_k=1)
+    assert ranking(rag, "a lone lighthouse on a rocky cape", index, top_k=1, candidate_multiple=1) == exact
@@ -0,0 +1,57 @@
+"""
+Zero-shot classification with stored class prompt vectors.
+"""
+
+import numpy as np
+
+from geospatial_rag.classify import DEFAULT_TEMPLATES, ZeroShotClassifier, prompt_set_key
+
+CLASSES = ["a harbor", "farmland", "a dense residential area", "a forest"]
+
+
+def expected_labels(embedder, images, templates=DEFAULT_TEMPLATES):
+    """Labels computed directly: each image against the mean normalized vector of every class's prompts."""
+    classes = []
+    for name in CLASSES:
+        prompts = embedder.encode_text([template.format(name) for template in templates])
+        mean = prompts.mean(axis=0)
+        classes.append(mean / np.linalg.norm(mean))
+    scores = embedder.encode_image(images) @ np.stack(classes).T
+    return [CLASSES[i] for i in scores.argmax(axis=1)], scores.max(axis=1)
+
+
+def test_classify_images_labels(rag, absolute_records):
+    images = sorted({r['image_path'] for r in absolute_records})
+    labels, scores = expected_labels(rag.embedder, images)
+    
+    results = rag.classify_images(images, class_names=CLASSES, top_k=2)
+    assert [r['label'] for r in results] == labels
+    np.testing.assert_allclose([r['score'] for r in results], scores, atol=1e-5)
+    for result in results:
+        assert result['top_k'][0]['label'] == result['label']
+        assert len(result['top_k']) == 2
+        assert result['top_k'][0]['probability'] >= result['top_k'][1]['probability']
+
+
+def test_class_prompts_are_stored_and_reused(rag, absolute_records, monkeypatch):
+    image = absolute_records[0]['image_path']
+    first = rag.classify_images([image], class_names=CLASSES)
+    stored = rag.db.get_class_embeddings(rag.embedder.model_name, prompt_set_key(DEFAULT_TEMPLATES), CLASSES)
+    assert sorted(stored) == sorted(CLASSES)
+    
+    encoded = []
+    encode = rag.embedder.encode_class_prompts
+    monkeypatch.setattr(rag.embedder, "encode_class_prompts",
+                        lambda names, templates, **kwargs: encoded.append(list(names)) or encode(names, templates))
+    # A new classifier, as in another process, loads the stored vectors instead of encoding.
+    classifier = ZeroShotClassifier(rag.embedder, CLASSES, db=rag.db)
+    assert classifier.classify([image])[0]['label'] == first[0]['label']
+    np.testing.assert_allclose(classifier.class_matrix, np.stack([stored[name] for name in CLASSES]))
+    assert encoded == []
+    
+    # Only classes without a stored vector are encoded.
+    ZeroShotClassifier(rag.embedder, CLASSES + ["a desert"], db=rag.db).classify([image])
+    assert encoded == [["a desert"]]
+    # Other templates are a different prompt set.
+    ZeroShotClassifier(rag.embedder, CLASSES, templates=["{}"], db=rag.db).classify([image])
+    assert encoded[-1] == CLASSES
@@ -0,0 +1,72 @@
+"""
+Trigger-maintained statistics.
+"""
+
+import numpy as np
+
+from geospatial_rag.database import SQLiteVectorDB
+
+
+def counted(db: SQLiteVectorDB):
+    """The counters ``get_stats`` should report, computed by scanning the tables."""
+    with db.pool.read() as cursor:
+        count = lambda sql: cursor.execute(sql).fetchone()[0]
+        by_class = dict(cursor.execute("SELECT class, COUNT(*) FROM descriptions GROUP BY class").fetchall())
+        return {
+            'total_documents': count("SELECT COUNT(*) FROM descriptions"),
+            'total_text_embeddings': count("SELECT COUNT(*) FROM text_embeddings"),
+            'total_image_embeddings': count("SELECT COUNT(*) FROM image_embeddings"),
+            'total_image_vectors': count("SELECT COUNT(*) FROM image_vectors"),
+            'documents_by_class': by_class,
+        }
+
+
+def reported(db: SQLiteVectorDB):
+    stats = db.get_stats()
+    return {key: stats[key] for key in counted(db)}
+
+
+def test_stats_after_insert(rag, records):
+    assert reported(rag.db) == counted(rag.db)
+    stats = rag.get_stats()
+    assert stats['total_documents'] == len(records)
+    assert stats['total_image_vectors'] == len({r['image_path'] for r in records})
+    assert stats['total_image_embeddings'] == 0
+
+
+def test_stats_after_delete(rag, records):
+    version = rag.db.write_version()
+    with rag.db.pool.read() as cursor:
+        doomed = [row[0] for row in cursor.execute("SELECT id FROM descriptions WHERE class = 'port'")]
+    assert rag.db.delete_documents(doomed) == len(doomed)
+    
+    assert reported(rag.db) == counted(rag.db)
+    assert rag.get_stats()['total_documents'] == len(records) - len(doomed)
+    assert 'port' not in rag.get_stats()['documents_by_class']
+    assert rag.db.write_version() > version
+
+
+def test_stats_after_grouping(rag):
+    # Per-caption image rows as older ingestions wrote them.
+    with rag.db.pool.write() as cursor:
+        cursor.execute("SELECT d.id, iv.embedding FROM descriptions d JOIN image_vectors iv ON iv.path = d.path")
+        rows = cursor.fetchall()
+        cursor.execute("DELETE FROM image_vectors")
+        for doc_id, embedding in rows:
+            rag.db._write_embedding(cursor, "image_embeddings", doc_id, np.frombuffer(embedding, np.float32),
+                                    rag.embedder.model_name)
+    assert reported(rag.db) == counted(rag.db)
+    assert rag.get_stats()['total_image_embeddings'] == len(rows)
+    
+    report = rag.db.group_image_embeddings(drop_duplicates=True)
+    assert report['dropped'] == len(rows)
+    assert reported(rag.db) == counted(rag.db)
+    assert rag.get_stats()['total_image_embeddings'] == 0
+    assert rag.get_stats()['total_image_vectors'] == report['image_vectors']
+
+
+def test_rebuild_stats_keeps_versions(rag):
+    versions = rag.db.cache_version()
+    rag.db.rebuild_stats()
+    assert rag.db.cache_version() == versions
+    assert reported(rag.db) == counted(rag.db)
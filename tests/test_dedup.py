@@ -0,0 +1,66 @@
+"""
+Near-duplicate folding and compaction.
+"""
+
+import shutil
+
+from geospatial_rag.dedup import find_duplicates
+
+from .test_database import counted, reported
+
+# Distinct random scenes stay below this; a byte-identical copy scores 1.
+THRESHOLD = 0.9999
+
+
+def ids_of(db, path):
+    with db.pool.read() as cursor:
+        return sorted(row[0] for row in cursor.execute("SELECT id FROM descriptions WHERE path = ?", (path,)))
+
+
+def add_copy(rag, tmp_path, source):
+    """Store a byte-identical copy of ``source`` with one caption and an older alias folded into it."""
+    copy = str(tmp_path / "copy.jpg")
+    shutil.copy(source, copy)
+    rag.add_documents([{'text': "an exact copy of a scene", 'image_path': copy, 'doc_class': "port"}])
+    rag.db.add_aliases([{
+        'alias_id': "older", 'alias_path': "older.jpg", 'canonical_path': copy,
+        'model_name': rag.embedder.model_name, 'similarity': 0.99,
+    }])
+    return copy
+
+
+def test_find_duplicates(rag, tmp_path, absolute_records):
+    canonical = absolute_records[0]['image_path']
+    copy = add_copy(rag, tmp_path, canonical)
+    
+    groups = find_duplicates(rag.db, rag.embedder.model_name, threshold=THRESHOLD)
+    assert len(groups) == 1
+    # The image with more captions is kept.
+    assert groups[0]['canonical'] == canonical
+    assert [path for path, _ in groups[0]['duplicates']] == [copy]
+    assert groups[0]['duplicates'][0][1] > THRESHOLD
+
+
+def test_compact_folds_cluster(rag, tmp_path, absolute_records):
+    canonical = absolute_records[0]['image_path']
+    copy = add_copy(rag, tmp_path, canonical)
+    folded = ids_of(rag.db, copy)
+    before = rag.get_stats()
+    
+    assert rag.compact(threshold=THRESHOLD, dry_run=True)['documents_removed'] == 1
+    assert rag.get_stats()['total_documents'] == before['total_documents']
+    
+    report = rag.compact(threshold=THRESHOLD, vacuum=False)
+    assert (report['clusters'], report['duplicate_images'], report['documents_removed']) == (1, 1, 1)
+    assert ids_of(rag.db, copy) == []
+    
+    survivor = ids_of(rag.db, canonical)[0]
+    assert rag.db.resolve_alias(folded[0]) == survivor
+    # An alias recorded against the folded image follows it to the survivor.
+    assert rag.db.resolve_alias("older") == survivor
+    
+    assert reported(rag.db) == counted(rag.db)
+    stats = rag.get_stats()
+    assert stats['total_documents'] == before['total_documents'] - 1 == len(absolute_records)
+    assert stats['total_image_vectors'] == before['total_image_vectors'] - 1
+    assert rag.compact(threshold=THRESHOLD, vacuum=False)['clusters'] == 0
@@ -0,0 +1,34 @@
+"""
+Text padding and length bucketing against full-length padding.
+"""
+
+import numpy as np
+
+TEXTS = [
+    "a very long caption about many buildings and green trees around a storage tank near a river bend",
+    "port",
+    "a playground is next to a school",
+    "boats",
+    "this is a dense residential area with many houses and roads",
+    "a bridge",
+]
+
+
+def max_length_features(embedder, texts):
+    tokens = embedder.tokenizer(
+        texts, padding="max_length", max_length=embedder.max_text_length, truncation=True, return_tensors="pt"
+    )
+    return embedder._text_features(tokens, normalize=True)
+
+
+def test_longest_padding_matches_max_length(embedder):
+    expected = max_length_features(embedder, TEXTS)
+    np.testing.assert_allclose(embedder.encode_text(TEXTS), expected, atol=1e-5)
+
+
+def test_bucketing_restores_order(embedder):
+    expected = max_length_features(embedder, TEXTS)
+    # Lengths alternate, so every bucket of two reorders the input.
+    batched = embedder.encode_text_batched(TEXTS, batch_size=2)
+    np.testing.assert_allclose(batched, expected, atol=1e-5)
+    assert not np.allclose(batched[0], batched[1], atol=1e-3)
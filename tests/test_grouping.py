@@ -0,0 +1,55 @@
+"""
+One stored vector per image, and results grouped by image.
+"""
+
+import numpy as np
+import pytest
+
+from geospatial_rag.retriever import SQLiteRetriever
+
+TEXT = "several boats are docked in the port"
+
+
+def test_captions_share_one_image_vector(rag, absolute_records):
+    paths = sorted({r['image_path'] for r in absolute_records})
+    stats = rag.get_stats()
+    assert stats['total_image_vectors'] == len(paths)
+    assert stats['total_image_embeddings'] == 0
+    
+    expected = dict(zip(paths, rag.embedder.encode_image(paths)))
+    with rag.db.pool.read() as cursor:
+        ids = [(row[0], row[1]) for row in cursor.execute("SELECT id, path FROM descriptions")]
+    for doc_id, path in ids:
+        stored = rag.db.get_embeddings(doc_id, rag.embedder.model_name)
+        np.testing.assert_allclose(stored['image_embedding'], expected[path], atol=1e-5)
+
+
+@pytest.mark.parametrize("pooling", ["max", "mean"])
+def test_group_by_image(rag, absolute_records, pooling):
+    rag.config['group_pooling'] = pooling
+    image = absolute_records[0]['image_path']
+    paths = sorted({r['image_path'] for r in absolute_records})
+    result = rag.query(TEXT, image=image, top_k=len(paths), generate_response=False, group_by_image=True)
+    documents = result['documents']
+    
+    assert sorted(documents.columns['path']) == paths
+    for document in documents:
+        captions = [r['text'] for r in absolute_records if r['image_path'] == document.metadata['path']]
+        assert sorted(document.metadata['captions']) == sorted(captions)
+        assert len(document.metadata['ids']) == len(captions)
+        assert document.page_content in captions
+    
+    # Pool the per-caption text scores by hand and add the image score once per image.
+    retriever = SQLiteRetriever(rag.db_path, query_embedding=rag.embedder.encode_text(TEXT), pool=rag.db.pool,
+                                model_name=rag.embedder.model_name)
+    text_scores = {d.metadata['id']: d.metadata['similarity']
+                   for d in retriever.get_relevant_documents(top_k=len(absolute_records))}
+    query_image = rag.embedder.encode_image(image)
+    image_vectors = dict(zip(paths, rag.embedder.encode_image(paths)))
+    pool = np.max if pooling == "max" else np.mean
+    for document in documents:
+        text_score = pool([text_scores[doc_id] for doc_id in document.metadata['ids']])
+        image_score = query_image @ image_vectors[document.metadata['path']]
+        expected = rag.text_weight * text_score + rag.image_weight * image_score
+        assert document.metadata['similarity'] == pytest.approx(expected, abs=1e-5)
+    assert list(documents.scores) == sorted(documents.scores, reverse=True)
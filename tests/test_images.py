@@ -0,0 +1,44 @@
+"""
+Reduced-size image decoding.
+"""
+
+import io
+
+import numpy as np
+from PIL import Image, JpegImagePlugin
+
+from geospatial_rag.utils import load_image
+
+
+def jpeg_bytes(size=(2048, 1536)) -> io.BytesIO:
+    buffer = io.BytesIO()
+    rng = np.random.default_rng(0)
+    Image.fromarray(rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)).save(buffer, "JPEG")
+    buffer.seek(0)
+    return buffer
+
+
+def test_uploaded_jpeg_is_decoded_reduced(monkeypatch):
+    decoded = []
+    draft = JpegImagePlugin.JpegImageFile.draft
+    
+    def recording_draft(image, mode, size):
+        result = draft(image, mode, size)
+        decoded.append(image.size)
+        return result
+    
+    monkeypatch.setattr(JpegImagePlugin.JpegImageFile, "draft", recording_draft)
+    image = load_image(jpeg_bytes(), min_side=224)
+    
+    assert image.size == (299, 224)
+    # draft() picked the 1/4 scale, the smallest DCT scale still above the target.
+    assert decoded == [(512, 384)]
+
+
+def test_uploaded_jpeg_query_is_cached(rag):
+    upload = jpeg_bytes((256, 256))
+    first = rag.query("a scene", image=upload, generate_response=False)
+    second = rag.query("a scene", image=upload, generate_response=False)
+    
+    assert rag.get_cache_stats()['hits'] == 1
+    assert [d.metadata['id'] for d in second['documents']] == [d.metadata['id'] for d in first['documents']]
@@ -0,0 +1,80 @@
+"""
+Multi-process ingestion against the single-process path.
+"""
+
+import os
+
+import numpy as np
+
+from geospatial_rag.database import SQLiteVectorDB
+from geospatial_rag.ingest import ParallelIngestor, make_shards
+
+
+def stored_vectors(db: SQLiteVectorDB):
+    with db.pool.read() as cursor:
+        text = {
+            row[0]: np.frombuffer(row[1], dtype=np.float32)
+            for row in cursor.execute("SELECT id, embedding FROM text_embeddings")
+        }
+        image = {
+            row[0]: np.frombuffer(row[1], dtype=np.float32)
+            for row in cursor.execute("SELECT path, embedding FROM image_vectors")
+        }
+    return text, image
+
+
+def test_make_shards_keeps_images_together(records):
+    shards = make_shards(records, shard_size=2)
+    assert sorted(r['text'] for shard in shards for r in shard) == sorted(r['text'] for r in records)
+    owners = {}
+    for i, shard in enumerate(shards):
+        for record in shard:
+            assert owners.setdefault(record['image_path'], i) == i
+
+
+def test_worker_pool_matches_single_process(tmp_path, rag, embedder, absolute_records):
+    progress = []
+    with SQLiteVectorDB(str(tmp_path / "parallel.db")) as db:
+        ingestor = ParallelIngestor(
+            db, embedder=embedder, num_workers=2, shard_size=4, batch_size=3, progress_callback=progress.append
+        )
+        report = ingestor.run(absolute_records)
+        assert ingestor.run(absolute_records)['skipped'] == len(absolute_records)
+        text, image = stored_vectors(db)
+    
+    assert report['stored'] == len(absolute_records)
+    assert report['failed'] == 0
+    # The parent process writes every shard, in the order they complete.
+    assert [p['shards_done'] for p in progress] == list(range(1, report['shards'] + 1))
+    assert [p['stored'] for p in progress] == sorted(p['stored'] for p in progress)
+    
+    expected_text, expected_image = stored_vectors(rag.db)
+    assert text.keys() == expected_text.keys()
+    for doc_id in text:
+        np.testing.assert_allclose(text[doc_id], expected_text[doc_id], atol=1e-5)
+    assert image.keys() == expected_image.keys()
+    for path in image:
+        np.testing.assert_allclose(image[path], expected_image[path], atol=1e-5)
+
+
+def test_unreadable_images_are_skipped(tmp_path, embedder, records, image_dir):
+    (tmp_path / "corrupt.jpg").write_bytes(b"not a jpeg")
+    # A readable header over truncated pixels only fails while decoding, failing its whole batch.
+    with open(os.path.join(image_dir, records[3]['image_path']), "rb") as f:
+        (tmp_path / "truncated.jpg").write_bytes(f.read()[:1000])
+    broken = [
+        {'text': "a corrupt scene", 'image_path': str(tmp_path / "corrupt.jpg")},
+        {'text': "a truncated scene", 'image_path': str(tmp_path / "truncated.jpg")},
+        {'text': "a missing scene", 'image_path': str(tmp_path / "missing.jpg")},
+    ]
+    with SQLiteVectorDB(str(tmp_path / "parallel.db")) as db:
+        ingestor = ParallelIngestor(db, embedder=embedder, num_workers=1, image_root=image_dir)
+        report = ingestor.run(records[:3] + broken)
+        _, image = stored_vectors(db)
+        assert db.get_stats()['total_documents'] == 3
+    
+    assert report['stored'] == 3
+    assert report['failed'] == 3
+    assert set(report['failed_images']) == {r['image_path'] for r in broken}
+    assert report['failed_images'][str(tmp_path / "truncated.jpg")] == "image could not be encoded"
+    assert all(np.linalg.norm(vector) > 0 for vector in image.values())
@@ -0,0 +1,73 @@
+"""
+The precomputed k-NN graph against a brute-force scan.
+"""
+
+import numpy as np
+
+from geospatial_rag.knn import NeighborGraph
+
+K = 4
+
+
+def brute_force_neighbors(rag, k):
+    """Every document's ``k`` best neighbours, scored like a query made of its stored vectors."""
+    with rag.db.pool.read() as cursor:
+        rows = cursor.execute(
+            """SELECT d.id, te.embedding, iv.embedding FROM descriptions d
+               JOIN text_embeddings te ON te.id = d.id
+               JOIN image_vectors iv ON iv.path = d.path AND iv.model_name = te.model_name
+               ORDER BY d.id"""
+        ).fetchall()
+    ids = [row[0] for row in rows]
+    unit = lambda m: m / np.linalg.norm(m, axis=1, keepdims=True)
+    text = unit(np.stack([np.frombuffer(row[1], dtype=np.float32) for row in rows]))
+    image = unit(np.stack([np.frombuffer(row[2], dtype=np.float32) for row in rows]))
+    scores = rag.text_weight * (text @ text.T) + rag.image_weight * (image @ image.T)
+    np.fill_diagonal(scores, -np.inf)
+    neighbors = {}
+    for i, doc_id in enumerate(ids):
+        order = np.argsort(-scores[i], kind="stable")[:k]
+        neighbors[doc_id] = ([ids[j] for j in order], scores[i, order])
+    return neighbors
+
+
+def graph_for(rag):
+    return NeighborGraph(rag.db, rag.embedder.model_name, (rag.text_weight, rag.image_weight))
+
+
+def test_graph_matches_brute_force(rag, absolute_records):
+    assert rag.build_knn_graph(k=K) == len(absolute_records)
+    graph = graph_for(rag)
+    for doc_id, (expected_ids, expected_scores) in brute_force_neighbors(rag, K).items():
+        neighbors = graph.neighbors(doc_id, K)
+        assert list(neighbors.ids) == expected_ids
+        np.testing.assert_allclose(neighbors.scores, expected_scores, atol=1e-5)
+        
+        result = rag.query_similar(doc_id, top_k=K)
+        assert [d.metadata['id'] for d in result['documents']] == expected_ids
+
+
+def test_graph_goes_stale_on_write(rag, absolute_records):
+    rag.build_knn_graph(k=K)
+    graph = graph_for(rag)
+    assert graph.is_fresh(K)
+    assert not graph.is_fresh(K + 1)
+    before = set(brute_force_neighbors(rag, K))
+    
+    # The same caption and image under another class is a new document identical to the first.
+    rag.add_documents([dict(absolute_records[0], doc_class="coast")])
+    assert not graph.is_fresh(K)
+    (added,) = set(brute_force_neighbors(rag, K)) - before
+    
+    expected = brute_force_neighbors(rag, K)
+    twin = next(doc_id for doc_id, (ids, _) in expected.items() if doc_id != added and ids[0] == added)
+    assert added not in graph.neighbors(twin, K).ids
+    # The stale graph is bypassed, so the scan finds the new document. It ties
+    # with the original, so compare membership and scores rather than order.
+    scanned = rag.query_similar(twin, top_k=K)['documents']
+    assert set(scanned.ids) == set(expected[twin][0])
+    np.testing.assert_allclose(scanned.scores, expected[twin][1], atol=1e-5)
+    
+    rag.build_knn_graph(k=K)
+    assert graph.is_fresh(K)
+    assert set(graph.neighbors(twin, K).ids) == set(expected[twin][0])
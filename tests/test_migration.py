@@ -0,0 +1,86 @@
+"""
+Opening databases written by the original single-model schema.
+"""
+
+import sqlite3
+
+import numpy as np
+import pytest
+
+from geospatial_rag import database
+from geospatial_rag.database import SQLiteVectorDB
+
+BASELINE_SCHEMA = [
+    """CREATE TABLE descriptions (
+        id TEXT PRIMARY KEY, class TEXT, description TEXT, path TEXT, metadata TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )""",
+] + [
+    f"""CREATE TABLE {table} (
+        id TEXT PRIMARY KEY, embedding BLOB, embedding_dim INTEGER, model_name TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (id) REFERENCES descriptions(id)
+    )"""
+    for table in ("text_embeddings", "image_embeddings")
+]
+
+
+@pytest.fixture
+def baseline_db(tmp_path):
+    """A database as the original schema wrote it, with two documents."""
+    path = str(tmp_path / "baseline.db")
+    connection = sqlite3.connect(path)
+    for statement in BASELINE_SCHEMA:
+        connection.execute(statement)
+    vector = np.ones(4, dtype=np.float32).tobytes()
+    for doc_id, doc_class in (("a", "port"), ("b", "farmland")):
+        connection.execute("INSERT INTO descriptions (id, class, description, path) VALUES (?, ?, 'x', '')",
+                           (doc_id, doc_class))
+        connection.execute("INSERT INTO text_embeddings (id, embedding, embedding_dim, model_name) "
+                           "VALUES (?, ?, 4, 'clip')", (doc_id, vector))
+    connection.execute("INSERT INTO image_embeddings (id, embedding, embedding_dim, model_name) "
+                       "VALUES ('a', ?, 4, NULL)", (vector,))
+    connection.commit()
+    connection.close()
+    return path
+
+
+def primary_key(db: SQLiteVectorDB, table: str):
+    with db.pool.read() as cursor:
+        cursor.execute(f"PRAGMA table_info({table})")
+        return [row[1] for row in sorted(cursor.fetchall(), key=lambda r: r[5]) if row[5]]
+
+
+def test_baseline_database_is_migrated(baseline_db):
+    with SQLiteVectorDB(baseline_db) as db:
+        assert primary_key(db, "text_embeddings") == ["id", "model_name"]
+        assert primary_key(db, "image_embeddings") == ["id", "model_name"]
+        with db.pool.read() as cursor:
+            rows = lambda sql: [tuple(row) for row in cursor.execute(sql)]
+            assert rows("SELECT id, model_name FROM text_embeddings ORDER BY id") == [("a", "clip"), ("b", "clip")]
+            assert rows("SELECT id, model_name FROM image_embeddings") == [("a", "")]
+            assert cursor.execute("SELECT COUNT(*) FROM sqlite_master WHERE name LIKE '%_old'").fetchone()[0] == 0
+        stats = db.get_stats()
+        assert stats['total_documents'] == 2
+        assert stats['total_text_embeddings'] == 2
+        assert stats['documents_by_class'] == {'farmland': 1, 'port': 1}
+    
+    # Reopening a migrated database leaves it as it is.
+    with SQLiteVectorDB(baseline_db) as db:
+        assert db.get_stats()['total_text_embeddings'] == 2
+
+
+def test_failed_migration_leaves_original_table(baseline_db, monkeypatch):
+    # A new layout the old rows cannot be copied into fails after the rename.
+    monkeypatch.setattr(
+        database, "EMBEDDING_TABLE_DDL",
+        "CREATE TABLE {if_not_exists} {table} (id TEXT, model_name TEXT, PRIMARY KEY (id, model_name))"
+    )
+    with pytest.raises(sqlite3.OperationalError):
+        SQLiteVectorDB(baseline_db)
+    
+    connection = sqlite3.connect(baseline_db)
+    tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    assert tables == {"descriptions", "text_embeddings", "image_embeddings"}
+    assert connection.execute("SELECT COUNT(*) FROM text_embeddings").fetchone()[0] == 2
+    connection.close()
@@ -0,0 +1,37 @@
+"""
+Paged queries.
+"""
+
+
+def ids(documents):
+    return [d.metadata['id'] for d in documents]
+
+
+def test_pages_concatenate_to_top_k(rag, records, monkeypatch):
+    top_k = len(records) - 3
+    full = rag.query("boats docked in the port", top_k=top_k, generate_response=False)
+    
+    encoded = []
+    encode_text = rag.embedder.encode_text
+    monkeypatch.setattr(rag.embedder, "encode_text", lambda *a, **k: encoded.append(a) or encode_text(*a, **k))
+    pages = list(rag.query_pages("boats docked in the port", top_k=top_k, page_size=5))
+    
+    assert [page['cursor'] for page in pages] == list(range(0, top_k, 5))
+    assert [page['next_cursor'] for page in pages] == list(range(5, top_k, 5)) + [None]
+    assert sum((ids(page['documents']) for page in pages), []) == ids(full['documents'])
+    
+    # Resuming at a cursor reads the cached ranking instead of encoding and scanning again.
+    resumed = list(rag.query_pages(
+        "boats docked in the port", top_k=top_k, page_size=5, cursor=pages[1]['next_cursor']
+    ))
+    assert [ids(page['documents']) for page in resumed] == [ids(page['documents']) for page in pages[2:]]
+    assert encoded == []
+
+
+def test_pages_without_cache(rag, records):
+    rag.query_cache = None
+    pages = list(rag.query_pages("a school playground", top_k=7, page_size=3, cursor=2))
+    full = rag.query("a school playground", top_k=7, generate_response=False)
+    
+    assert [page['cursor'] for page in pages] == [2, 5]
+    assert sum((ids(page['documents']) for page in pages), []) == ids(full['documents'])[2:]
@@ -0,0 +1,85 @@
+"""
+Concurrent readers alongside the single writer under WAL.
+"""
+
+import threading
+
+import numpy as np
+
+from geospatial_rag.database import SQLiteVectorDB
+
+READERS = 4
+WRITES = 40
+
+
+def document(i: int):
+    vector = np.random.default_rng(i).standard_normal(8).astype(np.float32)
+    return {
+        'doc_id': f"doc_{i:03d}", 'text': f"caption {i}", 'text_embedding': vector, 'image_embedding': None,
+        'metadata': None, 'doc_class': "port" if i % 2 else "farmland", 'image_path': "", 'model_name': "clip",
+    }
+
+
+def test_readers_run_while_writer_writes(tmp_path):
+    db = SQLiteVectorDB(str(tmp_path / "pool.db"))
+    errors, seen = [], [[] for _ in range(READERS)]
+    done = threading.Event()
+    
+    def read(slot):
+        try:
+            while not done.is_set():
+                with db.pool.read() as cursor:
+                    count, vectors = cursor.execute(
+                        "SELECT (SELECT COUNT(*) FROM descriptions), (SELECT COUNT(*) FROM text_embeddings)"
+                    ).fetchone()
+                # A document and its vector are committed together, so one snapshot never has one alone.
+                assert count == vectors
+                seen[slot].append(count)
+        except Exception as e:
+            errors.append(e)
+    
+    readers = [threading.Thread(target=read, args=(slot,)) for slot in range(READERS)]
+    for reader in readers:
+        reader.start()
+    for i in range(WRITES):
+        db.add_documents([document(i)])
+    done.set()
+    for reader in readers:
+        reader.join()
+    
+    assert errors == []
+    for counts in seen:
+        assert counts and counts == sorted(counts)
+    assert db.get_stats()['total_documents'] == WRITES
+    with db.pool.read() as cursor:
+        assert cursor.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # One connection per reader thread; those of finished threads are closed.
+    assert db.pool.stats()['readers_opened_total'] == READERS + 1
+    assert db.pool.stats()['open_readers'] == 1
+    db.close()
+
+
+def test_reader_is_not_blocked_by_open_write(tmp_path):
+    db = SQLiteVectorDB(str(tmp_path / "pool.db"))
+    db.add_documents([document(0)])
+    writing, read_done = threading.Event(), threading.Event()
+    counts = []
+    
+    def read():
+        writing.wait(timeout=10)
+        with db.pool.read() as cursor:
+            counts.append(cursor.execute("SELECT COUNT(*) FROM descriptions").fetchone()[0])
+        read_done.set()
+    
+    reader = threading.Thread(target=read)
+    reader.start()
+    with db.pool.write() as cursor:
+        db._write_document(cursor, **document(1))
+        writing.set()
+        # The reader finishes while this transaction is still open, and sees the last commit.
+        assert read_done.wait(timeout=10)
+    reader.join()
+    
+    assert counts == [1]
+    assert db.get_stats()['total_documents'] == 2
+    db.close()
@@ -0,0 +1,67 @@
+"""
+Unloading idle models and reloading them on use.
+"""
+
+import numpy as np
+import pytest
+
+from geospatial_rag import GeoSpatialRAG
+from geospatial_rag.embeddings import CLIPEmbedder
+from geospatial_rag.models.residency import ResidencyManager
+
+TEXT = "several boats are docked in the port"
+
+
+@pytest.fixture
+def clip(tiny_clip):
+    """A CLIP wrapper of its own, so unloading it leaves the shared one alone."""
+    return CLIPEmbedder(model_name=tiny_clip, device="cpu", local_files_only=True)
+
+
+def test_idle_model_unloads_and_reloads(clip):
+    before = clip.encode_text(TEXT)
+    manager = ResidencyManager(idle_seconds=0)
+    manager.register(clip, name="clip")
+    
+    assert manager.enforce() == ["clip"]
+    assert not clip.is_loaded
+    assert manager.stats()['models']['clip']['evictions'] == 1
+    assert manager.enforce() == []
+    
+    np.testing.assert_allclose(clip.encode_text(TEXT), before, atol=1e-6)
+    assert clip.is_loaded
+    assert clip.reloads == 1
+
+
+def test_model_in_use_is_never_unloaded(clip):
+    manager = ResidencyManager(idle_seconds=0, memory_budget_bytes=0)
+    manager.register(clip, name="clip")
+    
+    with clip.in_use():
+        assert clip.idle_seconds() == 0.0
+        assert manager.enforce() == []
+        assert clip.unload() is False
+        assert clip.is_loaded
+    assert manager.enforce() == ["clip"]
+
+
+def test_memory_budget_evicts_lower_priority_first(clip, tiny_clip):
+    other = CLIPEmbedder(model_name=tiny_clip, device="cpu", local_files_only=True)
+    manager = ResidencyManager(memory_budget_bytes=0)
+    manager.register(clip, priority=1, name="clip")
+    manager.register(other, priority=0, name="other")
+    
+    assert manager.enforce() == ["other", "clip"]
+
+
+def test_pipeline_reloads_unloaded_clip(tmp_path, clip, absolute_records):
+    manager = ResidencyManager(idle_seconds=0)
+    with GeoSpatialRAG(str(tmp_path / "rag.db"), embedder=clip, vlm_model_name=None, residency=manager) as rag:
+        rag.add_documents(absolute_records[:6])
+        rag.query_cache = None
+        before = rag.query(TEXT, generate_response=False)
+        
+        assert manager.enforce() == [clip.model_name]
+        after = rag.query(TEXT, generate_response=False)
+        assert [d.metadata['id'] for d in after['documents']] == [d.metadata['id'] for d in before['documents']]
+        assert clip.reloads == 1
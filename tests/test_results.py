@@ -0,0 +1,95 @@
+"""
+ResultSet against the list of documents it replaces.
+"""
+
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+from geospatial_rag.retriever import Document, ResultSet, SQLiteRetriever
+
+TEXT = "boats docked in the port"
+
+
+def legacy_documents(rag, query):
+    """The ranking as the original retriever built it: one eager ``Document`` per row, sorted by score."""
+    with rag.db.pool.read() as cursor:
+        rows = cursor.execute(
+            """SELECT d.id, te.embedding, d.description, d.class
+               FROM descriptions d JOIN text_embeddings te ON d.id = te.id"""
+        ).fetchall()
+    scored = []
+    for doc_id, embedding, description, doc_class in rows:
+        vector = np.frombuffer(embedding, dtype=np.float32)
+        similarity = np.dot(query, vector) / (np.linalg.norm(query) * np.linalg.norm(vector))
+        scored.append((Document(description, {"id": doc_id, "class": doc_class, "similarity": float(similarity)}),
+                       similarity))
+    scored.sort(key=lambda x: x[1], reverse=True)
+    return [doc for doc, _ in scored]
+
+
+def sample() -> ResultSet:
+    return ResultSet(["a", "b", "c"], ["first", "second", "third"], ["x", "y", "x"], [0.9, 0.5, 0.1],
+                     columns={'path': ["a.jpg", "b.jpg", "c.jpg"], 'ids': [["a"], ["b", "b2"], ["c"]]})
+
+
+@pytest.mark.parametrize("window", [slice(None), slice(0, 5), slice(3, 11), slice(-4, None), slice(1, 12, 3)])
+def test_slices_match_list_output(rag, records, window):
+    query = rag.embedder.encode_text(TEXT)
+    retriever = SQLiteRetriever(rag.db_path, query_embedding=query, pool=rag.db.pool,
+                                model_name=rag.embedder.model_name)
+    top_k = len(records) - 2
+    results = retriever.get_relevant_documents(top_k=top_k)
+    expected = legacy_documents(rag, query)[:top_k][window]
+    
+    documents = results[window]
+    assert isinstance(documents, ResultSet)
+    assert len(documents) == len(expected)
+    for document, legacy in zip(documents, expected):
+        assert document.page_content == legacy.page_content
+        assert document.metadata['id'] == legacy.metadata['id']
+        assert document.metadata['class'] == legacy.metadata['class']
+        assert document.metadata['similarity'] == pytest.approx(legacy.metadata['similarity'], abs=1e-5)
+
+
+def test_documents_are_built_lazily():
+    results = sample()
+    assert results._documents == [None, None, None]
+    
+    second = results[1]
+    assert results._documents[0] is None and results._documents[2] is None
+    assert results[-2] is second
+    assert second.metadata == {'id': "b", 'class': "y", 'similarity': 0.5, 'path': "b.jpg", 'ids': ["b", "b2"]}
+    # Slices reuse documents already built and build the rest on demand.
+    tail = results[1:]
+    assert tail._documents == [second, None]
+    assert tail[0] is second
+    with pytest.raises(IndexError):
+        results[3]
+
+
+def test_merge_keeps_best_score_per_id():
+    other = ResultSet(["b", "d"], ["second again", "fourth"], ["y", "z"], [0.95, 0.3],
+                      columns={'path': ["b.jpg", "d.jpg"], 'ids': [["b"], ["d"]]})
+    merged = ResultSet.merge([sample(), other])
+    
+    assert list(merged.ids) == ["b", "a", "d", "c"]
+    assert list(merged.scores) == [0.95, 0.9, 0.3, 0.1]
+    assert merged[0].page_content == "second again"
+    assert list(ResultSet.merge([sample(), other], top_k=2).ids) == ["b", "a"]
+    assert len(ResultSet.merge([ResultSet.empty(), ResultSet.empty()])) == 0
+
+
+def test_serialization_round_trip():
+    results = sample()
+    # Only the columns are serialized, not edits to built documents.
+    results[0].metadata['note'] = "not a column"
+    
+    for restored in (ResultSet.from_dict(json.loads(json.dumps(results.to_dict()))),
+                     pickle.loads(pickle.dumps(results))):
+        assert restored.to_dict() == results.to_dict()
+        assert restored._documents == [None, None, None]
+        assert restored[1].metadata == results[1].metadata
+        assert 'note' not in restored[0].metadata
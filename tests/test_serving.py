@@ -0,0 +1,46 @@
+"""
+Read-only opens for serving replicas.
+"""
+
+import sqlite3
+
+import pytest
+
+from geospatial_rag import GeoSpatialRAG
+from geospatial_rag.database import SQLiteVectorDB
+
+
+def test_read_only_open(rag, embedder):
+    path = rag.db_path
+    expected = rag.get_stats()['total_documents']
+    answer = rag.query("boats in the port", generate_response=False)
+    rag.close()
+    
+    with SQLiteVectorDB(path, read_only=True) as db:
+        assert db.pool.stats()['read_only'] == 1
+        assert db.get_stats()['total_documents'] == expected
+        with pytest.raises(sqlite3.OperationalError):
+            db.delete_documents([answer['documents'][0].metadata['id']])
+        assert db.get_stats()['total_documents'] == expected
+    
+    with GeoSpatialRAG(path, embedder=embedder, vlm_model_name=None, read_only=True) as served:
+        again = served.query("boats in the port", generate_response=False)
+    assert [d.metadata['id'] for d in again['documents']] == [d.metadata['id'] for d in answer['documents']]
+
+
+def test_read_only_open_of_unmigrated_database(tmp_path):
+    path = str(tmp_path / "old.db")
+    connection = sqlite3.connect(path)
+    connection.execute("CREATE TABLE descriptions (id TEXT PRIMARY KEY, class TEXT, description TEXT, path TEXT)")
+    connection.close()
+    
+    with pytest.raises(sqlite3.OperationalError, match="read-write open"):
+        SQLiteVectorDB(path, read_only=True)
+    SQLiteVectorDB(path).close()
+    with SQLiteVectorDB(path, read_only=True) as db:
+        assert db.get_stats()['total_documents'] == 0
+
+
+def test_read_only_open_of_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        SQLiteVectorDB(str(tmp_path / "missing.db"), read_only=True)
@@ -0,0 +1,79 @@
+"""
+Sharded ingestion merged into one database against a single-node ingestion.
+"""
+
+import json
+
+import numpy as np
+
+from geospatial_rag import GeoSpatialRAG
+from geospatial_rag.database import STATS_TRIGGERS_DDL, SQLiteVectorDB
+from geospatial_rag.knn import NeighborGraph
+from geospatial_rag.sharding import ingest_shard, merge_databases, shard_records
+
+
+def contents(path):
+    """Every stored row that ingestion writes, with vectors as arrays."""
+    with SQLiteVectorDB(path, read_only=True) as db, db.pool.read() as cursor:
+        tables = {
+            'descriptions': "SELECT id, class, description, path, metadata FROM descriptions ORDER BY id",
+            'text_embeddings': "SELECT id, model_name, embedding FROM text_embeddings ORDER BY id",
+            'image_vectors': "SELECT path, model_name, embedding FROM image_vectors ORDER BY path",
+        }
+        rows = {name: [tuple(row) for row in cursor.execute(sql)] for name, sql in tables.items()}
+        vectors = {
+            name: np.stack([np.frombuffer(row[-1], dtype=np.float32) for row in rows[name]])
+            for name in ('text_embeddings', 'image_vectors')
+        }
+        for name in vectors:
+            rows[name] = [row[:-1] for row in rows[name]]
+        stats = db.get_stats()
+    keys = ('total_documents', 'documents_by_class', 'embeddings_by_model')
+    return rows, vectors, {key: stats[key] for key in keys}
+
+
+def test_sharded_merge_matches_single_node(tmp_path, embedder, records, image_dir):
+    manifest = tmp_path / "manifest.jsonl"
+    manifest.write_text("".join(json.dumps(record) + "\n" for record in records))
+    options = {'embedder': embedder, 'num_workers': 1, 'image_root': image_dir}
+    
+    partials = []
+    for shard in range(3):
+        partials.append(str(tmp_path / f"part-{shard}.db"))
+        report = ingest_shard(str(manifest), shard, 3, partials[-1], **options)
+        assert report['stored'] == len(shard_records(records, shard, 3))
+    merged = str(tmp_path / "merged.db")
+    report = merge_databases(merged, partials)
+    # Merging a partial twice keeps every document once.
+    merge_databases(merged, partials[:1])
+    
+    single = str(tmp_path / "single.db")
+    ingest_shard(str(manifest), 0, 1, single, **options)
+    
+    merged_rows, merged_vectors, merged_stats = contents(merged)
+    single_rows, single_vectors, single_stats = contents(single)
+    assert report['total_documents'] == len(records)
+    assert merged_rows == single_rows
+    assert merged_stats == single_stats
+    # Images are encoded in different batches, so vectors agree up to float rounding.
+    for name in merged_vectors:
+        np.testing.assert_allclose(merged_vectors[name], single_vectors[name], atol=1e-5)
+
+
+def test_merge_rebuilds_derived_indexes(tmp_path, rag, embedder, absolute_records):
+    rag.build_signatures("binary")
+    rag.build_knn_graph(k=3)
+    with GeoSpatialRAG(str(tmp_path / "part.db"), embedder=embedder, vlm_model_name=None) as part:
+        part.add_documents([{'text': "a lone lighthouse on a rocky cape", 'doc_class': "coast"}])
+    
+    report = rag.db.merge([str(tmp_path / "part.db")])
+    assert report['signatures'] == 1
+    assert report['knn_graphs'] == 1
+    assert NeighborGraph(rag.db, embedder.model_name, (rag.text_weight, rag.image_weight)).is_fresh(3)
+    with rag.db.pool.read() as cursor:
+        assert cursor.execute("SELECT COUNT(*) FROM signatures").fetchone()[0] == len(absolute_records) + 1
+        triggers = cursor.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'stats_%'"
+        ).fetchone()[0]
+    assert triggers == len(STATS_TRIGGERS_DDL)
+    assert rag.get_stats()['total_documents'] == len(absolute_records) + 1
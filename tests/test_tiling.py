@@ -0,0 +1,77 @@
+"""
+Chip layout over scenes and chip reading.
+"""
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from geospatial_rag.tiling import PILSceneReader, chip_grid, iter_chip_batches
+
+
+def coverage(chips, width, height):
+    covered = np.zeros((height, width), dtype=bool)
+    for chip in chips:
+        covered[chip.y:chip.y + chip.height, chip.x:chip.x + chip.width] = True
+    return covered
+
+
+def test_edge_chips_are_flush_with_border():
+    chips = chip_grid(1000, 700, chip_size=256, stride=200)
+    
+    assert sorted({c.x for c in chips}) == [0, 200, 400, 600, 744]
+    assert sorted({c.y for c in chips}) == [0, 200, 400, 444]
+    assert all((c.width, c.height) == (256, 256) for c in chips)
+    assert max(c.x + c.width for c in chips) == 1000
+    assert max(c.y + c.height for c in chips) == 700
+    assert coverage(chips, 1000, 700).all()
+    # Rows and columns index the grid in reading order.
+    assert [(c.row, c.col) for c in chips[:6]] == [(0, 0), (0, 1), (0, 2), (0, 3), (0, 4), (1, 0)]
+
+
+def test_exact_multiple_adds_no_extra_chip():
+    chips = chip_grid(512, 512, chip_size=256)
+    assert [(c.x, c.y) for c in chips] == [(0, 0), (256, 0), (0, 256), (256, 256)]
+
+
+@pytest.mark.parametrize("width, height, expected", [
+    (100, 60, [(0, 0, 100, 60)]),
+    (600, 100, [(0, 0, 256, 100), (256, 0, 256, 100), (344, 0, 256, 100)]),
+])
+def test_scenes_smaller_than_a_chip(width, height, expected):
+    chips = chip_grid(width, height, chip_size=256)
+    assert [(c.x, c.y, c.width, c.height) for c in chips] == expected
+    assert coverage(chips, width, height).all()
+
+
+def test_invalid_sizes():
+    with pytest.raises(ValueError):
+        chip_grid(100, 100, chip_size=0)
+
+
+def test_non_square_chip_is_padded_not_stretched():
+    scene = Image.new("RGB", (200, 100), (255, 255, 255))
+    with PILSceneReader(scene) as reader:
+        chip = np.asarray(reader.read(0, 0, 200, 100, out_size=64))
+    
+    assert chip.shape == (64, 64, 3)
+    # Scaled to 64 x 32 and centred: black bands above and below, no distortion.
+    white = np.flatnonzero(chip.min(axis=(1, 2)) == 255)
+    assert (white[0], white[-1]) == (16, 47)
+    assert chip[:15].max() == 0 and chip[49:].max() == 0
+    assert chip[16:48].min() == 255
+
+
+def test_chip_batches_read_every_chip_at_model_size():
+    scene = Image.fromarray(np.random.default_rng(0).integers(0, 255, (300, 500, 3), dtype=np.uint8))
+    chips = chip_grid(500, 300, chip_size=128, stride=128)
+    with PILSceneReader(scene) as reader:
+        batches = list(iter_chip_batches(reader, chips, batch_size=4, out_size=32))
+    
+    assert [len(batch) for batch, _ in batches] == [4, 4, 4]
+    assert sum((batch for batch, _ in batches), []) == chips
+    assert all(image.size == (32, 32) for _, images in batches for image in images)
+    # A square chip is only resized: it matches resizing the crop directly.
+    first = batches[0][1][0]
+    expected = scene.crop((0, 0, 128, 128)).resize((32, 32), Image.Resampling.BILINEAR)
+    assert np.array_equal(np.asarray(first), np.asarray(expected))
@@ -0,0 +1,86 @@
+"""
+A small randomly initialized CLIP snapshot, so tests and benchmarks run
+offline with the real model and processor classes.
+"""
+
+import json
+import os
+from typing import Dict
+
+import torch
+from transformers import CLIPConfig, CLIPImageProcessor, CLIPModel, CLIPProcessor, CLIPTokenizer
+
+
+def _bytes_to_unicode() -> Dict[int, str]:
+    """Byte-to-character table used by CLIP's byte-level BPE."""
+    printable = (
+        list(range(ord("!"), ord("~") + 1)) +
+        list(range(ord("¡"), ord("¬") + 1)) +
+        list(range(ord("®"), ord("ÿ") + 1))
+    )
+    codes = printable[:]
+    extra = 0
+    for byte in range(256):
+        if byte not in printable:
+            printable.append(byte)
+            codes.append(256 + extra)
+            extra += 1
+    return dict(zip(printable, [chr(code) for code in codes]))
+
+
+def build_tiny_clip(snapshot_dir: str, hidden_size: int = 64, layers: int = 2,
+                    projection_dim: int = 64, seed: int = 0) -> str:
+    """
+    Save a randomly initialized CLIP model and processor to ``snapshot_dir``.
+    
+    The tokenizer has a character-level vocabulary with no merges, so text
+    lengths are realistic without shipping the real BPE files.
+    """
+    os.makedirs(snapshot_dir, exist_ok=True)
+    characters = list(_bytes_to_unicode().values())
+    vocab = {}
+    for suffix in ("", "</w>"):
+        for character in characters:
+            vocab[character + suffix] = len(vocab)
+    vocab["<|startoftext|>"] = len(vocab)
+    vocab["<|endoftext|>"] = len(vocab)
+    
+    vocab_file = os.path.join(snapshot_dir, "vocab.json")
+    merges_file = os.path.join(snapshot_dir, "merges.txt")
+    with open(vocab_file, "w") as f:
+        json.dump(vocab, f)
+    with open(merges_file, "w") as f:
+        f.write("#version: 0.2\n")
+    
+    # Loading from the files works on both tokenizer backends; the constructor's
+    # arguments differ between transformers releases.
+    tokenizer = CLIPTokenizer.from_pretrained(snapshot_dir)
+    processor = CLIPProcessor(image_processor=CLIPImageProcessor(), tokenizer=tokenizer)
+    
+    heads = max(1, hidden_size // 32)
+    torch.manual_seed(seed)
+    config = CLIPConfig(
+        text_config={
+            'vocab_size': len(vocab),
+            'hidden_size': hidden_size,
+            'intermediate_size': hidden_size * 4,
+            'num_hidden_layers': layers,
+            'num_attention_heads': heads,
+            'max_position_embeddings': 77,
+            'bos_token_id': vocab["<|startoftext|>"],
+            'eos_token_id': vocab["<|endoftext|>"],
+            'pad_token_id': vocab["<|endoftext|>"],
+        },
+        vision_config={
+            'hidden_size': hidden_size,
+            'intermediate_size': hidden_size * 4,
+            'num_hidden_layers': layers,
+            'num_attention_heads': heads,
+            'image_size': 224,
+            'patch_size': 32,
+        },
+        projection_dim=projection_dim,
+    )
+    CLIPModel(config).save_pretrained(snapshot_dir)
+    processor.save_pretrained(snapshot_dir)
+    return snapshot_dir